@@ -0,0 +1,72 @@
+"""
+Benchmark of the fused single query path of ``AttentionLayer`` against the matmul path, with the group shapes of the
+four SA levels of ``pointnet2_sem_seg_attention``.
+
+Both paths share the variables of one layer, for each level the maximal absolute difference of the outputs and the mean
+time of a forward and a forward + backward pass are printed.
+"""
+
+import time
+from typing import List, Tuple
+
+import numpy as np
+import tensorflow as tf
+
+from attention_points.attention_scannet.attention_layer import AttentionLayer
+
+BATCH_SIZE = 16
+N_SAMPLE = 32
+# (npoint, channels) of the SA levels, the layers have channels // 4 heads of dimension 4
+SA_LEVELS = [(1024, 64), (256, 128), (64, 256), (16, 512)]
+
+
+def time_op(sess: tf.Session, op, repeats: int) -> float:
+    """
+    :param sess: tf session
+    :param op: fetches of the timed run
+    :param repeats: number of timed runs after one warm up run
+    :return: mean time of a run in seconds
+    """
+    sess.run(op)
+    start = time.time()
+    for _ in range(repeats):
+        sess.run(op)
+    return (time.time() - start) / repeats
+
+
+def benchmark_level(npoint: int, channels: int, batch_size: int = BATCH_SIZE, nsample: int = N_SAMPLE,
+                    repeats: int = 20) -> Tuple[float, List[float]]:
+    """
+    benchmarks both paths for one SA level
+
+    :param npoint: number of groups
+    :param channels: number of channels of the grouped points
+    :param batch_size: batch size
+    :param nsample: number of points in a group
+    :param repeats: number of timed runs
+    :return: maximal absolute difference of the outputs, times of the matmul path (forward, backward) and of the fused
+             path (forward, backward)
+    """
+    tf.reset_default_graph()
+    grouped_points = tf.Variable(np.random.randn(batch_size, npoint, nsample, channels).astype(np.float32))
+    query = tf.gather(grouped_points, [0], axis=2)
+    layer = AttentionLayer(output_dim=4, key_dim=4, num_heads=channels // 4, fused=False)
+    out_matmul = layer([grouped_points, query])
+    layer.fused = True
+    out_fused = layer([grouped_points, query])
+    grad_matmul = tf.gradients(tf.reduce_sum(out_matmul), tf.trainable_variables())
+    grad_fused = tf.gradients(tf.reduce_sum(out_fused), tf.trainable_variables())
+
+    with tf.Session() as sess:
+        sess.run(tf.global_variables_initializer())
+        matmul_val, fused_val = sess.run([out_matmul, out_fused])
+        times = [time_op(sess, op, repeats) for op in [out_matmul, grad_matmul, out_fused, grad_fused]]
+    return float(np.max(np.abs(matmul_val - fused_val))), times
+
+
+if __name__ == '__main__':
+    for npoint, channels in SA_LEVELS:
+        max_diff, (matmul_fwd, matmul_bwd, fused_fwd, fused_bwd) = benchmark_level(npoint, channels)
+        print(f"npoint {npoint:4d} channels {channels:3d}: max diff {max_diff:.2e}"
+              f"\tforward {matmul_fwd * 1000:.2f}ms -> {fused_fwd * 1000:.2f}ms"
+              f"\tforward + backward {matmul_bwd * 1000:.2f}ms -> {fused_bwd * 1000:.2f}ms")
@@ -1,4 +1,4 @@
-from typing import List
+from typing import Callable, List
 
 import tensorflow as tf
 
@@ -8,17 +8,19 @@ from pointnet2_tensorflow.utils.tf_util import batch_norm_for_conv2d
 
 
 class AttentionLayer(tf.keras.layers.Layer):
-    def __init__(self, output_dim, key_dim, num_heads=16):
+    def __init__(self, output_dim, key_dim, num_heads=16, fused=True):
         """
 
         :param output_dim: dimension for each head, total is num_heads * output_dim
         :param key_dim: dimension for each head, total is num_heads * output_dim
         :param num_heads:
+        :param fused: use the fused single query path, it has the same variables and outputs as the matmul path
         """
         super(AttentionLayer, self).__init__(name="ScannetAttentionLayer")
         self.output_dim = output_dim
         self.key_dim = key_dim
         self.num_heads = num_heads
+        self.fused = fused
 
     def build(self, input_shape):
         self.query_net = tf.layers.Dense(self.key_dim * self.num_heads)
@@ -28,6 +30,8 @@ class AttentionLayer(tf.keras.layers.Layer):
 
     def call(self, inputs, **kwargs):
         input, query = inputs
+        if self.fused:
+            return self.fused_call(input, query)
         Q = self.query_net(query)
         Q = tf.expand_dims(Q, axis=2)
         K = self.key_net(input)
@@ -44,6 +48,25 @@ class AttentionLayer(tf.keras.layers.Layer):
         out = concat_attention
         return out
 
+    def fused_call(self, input, query):
+        """
+        attention with a single query per group: the scale is folded into the query projection, the scores and the
+        weighted sum are einsums over the projected keys and values. There is no 5D query and no batched matmul of
+        1 x key_dim matrices, the keys and values are split into heads by the same reshape as in the matmul path.
+
+        :param input: grouped points (B x npoint x nsample x C)
+        :param query: query of each group (B x npoint x 1 x C)
+        :return: attention output (B x npoint x num_heads * key_dim)
+        """
+        Q = self.query_net(query) * self.key_dim ** -0.5
+        Q = tf.reshape(Q, (tf.shape(Q)[0], Q.shape[1], self.num_heads, self.key_dim))
+        K, V = [tf.reshape(x, (tf.shape(x)[0], x.shape[1], self.num_heads, x.shape[2], self.key_dim))
+                for x in [self.key_net(input), self.value_net(input)]]
+        weights = tf.nn.softmax(tf.einsum('bphd,bphsd->bphs', Q, K), dim=-1)
+        out = tf.einsum('bphs,bphsd->bphd', weights, V)
+        # concat heads
+        return tf.reshape(out, [tf.shape(out)[0], out.shape[1], self.num_heads * self.key_dim])
+
 
 class InnerAttentionLayer(tf.keras.layers.Layer):
     def __init__(self, output_dim, key_dim):
@@ -210,13 +233,60 @@ class AttentionNetMLPLayer(tf.keras.layers.Layer):
         return [new_xyz, new_points, idx]
 
 
+def _recompute_moving_stats_getter(getter, name, *args, **kwargs):
+    """
+    custom getter for the recomputation in the backward pass: the moving statistics of the batch norm layers are
+    replaced by local copies, so that they are only updated in the forward pass
+    """
+    if name.endswith('moving_mean') or name.endswith('moving_variance'):
+        kwargs['collections'] = [tf.GraphKeys.LOCAL_VARIABLES]
+        kwargs['trainable'] = False
+        return getter(name + '_recompute', *args, **kwargs)
+    return getter(name, *args, **kwargs)
+
+
+def recompute_group_features(group_features: Callable, recompute: bool) -> Callable:
+    """
+    gradient checkpointing of the per group part of an SA module: with `recompute` its activations are not kept for
+    the backward pass but recomputed from the grouped points
+
+    :param group_features: function of the tensors (grouped points, is_training, bn_decay), its variables have to be
+                           resource variables
+    :param recompute: whether the activations are recomputed
+    :return: function with the same arguments and output as `group_features`
+    """
+    if not recompute:
+        return group_features
+
+    def group_features_with_flag(grouped_points, is_training, bn_decay, is_recomputing=False):
+        if not is_recomputing:
+            return group_features(grouped_points, is_training, bn_decay)
+        with tf.variable_scope(tf.get_variable_scope(), reuse=tf.AUTO_REUSE,
+                               custom_getter=_recompute_moving_stats_getter):
+            return group_features(grouped_points, is_training, bn_decay)
+
+    group_features_recompute = tf.contrib.layers.recompute_grad(group_features_with_flag)
+
+    def wrapper(grouped_points, is_training, bn_decay):
+        # all inputs have to be tensors, otherwise the variables behind them would be part of the recomputation
+        bn_decay = 0.9 if bn_decay is None else bn_decay
+        return group_features_recompute(grouped_points, tf.convert_to_tensor(is_training),
+                                        tf.convert_to_tensor(bn_decay, dtype=tf.float32))
+
+    return wrapper
+
+
 def pointnet_sa_module_attention(xyz, points, npoint, radius, nsample, mlp, mlp2, group_all, is_training, bn_decay,
-                                 scope, bn=True, pooling='max', knn=False, use_xyz=True, use_nchw=False):
+                                 scope, bn=True, pooling='max', knn=False, use_xyz=True, use_nchw=False,
+                                 recompute=False):
     """
     Like PointNet Set Abstraction (SA) Module but with attention instead of pooling
+
+    With `recompute` the activations of the point feature embedding and the attention are recomputed in the backward
+    pass instead of being stored (gradient checkpointing), the variables are then resource variables.
     """
     data_format = 'NCHW' if use_nchw else 'NHWC'
-    with tf.variable_scope(scope, reuse=tf.AUTO_REUSE) as sc:
+    with tf.variable_scope(scope, reuse=tf.AUTO_REUSE, use_resource=True if recompute else None) as sc:
         # Sample and Grouping
         if group_all:
             nsample = xyz.get_shape()[1].value
@@ -224,44 +294,49 @@ def pointnet_sa_module_attention(xyz, points, npoint, radius, nsample, mlp, mlp2
         else:
             new_xyz, new_points, idx, grouped_xyz = sample_and_group(npoint, radius, nsample, xyz, points, knn, use_xyz)
 
-        # Point Feature Embedding
-        if use_nchw: new_points = tf.transpose(new_points, [0, 3, 1, 2])
-        for i, num_out_channel in enumerate(mlp):
-            new_points = tf_util.conv2d(new_points, num_out_channel, [1, 1],
-                                        padding='VALID', stride=[1, 1],
-                                        bn=bn, is_training=is_training,
-                                        scope='conv%d' % (i), bn_decay=bn_decay,
-                                        data_format=data_format)
-        if use_nchw: new_points = tf.transpose(new_points, [0, 2, 3, 1])
-
-        # # Pooling in Local Regions
-        # if pooling == 'max':
-        #     new_points = tf.reduce_max(new_points, axis=[2], keep_dims=True, name='maxpool')
-        # elif pooling == 'avg':
-        #     new_points = tf.reduce_mean(new_points, axis=[2], keep_dims=True, name='avgpool')
-        # elif pooling == 'weighted_avg':
-        #     with tf.variable_scope('weighted_avg'):
-        #         dists = tf.norm(grouped_xyz, axis=-1, ord=2, keep_dims=True)
-        #         exp_dists = tf.exp(-dists * 5)
-        #         weights = exp_dists / tf.reduce_sum(exp_dists, axis=2,
-        #                                             keep_dims=True)  # (batch_size, npoint, nsample, 1)
-        #         new_points *= weights  # (batch_size, npoint, nsample, mlp[-1])
-        #         new_points = tf.reduce_sum(new_points, axis=2, keep_dims=True)
-        # elif pooling == 'max_and_avg':
-        #     max_points = tf.reduce_max(new_points, axis=[2], keep_dims=True, name='maxpool')
-        #     avg_points = tf.reduce_mean(new_points, axis=[2], keep_dims=True, name='avgpool')
-        #     new_points = tf.concat([avg_points, max_points], axis=-1)
-
         # here we use attention instead of pooling
         out_dim = mlp[-1]
         heads = out_dim // 4
         attention_layer = AttentionLayer(output_dim=4, key_dim=4, num_heads=heads)
-        query_vectors = tf.gather(new_points, [0], axis=2)
-        # print("query vectors", query_vectors.shape)
-        new_points = attention_layer([new_points, query_vectors])
-        new_points = tf.expand_dims(new_points, [2])
-        new_points = batch_norm_for_conv2d(new_points, is_training, bn_decay, scope, data_format)
-        # print("new_points after attention", new_points.shape)
+
+        def group_features(new_points, is_training, bn_decay):
+            # Point Feature Embedding
+            if use_nchw: new_points = tf.transpose(new_points, [0, 3, 1, 2])
+            for i, num_out_channel in enumerate(mlp):
+                new_points = tf_util.conv2d(new_points, num_out_channel, [1, 1],
+                                            padding='VALID', stride=[1, 1],
+                                            bn=bn, is_training=is_training,
+                                            scope='conv%d' % (i), bn_decay=bn_decay,
+                                            data_format=data_format)
+            if use_nchw: new_points = tf.transpose(new_points, [0, 2, 3, 1])
+
+            # # Pooling in Local Regions
+            # if pooling == 'max':
+            #     new_points = tf.reduce_max(new_points, axis=[2], keep_dims=True, name='maxpool')
+            # elif pooling == 'avg':
+            #     new_points = tf.reduce_mean(new_points, axis=[2], keep_dims=True, name='avgpool')
+            # elif pooling == 'weighted_avg':
+            #     with tf.variable_scope('weighted_avg'):
+            #         dists = tf.norm(grouped_xyz, axis=-1, ord=2, keep_dims=True)
+            #         exp_dists = tf.exp(-dists * 5)
+            #         weights = exp_dists / tf.reduce_sum(exp_dists, axis=2,
+            #                                             keep_dims=True)  # (batch_size, npoint, nsample, 1)
+            #         new_points *= weights  # (batch_size, npoint, nsample, mlp[-1])
+            #         new_points = tf.reduce_sum(new_points, axis=2, keep_dims=True)
+            # elif pooling == 'max_and_avg':
+            #     max_points = tf.reduce_max(new_points, axis=[2], keep_dims=True, name='maxpool')
+            #     avg_points = tf.reduce_mean(new_points, axis=[2], keep_dims=True, name='avgpool')
+            #     new_points = tf.concat([avg_points, max_points], axis=-1)
+
+            query_vectors = tf.gather(new_points, [0], axis=2)
+            # print("query vectors", query_vectors.shape)
+            new_points = attention_layer([new_points, query_vectors])
+            new_points = tf.expand_dims(new_points, [2])
+            new_points = batch_norm_for_conv2d(new_points, is_training, bn_decay, scope, data_format)
+            # print("new_points after attention", new_points.shape)
+            return new_points
+
+        new_points = recompute_group_features(group_features, recompute)(new_points, is_training, bn_decay)
 
         # [Optional] Further Processing
         if mlp2 is not None:
@@ -280,12 +355,18 @@ def pointnet_sa_module_attention(xyz, points, npoint, radius, nsample, mlp, mlp2
 
 def pointnet_sa_module_attention_and_pooling(xyz, points, npoint, radius, nsample, mlp, mlp2, group_all, is_training,
                                              bn_decay,
-                                             scope, bn=True, pooling='max', knn=False, use_xyz=True, use_nchw=False):
+                                             scope, bn=True, pooling='max', knn=False, use_xyz=True, use_nchw=False,
+                                             recompute=False):
     """
     Like PointNet Set Abstraction (SA) Module but with attention instead of pooling
+
+    With `recompute` the activations of the point feature embedding, the pooling and the attention are recomputed in
+    the backward pass instead of being stored (gradient checkpointing), the variables are then resource variables.
     """
+    if pooling != 'max':
+        raise ValueError("Pooling must be max for this implementation")
     data_format = 'NCHW' if use_nchw else 'NHWC'
-    with tf.variable_scope(scope, reuse=tf.AUTO_REUSE) as sc:
+    with tf.variable_scope(scope, reuse=tf.AUTO_REUSE, use_resource=True if recompute else None) as sc:
         # Sample and Grouping
         if group_all:
             nsample = xyz.get_shape()[1].value
@@ -293,34 +374,35 @@ def pointnet_sa_module_attention_and_pooling(xyz, points, npoint, radius, nsampl
         else:
             new_xyz, new_points, idx, grouped_xyz = sample_and_group(npoint, radius, nsample, xyz, points, knn, use_xyz)
 
-        # Point Feature Embedding
-        if use_nchw: new_points = tf.transpose(new_points, [0, 3, 1, 2])
-        for i, num_out_channel in enumerate(mlp):
-            new_points = tf_util.conv2d(new_points, num_out_channel, [1, 1],
-                                        padding='VALID', stride=[1, 1],
-                                        bn=bn, is_training=is_training,
-                                        scope='conv%d' % (i), bn_decay=bn_decay,
-                                        data_format=data_format)
-        if use_nchw: new_points = tf.transpose(new_points, [0, 2, 3, 1])
-
-        # Pooling in Local Regions
-        if pooling == 'max':
-            new_points_pool = tf.reduce_max(new_points, axis=[2], keep_dims=True, name='maxpool')
-        else:
-            raise ValueError("Pooling must be max for this implementation")
-
         # here we use attention instead of pooling
         out_dim = mlp[-1]
         heads = out_dim // 4
         attention_layer = AttentionLayer(output_dim=4, key_dim=4, num_heads=heads)
-        query_vectors = tf.gather(new_points, [0], axis=2)
-        # print("query vectors", query_vectors.shape)
-        new_points = attention_layer([new_points, query_vectors])
-        new_points = tf.expand_dims(new_points, [2])
-        new_points = batch_norm_for_conv2d(new_points, is_training, bn_decay, scope, data_format)
-        # print("new_points after attention", new_points.shape)
-
-        new_points = new_points + new_points_pool
+
+        def group_features(new_points, is_training, bn_decay):
+            # Point Feature Embedding
+            if use_nchw: new_points = tf.transpose(new_points, [0, 3, 1, 2])
+            for i, num_out_channel in enumerate(mlp):
+                new_points = tf_util.conv2d(new_points, num_out_channel, [1, 1],
+                                            padding='VALID', stride=[1, 1],
+                                            bn=bn, is_training=is_training,
+                                            scope='conv%d' % (i), bn_decay=bn_decay,
+                                            data_format=data_format)
+            if use_nchw: new_points = tf.transpose(new_points, [0, 2, 3, 1])
+
+            # Pooling in Local Regions
+            new_points_pool = tf.reduce_max(new_points, axis=[2], keep_dims=True, name='maxpool')
+
+            query_vectors = tf.gather(new_points, [0], axis=2)
+            # print("query vectors", query_vectors.shape)
+            new_points = attention_layer([new_points, query_vectors])
+            new_points = tf.expand_dims(new_points, [2])
+            new_points = batch_norm_for_conv2d(new_points, is_training, bn_decay, scope, data_format)
+            # print("new_points after attention", new_points.shape)
+
+            return new_points + new_points_pool
+
+        new_points = recompute_group_features(group_features, recompute)(new_points, is_training, bn_decay)
 
         # [Optional] Further Processing
         if mlp2 is not None:
@@ -7,8 +7,8 @@ Adapted from ScanNet benchmark scripts: https://github.com/ScanNet/ScanNet/tree/
 
 Input:
 
-  - path to .txt prediction files
-  - path to .txt ground truth files
+  - path to .txt (or binary .npy) prediction files
+  - path to .txt (or binary .npy) ground truth files
   - output file to write results to
 
 Note that only the valid classes are used for evaluation,
@@ -26,11 +26,6 @@ pred_path = "/home/tim/results/predictions_colors"
 gt_path = "/home/tim/results/groundtruth"
 output_file = "/home/tim/results/results_colors.txt"
 
-try:
-    from itertools import izip
-except ImportError:
-    izip = zip
-
 currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
 parentdir = os.path.dirname(currentdir)
 sys.path.insert(0, parentdir)
@@ -39,10 +34,13 @@ sys.path.insert(0, parentdir)
 def load_ids(filename: str):
     """
     Read the predicted label ids from the specified filename
+    Files ending with .npy are loaded directly as numpy array, all others are parsed as text (one id per line)
 
     :param filename: Name of the label file
     :return:
     """
+    if filename.endswith('.npy'):
+        return np.load(filename).astype(np.int64)
     ids = open(filename).read().splitlines()
     ids = np.array(ids, dtype=np.int64)
     return ids
@@ -75,12 +73,15 @@ def evaluate_scan(pred_file: str, gt_file: str, confusion: np.ndarray):
     # sanity checks
     if not pred_ids.shape == gt_ids.shape:
         print('%s: number of predicted values does not match number of vertices' % pred_file)
-    for (gt_val, pred_val) in izip(gt_ids.flatten(), pred_ids.flatten()):
-        if gt_val not in VALID_CLASS_IDS:
-            continue
-        if pred_val not in VALID_CLASS_IDS:
-            pred_val = UNKNOWN_ID
-        confusion[gt_val][pred_val] += 1
+    # like the original zip, only the common length of prediction and groundtruth is evaluated
+    n_ids = min(pred_ids.size, gt_ids.size)
+    gt_ids = gt_ids.flatten()[:n_ids]
+    pred_ids = pred_ids.flatten()[:n_ids]
+    valid = np.isin(gt_ids, VALID_CLASS_IDS)
+    gt_ids = gt_ids[valid]
+    pred_ids = np.where(np.isin(pred_ids[valid], VALID_CLASS_IDS), pred_ids[valid], UNKNOWN_ID)
+    n = confusion.shape[0]
+    confusion += np.bincount(gt_ids * n + pred_ids, minlength=n * n).reshape(n, n).astype(confusion.dtype)
 
 
 def get_iou(label_id: int, confusion: np.ndarray):
@@ -176,12 +177,22 @@ def main():
     Evaluate the IoU scores of the predicted labels for all the scenes by comparing with the groundtruth labels
     :return:
     """
-    pred_files = [f for f in os.listdir(pred_path) if f.endswith('.txt')]
+    # one prediction per scene, a directory exported both as text and binary contains both files of a scene
+    scene_files = {}
+    for f in sorted(os.listdir(pred_path)):
+        scene_name, extension = os.path.splitext(f)
+        if extension == '.npy' or (extension == '.txt' and scene_name not in scene_files):
+            scene_files[scene_name] = f
+    pred_files = [scene_files[scene_name] for scene_name in sorted(scene_files)]
     gt_files = []
     if len(pred_files) == 0:
         print('No result files found.')
     for i in range(len(pred_files)):
-        gt_file = os.path.join(gt_path, pred_files[i])
+        scene_name = os.path.splitext(pred_files[i])[0]
+        # prefer the binary groundtruth, it does not need to be parsed
+        gt_file = os.path.join(gt_path, scene_name + '.npy')
+        if not os.path.isfile(gt_file):
+            gt_file = os.path.join(gt_path, scene_name + '.txt')
         if not os.path.isfile(gt_file):
             print('Result file {} does not match any gt file'.format(pred_files[i]))
         gt_files.append(gt_file)
@@ -9,13 +9,20 @@ Input:
 - the *_vh_clean_2.ply mesh
 - the labels defined by the *.aggregation.json and *_vh_clean_2.0.010000.segs.json files
 
+Output:
+
+- one text file per scan (one label per line) and optionally a binary .npy file (uint8) with the same labels
+
+The scans are exported in parallel by a process pool.
 """
 
 import json
 import os
 import numpy as np
 import csv
-from typing import Dict
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Dict, Union
 
 scan_path = "/Users/tim/Downloads/scannet_downloads/scans/"
 output_path = "/Users/tim/Downloads/scannet_groundtruth/"
@@ -47,24 +54,32 @@ def read_aggregation(filename: str):
     return object_id_to_segs, label_to_segs
 
 
-def read_segmentation(filename: str):
+def read_segment_indices(filename: str) -> np.ndarray:
     """
-    Read the segmentation data for the scene
+    Read the segment id of every vertex of the scene
 
     :param filename: Path to the segmentation data
-    :return:
+    :return: segment ids (N)
     """
     assert os.path.isfile(filename)
-    seg_to_verts = {}
     with open(filename) as f:
         data = json.load(f)
-        num_verts = len(data['segIndices'])
-        for i in range(num_verts):
-            seg_id = data['segIndices'][i]
-            if seg_id in seg_to_verts:
-                seg_to_verts[seg_id].append(i)
-            else:
-                seg_to_verts[seg_id] = [i]
+    return np.array(data['segIndices'], dtype=np.int64)
+
+
+def read_segmentation(filename: str):
+    """
+    Read the segmentation data for the scene
+
+    :param filename: Path to the segmentation data
+    :return:
+    """
+    seg_indices = read_segment_indices(filename)
+    num_verts = len(seg_indices)
+    # group the vertex ids by segment with one sort instead of appending them one by one
+    order = np.argsort(seg_indices, kind='stable')
+    seg_ids, starts = np.unique(seg_indices[order], return_index=True)
+    seg_to_verts = dict(zip(seg_ids.tolist(), np.split(order, starts[1:])))
     return seg_to_verts, num_verts
 
 
@@ -105,50 +120,89 @@ def read_label_mapping(filename: str, label_from='raw_category', label_to='nyu40
 def export_ids(filename: str, ids: np.ndarray):
     """
     Export the provided ids to the provided filename
+    The whole text is built in one buffer and written at once
     :param filename: Path to export to
     :param ids: Ids that should be exported
     :return:
     """
+    ids = np.asarray(ids).astype(np.int64)
     with open(filename, 'w') as f:
-        for id in ids:
-            f.write('%d\n' % id)
+        if len(ids) > 0:
+            f.write('\n'.join(ids.astype(str)) + '\n')
 
 
-def export(agg_file: str, seg_file: str, label_map: str, output_file: str):
+def get_label_ids(agg_file: str, seg_file: str, label_map: Dict) -> np.ndarray:
     """
-    Exports the specified groundtruth scene in the benchmark evaluation format
+    Computes the nyu40 label of every vertex of the scene
+    Each segment gets its label once and all vertices gather the label of their segment in one step
 
     :param agg_file: Path to the aggregation file of the scene
     :param seg_file: Path to the segmentation file of the scene
-    :param label_map: Path to the label_map (nyu40-scannet)
-    :param output_file: Path to which the output should be written
-    :return:
+    :param label_map: mapping from the raw category to the nyu40 id
+    :return: label ids (N), 0 for unannotated vertices
     """
-    label_map = read_label_mapping(label_map, label_from='raw_category', label_to='nyu40id')
     object_id_to_segs, label_to_segs = read_aggregation(agg_file)
-    seg_to_verts, num_verts = read_segmentation(seg_file)
-    label_ids = np.zeros(shape=num_verts, dtype=np.uint32)  # 0: unannotated
+    seg_ids, vert_to_seg = np.unique(read_segment_indices(seg_file), return_inverse=True)
+    seg_to_label = {}
     for label, segs in label_to_segs.items():
         label_id = label_map[label]
         for seg in segs:
-            verts = seg_to_verts[seg]
-            label_ids[verts] = label_id
+            seg_to_label[seg] = label_id
+    seg_labels = np.array([seg_to_label.get(seg, 0) for seg in seg_ids.tolist()], dtype=np.uint32)
+    return seg_labels[vert_to_seg.reshape(-1)]
+
+
+def export(agg_file: str, seg_file: str, label_map: Union[str, Dict], output_file: str, binary: bool = False):
+    """
+    Exports the specified groundtruth scene in the benchmark evaluation format
+
+    :param agg_file: Path to the aggregation file of the scene
+    :param seg_file: Path to the segmentation file of the scene
+    :param label_map: Path to the label_map (nyu40-scannet) or the already loaded mapping
+    :param output_file: Path to which the output should be written
+    :param binary: Whether the labels should additionally be stored as .npy (uint8) next to the text file
+    :return:
+    """
+    if isinstance(label_map, str):
+        label_map = read_label_mapping(label_map, label_from='raw_category', label_to='nyu40id')
+    label_ids = get_label_ids(agg_file, seg_file, label_map)
     export_ids(output_file, label_ids)
+    if binary:
+        np.save(os.path.splitext(output_file)[0] + ".npy", label_ids.astype(np.uint8))
+
+
+def export_scan(scan_name: str, label_map: Dict, binary: bool = True):
+    """
+    Exports the groundtruth of a single scan of the scan_path to the output_path
+
+    :param scan_name: Name of the scan, e.g. "scene0000_00"
+    :param label_map: mapping from the raw category to the nyu40 id
+    :param binary: Whether the labels should additionally be stored as .npy (uint8)
+    :return: Name of the scan
+    """
+    output_file = output_path + scan_name + ".txt"
+    scene_path = os.path.join(scan_path, scan_name)
+    agg_file = os.path.join(scene_path, scan_name + '.aggregation.json')
+    seg_file = os.path.join(scene_path, scan_name + '_vh_clean_2.0.010000.segs.json')
+    export(agg_file, seg_file, label_map, output_file, binary)
+    return scan_name
 
 
-def main():
+def main(processes: int = None, binary: bool = True):
     """
     Exports for each groundtruth-label file in the provided folder the labels in the format required for
     the ScanNet benchmark
+
+    :param processes: number of worker processes, defaults to the number of cpus
+    :param binary: Whether the labels should additionally be stored as .npy (uint8)
     :return:
     """
     scene_folders = [dI for dI in os.listdir(scan_path) if os.path.isdir(os.path.join(scan_path, dI))]
-    for scan_name in scene_folders:
-        output_file = output_path + scan_name + ".txt"
-        scene_path = os.path.join(scan_path, scan_name)
-        agg_file = os.path.join(scene_path, scan_name + '.aggregation.json')
-        seg_file = os.path.join(scene_path, scan_name + '_vh_clean_2.0.010000.segs.json')
-        export(agg_file, seg_file, label_map_file, output_file)
+    label_map = read_label_mapping(label_map_file, label_from='raw_category', label_to='nyu40id')
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        for i, scan_name in enumerate(executor.map(partial(export_scan, label_map=label_map, binary=binary),
+                                                   scene_folders)):
+            print(f"exported {scan_name} ({i + 1}/{len(scene_folders)})")
 
 
 if __name__ == '__main__':
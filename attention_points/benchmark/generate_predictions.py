@@ -3,14 +3,21 @@ Predict the labels for all points in all scenes of the validation dataset.
 Here we apply our bigger cuboids to get better predictions of the points at the border of subsets.
 """
 
+from concurrent.futures import ThreadPoolExecutor
+
 import numpy as np
 import tensorflow as tf
 from attention_points.scannet_dataset import precompute_dataset
 from typing import Tuple, List
 
 N_POINTS = 8192
+EXPORT_WORKERS = 4  # number of scenes exported in parallel while the model predicts the next scenes
+
+# lookup table from the ScanNet labels (0-20) to the NYU-40 labels, unannotated points are mapped to 1 (wall)
+NYU40_LUT = np.array([1, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 14, 16, 24, 28, 33, 34, 36, 39], dtype=np.uint8)
 
 output_path_predictions = "/home/tim/results/for_visualization"
+output_path_benchmark = "/home/tim/results/predictions_colors"
 baseline_path = "/home/tim/training_log/pointnet_and_features/long_run1563786310_continued_train"
 color_path = "/home/tim/training_log/baseline/color_test_run_1563999967_train"
 advanced_baseline_path = "/home/tim/training_log/baseline/long_run1563533884_train"
@@ -44,25 +51,76 @@ def map_to_nyu40(labels: np.ndarray) -> np.ndarray:
     :param labels: labels in the ScanNet format (1-20) in the shape (Nx1)
     :return: labels in the NYU-40 format (Nx1)
     """
-    labels = np.array(labels)
-    nyu40_labels = {1: 1, 2: 2, 3: 3, 4: 4, 5: 5, 6: 6, 7: 7, 8: 8, 9: 9, 10: 10, 11: 11, 12: 12, 13: 14, 14: 16,
-                    15: 24, 16: 28,
-                    17: 33, 18: 34, 19: 36, 20: 39}
-    for i in range(len(labels)):
-        labels[i] = nyu40_labels.get(labels[i], 1)
-    return labels
+    labels = np.asarray(labels).astype(np.int64)
+    valid = (labels >= 0) & (labels < len(NYU40_LUT))
+    return np.where(valid, NYU40_LUT[np.where(valid, labels, 0)], 1).astype(np.uint8)
 
 
 def export_ids(filename: str, ids: List):
     """
     Export the provided ids to the provided filename
+    The whole text is built in one buffer and written at once
     :param filename: Path to export to
     :param ids: Ids that should be exported
     :return:
     """
+    ids = np.asarray(ids).astype(np.int64)
     with open(filename, 'w') as f:
-        for id in ids:
-            f.write('%d\n' % id)
+        if len(ids) > 0:
+            f.write('\n'.join(ids.astype(str)) + '\n')
+
+
+def export_ids_binary(filename: str, ids: List):
+    """
+    Export the provided ids to the provided filename as numpy array (uint8)
+    These files can be read by ``evaluate.py`` instead of the text files
+    :param filename: Path to export to (.npy)
+    :param ids: Ids that should be exported
+    :return:
+    """
+    np.save(filename, np.asarray(ids).astype(np.uint8))
+
+
+def export_scene(scene_name: str, all_pred: List[np.ndarray], all_labels: List[np.ndarray],
+                 all_points: List[np.ndarray], all_masks: List[np.ndarray], all_points_orig_idxs: List[np.ndarray],
+                 binary: bool = False):
+    """
+    Maps the predictions of all chunks of a scene back to the points of the scene and stores them
+    for the visualization and in the benchmark format
+
+    :param scene_name: Name of the scene
+    :param all_pred: predicted labels of each chunk
+    :param all_labels: groundtruth labels of each chunk
+    :param all_points: points of each chunk
+    :param all_masks: masks of each chunk
+    :param all_points_orig_idxs: original point ids of each chunk
+    :param binary: Whether the benchmark labels are stored as .npy (uint8) instead of text
+    :return:
+    """
+    print("Predicted all points for scene %s and will now evaluate this scene`s predictions" % scene_name)
+    all_points = np.concatenate(all_points)
+    all_pred = np.concatenate(all_pred)
+    all_labels = np.concatenate(all_labels)
+    all_masks = np.array(np.concatenate(all_masks), dtype=bool)
+    all_points_orig_idxs = np.concatenate(all_points_orig_idxs)
+    n_points = len(np.unique(all_points_orig_idxs))
+
+    restored_labels = map_back(all_labels, all_points_orig_idxs, all_masks, (n_points))
+    restored_points = map_back(all_points, all_points_orig_idxs, all_masks, (n_points, 3))
+    remapped_pred = map_back(all_pred, all_points_orig_idxs, all_masks, (n_points))
+
+    # Storing the predictions
+    np.save(output_path_predictions + "/points/%s.npy" % scene_name, restored_points)
+    np.save(output_path_predictions + "/labels/%s.npy" % scene_name, remapped_pred)
+    np.save(output_path_predictions + "/groundtruth_labels/%s.npy" % scene_name, restored_labels)
+
+    remapped_pred = map_to_nyu40(remapped_pred)
+
+    # Output predictions in the ScanNet benchmark format
+    if binary:
+        export_ids_binary(output_path_benchmark + "/%s.npy" % scene_name, remapped_pred)
+    else:
+        export_ids(output_path_benchmark + "/%s.txt" % scene_name, remapped_pred)
 
 
 def get_validation_data(sess, test=False) -> Tuple[tf.Tensor, tf.Tensor, tf.Tensor, tf.Tensor, tf.Tensor, tf.Tensor]:
@@ -91,13 +149,15 @@ def get_validation_data(sess, test=False) -> Tuple[tf.Tensor, tf.Tensor, tf.Tens
     return val_labels, val_coordinates, val_features, scene_name, points_orig_idxs, mask
 
 
-def generate_predictions(model_save_path, features=True):
+def generate_predictions(model_save_path, features=True, binary=False):
     """
     Generate the predictions for each point in each of the validation scenes and outputs the results in the
     required ScanNet benchmark format
+    The finished scenes are exported in background threads while the model predicts the next scene
 
     :param model_save_path: Path to the saved model that should be restored for the predictions
     :param features: Whether or not the models uses additional features (colors, normals) as input or not
+    :param binary: Whether the benchmark labels are stored as .npy (uint8) instead of text
     :return:
     """
     tf.Graph().as_default()
@@ -136,54 +196,40 @@ def generate_predictions(model_save_path, features=True):
     all_masks = []
     all_points_orig_idxs = []
     current_scene = ""
-    while True:
-        pr_res, labels_res, points_res, scene, points_orig, masks = sess.run(
-            [val_pred, val_labels, val_coordinates, scene_name, points_orig_idxs, mask])
-
-        # remove single batch dimension
-        predictions_res = np.squeeze(pr_res)
-        max_pred = np.argmax(predictions_res, axis=1)
-        points_res = np.squeeze(points_res)
-        labels_res = np.squeeze(labels_res)
-        points_orig = np.squeeze(points_orig)
-        masks = np.squeeze(masks)
-
-        if scene != current_scene and current_scene != "":
-            current_scene_name = current_scene[0].decode('ascii')
-            print(
-                "Predicted all points for scene %s and will now evaluate this scene`s predictions" % current_scene_name)
-            all_points = np.concatenate(all_points)
-            all_pred = np.concatenate(all_pred)
-            all_labels = np.concatenate(all_labels)
-            all_masks = np.concatenate(all_masks)
-            all_masks = np.array(all_masks, dtype=bool)
-            all_points_orig_idxs = np.concatenate(all_points_orig_idxs)
-
-            restored_labels = map_back(all_labels, all_points_orig_idxs, all_masks,
-                                       (len(np.unique(all_points_orig_idxs))))
-            restored_points = map_back(all_points, all_points_orig_idxs, all_masks,
-                                       (len(np.unique(all_points_orig_idxs)), 3))
-            remapped_pred = map_back(all_pred, all_points_orig_idxs, all_masks,
-                                     (len(np.unique(all_points_orig_idxs))))
-
-            # Storing the predictions
-            np.save(output_path_predictions + "/points/%s.npy" % current_scene_name, restored_points)
-            np.save(output_path_predictions + "/labels/%s.npy" % current_scene_name, remapped_pred)
-            np.save(output_path_predictions + "/groundtruth_labels/%s.npy" % current_scene_name, restored_labels)
-
-            remapped_pred = map_to_nyu40(remapped_pred)
-
-            # Output predictions in the ScanNet benchmark format
-            output_predictions = "/home/tim/results/predictions_colors/%s.txt" % current_scene[0].decode('ascii')
-            util_3d.export_ids(output_predictions, remapped_pred)
-
-            all_pred, all_labels, all_points, all_points_orig_idxs, all_masks = [], [], [], [], []
-        all_pred.append(max_pred)
-        all_labels.append(labels_res)
-        all_points.append(points_res)
-        all_points_orig_idxs.append(points_orig)
-        all_masks.append(masks)
-        current_scene = scene
+    export_executor = ThreadPoolExecutor(max_workers=EXPORT_WORKERS)
+    export_futures = []
+    try:
+        while True:
+            pr_res, labels_res, points_res, scene, points_orig, masks = sess.run(
+                [val_pred, val_labels, val_coordinates, scene_name, points_orig_idxs, mask])
+
+            # remove single batch dimension
+            predictions_res = np.squeeze(pr_res)
+            max_pred = np.argmax(predictions_res, axis=1)
+            points_res = np.squeeze(points_res)
+            labels_res = np.squeeze(labels_res)
+            points_orig = np.squeeze(points_orig)
+            masks = np.squeeze(masks)
+
+            if scene != current_scene and current_scene != "":
+                current_scene_name = current_scene[0].decode('ascii')
+                export_futures.append(export_executor.submit(export_scene, current_scene_name, all_pred, all_labels,
+                                                             all_points, all_masks, all_points_orig_idxs, binary))
+                # raise the errors of finished exports (e.g. disk full) instead of losing them
+                for future in [future for future in export_futures if future.done()]:
+                    future.result()
+                    export_futures.remove(future)
+                all_pred, all_labels, all_points, all_points_orig_idxs, all_masks = [], [], [], [], []
+            all_pred.append(max_pred)
+            all_labels.append(labels_res)
+            all_points.append(points_res)
+            all_points_orig_idxs.append(points_orig)
+            all_masks.append(masks)
+            current_scene = scene
+    finally:
+        export_executor.shutdown(wait=True)
+        for future in export_futures:
+            future.result()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,185 @@
+"""
+Incremental prediction of scenes which grow over time (e.g. new frames of a scan append points to a room).
+
+The scene is divided into the same 1.5 m cells as in ``scannet_dataset/complete_scene_loader.py``.
+For every cell the chunk plan (original point ids and masks of its chunks) and the predictions of its chunks are kept.
+When points are appended only the cells whose point set changed are chunked and predicted again.
+This includes the neighbouring cells whose 0.2 m border contains new points, because those points change the
+context of their chunks. The new predictions are then merged into the label array of the scene.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from attention_points.benchmark.inference_service import InferenceService
+from attention_points.scannet_dataset import complete_scene_loader, generator_dataset
+
+CELL_SIZE = 1.5  # size of the cells of the complete scene loader
+HALO = 0.2  # context around each cell used by the complete scene loader
+CELL_OFFSET = 2 ** 20  # allows negative cell indices when points are appended outside of the first bounding box
+
+model_save_path = "/home/tim/training_log/pointnet_and_features/long_run1563786310_continued_train"
+
+
+class IncrementalScenePredictor:
+    """
+    Keeps the chunk plan and the predictions of each cell of a scene and updates only the changed cells
+    """
+
+    def __init__(self, service: InferenceService, points: np.ndarray, colors: np.ndarray, normals: np.ndarray):
+        """
+        predicts the labels for all points of the scene
+
+        :param service: inference service with the restored model
+        :param points: (Nx3)
+        :param colors: (Nx3)
+        :param normals: (Nx3)
+        """
+        self.service = service
+        self.origin = np.min(points, axis=0)
+        self.points = np.zeros((0, 3), dtype=np.float32)
+        self.colors = np.zeros((0, 3), dtype=np.int32)
+        self.normals = np.zeros((0, 3), dtype=np.float32)
+        self.labels = np.zeros(0, dtype=np.int32)
+        # cell key -> (points_orig_idxs (XxK), masks (XxK), predictions (XxK))
+        self.chunk_plan: Dict[int, Tuple[np.ndarray, np.ndarray, np.ndarray]] = {}
+        self.append(points, colors, normals)
+
+    def cell_keys(self, points: np.ndarray, shift: Tuple[float, float] = (0.0, 0.0)) -> np.ndarray:
+        """
+        computes the key of the cell containing each of the (shifted) points
+
+        :param points: (Nx3)
+        :param shift: shift applied to x and y before computing the cell
+        :return: cell keys (N)
+        """
+        cells = np.floor((points[:, :2] + shift - self.origin[:2]) / CELL_SIZE).astype(np.int64) + CELL_OFFSET
+        return cells[:, 0] * (2 * CELL_OFFSET) + cells[:, 1]
+
+    def affected_cells(self, points: np.ndarray) -> np.ndarray:
+        """
+        finds all cells whose area including the 0.2 m border contains one of the points
+
+        :param points: (Nx3)
+        :return: unique cell keys
+        """
+        keys = [self.cell_keys(points, (shift_x, shift_y)) for shift_x in [-HALO, 0, HALO]
+                for shift_y in [-HALO, 0, HALO]]
+        return np.unique(np.concatenate(keys))
+
+    def predict_cell(self, key: int, point_ids: np.ndarray) -> Tuple[int, Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """
+        chunks and predicts a single cell
+
+        :param key: key of the cell
+        :param point_ids: ids of all points of the scene that lie in the cell or its border
+        :return: key, (points_orig_idxs (XxK), masks (XxK), predictions (XxK))
+        """
+        cell = np.array([key // (2 * CELL_OFFSET), key % (2 * CELL_OFFSET)]) - CELL_OFFSET
+        coordmin = np.array([self.origin[0] + cell[0] * CELL_SIZE, self.origin[1] + cell[1] * CELL_SIZE,
+                             np.min(self.points[:, 2])])
+        coordmax = np.array([coordmin[0] + CELL_SIZE, coordmin[1] + CELL_SIZE, np.max(self.points[:, 2])])
+        point_sets, color_sets, normal_sets, masks, points_orig_idxs = \
+            complete_scene_loader.get_all_subsets_with_all_points_for_scene_numpy_test(
+                self.points[point_ids], self.colors[point_ids], self.normals[point_ids], coordmin, coordmax)
+        predictions = self.service.predict_chunks(point_sets, color_sets, normal_sets)
+        return key, (point_ids[points_orig_idxs], masks.astype(bool), predictions)
+
+    def append(self, points: np.ndarray, colors: np.ndarray, normals: np.ndarray) -> Dict:
+        """
+        appends points to the scene and predicts the cells that changed
+
+        :param points: new points (Mx3)
+        :param colors: new colors (Mx3)
+        :param normals: new normals (Mx3)
+        :return: statistics of the update (recomputed and total number of chunks)
+        """
+        self.points = np.concatenate([self.points, points.astype(np.float32)])
+        self.colors = np.concatenate([self.colors, colors.astype(np.int32)])
+        self.normals = np.concatenate([self.normals, normals.astype(np.float32)])
+        self.labels = np.concatenate([self.labels, np.zeros(len(points), dtype=np.int32)])
+        keys = self.cell_keys(self.points)
+        dirty = np.intersect1d(self.affected_cells(points), keys)
+
+        # points of the scene grouped by cell, a cell and its border are covered by the 3x3 neighbour cells
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+
+        def points_of_cell_with_border(key: int) -> np.ndarray:
+            ids = []
+            for dx in [-1, 0, 1]:
+                for dy in [-1, 0, 1]:
+                    neighbour = key + dx * (2 * CELL_OFFSET) + dy
+                    start, end = np.searchsorted(sorted_keys, [neighbour, neighbour + 1])
+                    ids.append(order[start:end])
+            ids = np.sort(np.concatenate(ids))
+            cell = np.array([key // (2 * CELL_OFFSET), key % (2 * CELL_OFFSET)]) - CELL_OFFSET
+            cell_min = self.origin[:2] + cell * CELL_SIZE
+            in_border = np.all((self.points[ids, :2] >= cell_min - HALO) &
+                               (self.points[ids, :2] <= cell_min + CELL_SIZE + HALO), axis=1)
+            return ids[in_border]
+
+        # predicting the cells concurrently lets the service put their chunks into shared batches
+        with ThreadPoolExecutor(max_workers=self.service.batch_size) as executor:
+            results = list(executor.map(lambda key: self.predict_cell(key, points_of_cell_with_border(key)), dirty))
+        recomputed_chunks = 0
+        for key, plan in results:
+            self.chunk_plan[key] = plan
+            points_orig_idxs, masks, predictions = plan
+            self.labels[points_orig_idxs[masks]] = predictions[masks]
+            recomputed_chunks += len(masks)
+
+        total_chunks = sum(len(masks) for _, masks, _ in self.chunk_plan.values())
+        return {"recomputed_cells": len(dirty), "total_cells": len(self.chunk_plan),
+                "recomputed_chunks": recomputed_chunks, "total_chunks": total_chunks,
+                "recomputed_fraction": recomputed_chunks / max(total_chunks, 1)}
+
+
+def split_into_appends(points: np.ndarray, n_appends: int, radius: float = 1.0) -> List[np.ndarray]:
+    """
+    simulates the recording of a scene by holding back the points around random centers,
+    which are then appended one region after the other (like new frames of a scan)
+
+    :param points: (Nx3)
+    :param n_appends: number of appended regions
+    :param radius: radius in the xy-plane of an appended region
+    :return: list of point ids, the first entry is the initial scene followed by one entry per append
+    """
+    remaining = np.ones(len(points), dtype=bool)
+    appends = []
+    for center in points[np.random.choice(len(points), n_appends, replace=False)]:
+        region = remaining & (np.linalg.norm(points[:, :2] - center[:2], axis=1) < radius)
+        remaining &= ~region
+        appends.append(np.nonzero(region)[0])
+    return [np.nonzero(remaining)[0]] + appends
+
+
+def benchmark_appends(service: InferenceService, scene_names: List[str], n_appends: int = 5):
+    """
+    reports the fraction of chunks which is recomputed for typical appends to validation scenes
+
+    :param service: inference service with the restored model
+    :param scene_names: names of the scenes to use
+    :param n_appends: number of appends per scene
+    :return:
+    """
+    fractions = []
+    for scene_name in scene_names:
+        points, _, colors, normals = generator_dataset.load_from_scene_name(scene_name)
+        steps = split_into_appends(points, n_appends)
+        predictor = IncrementalScenePredictor(service, points[steps[0]], colors[steps[0]], normals[steps[0]])
+        for ids in steps[1:]:
+            if len(ids) == 0:
+                continue
+            stats = predictor.append(points[ids], colors[ids], normals[ids])
+            fractions.append(stats["recomputed_fraction"])
+            print(f"{scene_name}: appended {len(ids)} points, recomputed {stats['recomputed_chunks']} of "
+                  f"{stats['total_chunks']} chunks ({stats['recomputed_fraction']:.3f})")
+    print(f"mean fraction of recomputed chunks: {np.mean(fractions):.3f}")
+
+
+if __name__ == '__main__':
+    scenes = generator_dataset.scene_name_generator("val")
+    benchmark_appends(InferenceService(model_save_path), [next(scenes) for _ in range(10)])
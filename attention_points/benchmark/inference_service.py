@@ -0,0 +1,395 @@
+"""
+Local inference service that keeps a trained model loaded and predicts labels for whole scenes.
+
+The checkpoint is restored once when the service starts. Every request is cut into chunks with
+``scannet_dataset/complete_scene_loader.py``, the chunks of all concurrent requests are put into one queue
+and a single worker thread runs them through the model in shared batches.
+The predictions are mapped back to the original points exactly as in ``generate_predictions.py``.
+
+Endpoints (HTTP on localhost):
+
+    - ``POST /predict`` with a JSON body ``{"points": "...npy", "colors": "...npy", "normals": "...npy"}``
+      or ``{"ply": "..._vh_clean_2.ply"}`` containing file paths
+    - ``POST /predict`` with a binary body: either a ``.npz`` archive (``np.savez``) containing the arrays
+      ``points``, ``colors`` and ``normals`` or the bytes of a ``.ply`` file with normals
+    - ``GET /stats`` returns the latency percentiles of the finished requests and the current queue depth
+
+The predicted labels (ScanNet format, 0-20) are returned as JSON list, or as ``.npy`` bytes if the request sets
+the header ``Accept: application/octet-stream``. If the model fails on a chunk of the request (e.g. out of memory),
+the request is answered with status 500 and the service keeps serving the other requests.
+"""
+
+import io
+import json
+import queue
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import tensorflow as tf
+from plyfile import PlyData
+
+from attention_points.benchmark.generate_predictions import map_back
+from attention_points.scannet_dataset import complete_scene_loader
+
+N_POINTS = 8192
+BATCH_SIZE = 16
+MAX_BATCH_WAIT = 0.01  # seconds the worker waits for more chunks to fill up a batch
+LATENCY_WINDOW = 1000  # number of finished requests used for the latency percentiles
+
+HOST = "127.0.0.1"
+PORT = 8642
+model_save_path = "/home/tim/training_log/pointnet_and_features/long_run1563786310_continued_train"
+
+
+def read_ply_scene(file) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    reads points, colors and normals of a scene from a ply file
+    the normals must be stored in the vertex element (e.g. as computed by meshlab)
+
+    :param file: path to the ply file or file-like object
+    :return: points(Nx3), colors(Nx3), normals(Nx3)
+    """
+    ply_data = PlyData.read(file)
+    vertex = ply_data['vertex'].data
+    if 'nx' not in vertex.dtype.names:
+        raise ValueError("the ply file does not contain normal vectors")
+    points = np.stack([vertex['x'], vertex['y'], vertex['z']], axis=1).astype(np.float32)
+    colors = np.stack([vertex['red'], vertex['green'], vertex['blue']], axis=1).astype(np.int32)
+    normals = np.stack([vertex['nx'], vertex['ny'], vertex['nz']], axis=1).astype(np.float32)
+    return points, colors, normals
+
+
+def read_request_scene(body: bytes, content_type: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    parses the body of a prediction request
+
+    :param body: raw request body
+    :param content_type: content type of the request
+    :return: points(Nx3), colors(Nx3), normals(Nx3)
+    """
+    if content_type.startswith("application/json"):
+        paths = json.loads(body.decode('utf-8'))
+        if "ply" in paths:
+            return read_ply_scene(paths["ply"])
+        return np.load(paths["points"]), np.load(paths["colors"]), np.load(paths["normals"])
+    if body[:3] == b"ply":
+        return read_ply_scene(io.BytesIO(body))
+    arrays = np.load(io.BytesIO(body))
+    return arrays["points"], arrays["colors"], arrays["normals"]
+
+
+class ChunkRequest:
+    """
+    Chunks waiting for their predictions.
+    The chunks are predicted by the worker and collected here until all of them are done.
+    """
+
+    def __init__(self, point_sets: np.ndarray, color_sets: np.ndarray, normal_sets: np.ndarray):
+        """
+        :param point_sets: (XxKx3)
+        :param color_sets: (XxKx3)
+        :param normal_sets: (XxKx3)
+        """
+        self.start_time = time.time()
+        self.point_sets = point_sets
+        self.color_sets = color_sets
+        self.normal_sets = normal_sets
+        self.predictions = np.zeros(point_sets.shape[:2], dtype=np.int32)
+        self.remaining = len(point_sets)
+        self.error = None
+        self.done = threading.Event()
+
+    def set_prediction(self, chunk: int, prediction: np.ndarray):
+        """
+        stores the prediction of a chunk and finishes the request when the last chunk is done
+
+        :param chunk: index of the chunk
+        :param prediction: predicted labels of the chunk (K)
+        """
+        self.predictions[chunk] = prediction
+        self.remaining -= 1
+        if self.remaining == 0:
+            self.finish()
+            self.done.set()
+
+    def set_error(self, error: Exception):
+        """
+        finishes the request with an error, the remaining chunks are not predicted
+
+        :param error: the exception raised while predicting a chunk of the request
+        """
+        if self.error is None:
+            self.error = error
+            self.done.set()
+
+    def finish(self):
+        """
+        called after all chunks are predicted
+        """
+        pass
+
+
+class SceneRequest(ChunkRequest):
+    """
+    A single scene waiting for its predictions.
+    The scene is chunked with the complete scene loader and the predictions are mapped back to its points.
+    """
+
+    def __init__(self, points: np.ndarray, colors: np.ndarray, normals: np.ndarray,
+                 coordmin: Optional[np.ndarray] = None, coordmax: Optional[np.ndarray] = None):
+        """
+        chunks the scene with the complete scene loader
+
+        :param points: (Nx3)
+        :param colors: (Nx3)
+        :param normals: (Nx3)
+        :param coordmin: lower corner of the chunk grid (3), defaults to the minimum of the points
+        :param coordmax: upper corner of the chunk grid (3), defaults to the maximum of the points
+        """
+        self.n_points = len(points)
+        point_sets, color_sets, normal_sets, self.masks, self.points_orig_idxs = \
+            complete_scene_loader.get_all_subsets_with_all_points_for_scene_numpy_test(points, colors, normals,
+                                                                                       coordmin, coordmax)
+        super().__init__(point_sets, color_sets, normal_sets)
+        self.labels = None
+
+    def finish(self):
+        """
+        maps the predictions of all chunks back to the points of the scene
+        """
+        self.labels = map_back(self.predictions.reshape(-1), self.points_orig_idxs.reshape(-1),
+                               self.masks.reshape(-1).astype(bool), self.n_points).astype(np.int32)
+
+
+class InferenceService:
+    """
+    Owns the tensorflow session with the restored model and batches the chunks of concurrent requests
+    """
+
+    def __init__(self, model_path: str, batch_size: int = BATCH_SIZE):
+        """
+        builds the graph and restores the latest checkpoint in model_path
+
+        :param model_path: directory of the saved model
+        :param batch_size: maximal number of chunks in a batch
+        """
+        import attention_points.models.pointnet2_sem_seg_features as model
+
+        self.batch_size = batch_size
+        self.chunk_queue = queue.Queue()
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.requests_in_flight = 0
+        self.stats_lock = threading.Lock()
+
+        tf.reset_default_graph()
+        gpu_options = tf.GPUOptions(per_process_gpu_memory_fraction=0.9)
+        self.sess = tf.Session(config=tf.ConfigProto(gpu_options=gpu_options))
+        self.points_pl = tf.placeholder(tf.float32, shape=(None, N_POINTS, 3))
+        self.colors_pl = tf.placeholder(tf.float32, shape=(None, N_POINTS, 3))
+        self.normals_pl = tf.placeholder(tf.float32, shape=(None, N_POINTS, 3))
+        features = tf.concat([self.colors_pl / 255.0, self.normals_pl], 2)
+        is_training = tf.constant(False)
+        pred, _ = model.get_model(self.points_pl, features, is_training, 21)
+        self.max_pred = tf.argmax(pred, axis=2, output_type=tf.int32)
+
+        saver = tf.train.Saver()
+        saver.restore(self.sess, tf.train.latest_checkpoint(model_path))
+
+        self.worker = threading.Thread(target=self._run_batches, daemon=True)
+        self.worker.start()
+
+    def predict(self, points: np.ndarray, colors: np.ndarray, normals: np.ndarray,
+                coordmin: Optional[np.ndarray] = None, coordmax: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        predicts the labels for all points of a scene, blocks until the prediction is finished
+        if coordmin and coordmax are given, only the points inside these bounds get a prediction,
+        the other points only give context to the chunks at the border (and get label 0)
+
+        :param points: (Nx3)
+        :param colors: (Nx3)
+        :param normals: (Nx3)
+        :param coordmin: lower corner of the chunk grid (3), defaults to the minimum of the points
+        :param coordmax: upper corner of the chunk grid (3), defaults to the maximum of the points
+        :return: labels (N)
+        """
+        request = SceneRequest(points, colors, normals, coordmin, coordmax)
+        self._wait_for(request)
+        return request.labels
+
+    def predict_chunks(self, point_sets: np.ndarray, color_sets: np.ndarray, normal_sets: np.ndarray) -> np.ndarray:
+        """
+        predicts the labels for chunks which are already created, blocks until the prediction is finished
+
+        :param point_sets: (XxKx3)
+        :param color_sets: (XxKx3)
+        :param normal_sets: (XxKx3)
+        :return: labels (XxK)
+        """
+        request = ChunkRequest(point_sets, color_sets, normal_sets)
+        self._wait_for(request)
+        return request.predictions
+
+    def _wait_for(self, request: ChunkRequest):
+        """
+        queues all chunks of the request and waits until they are predicted
+        raises a RuntimeError if the prediction of a chunk failed
+
+        :param request: the request to predict
+        :return:
+        """
+        if request.remaining == 0:
+            # nothing to predict
+            request.finish()
+            return
+        with self.stats_lock:
+            self.requests_in_flight += 1
+        for chunk in range(len(request.point_sets)):
+            self.chunk_queue.put((request, chunk))
+        request.done.wait()
+        with self.stats_lock:
+            self.requests_in_flight -= 1
+            if request.error is None:
+                self.latencies.append(time.time() - request.start_time)
+        if request.error is not None:
+            raise RuntimeError(f"prediction failed: {request.error}") from request.error
+
+    def _next_batch(self) -> List[Tuple[ChunkRequest, int]]:
+        """
+        waits for the next chunk and adds further queued chunks (of any request) until the batch is full
+
+        :return: list of (request, chunk index)
+        """
+        batch = [self.chunk_queue.get()]
+        deadline = time.time() + MAX_BATCH_WAIT
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self.chunk_queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run_batches(self):
+        """
+        worker loop which runs the queued chunks through the model
+        """
+        while True:
+            # the remaining chunks of failed requests are dropped
+            batch = [(r, c) for r, c in self._next_batch() if r.error is None]
+            if not batch:
+                continue
+            try:
+                feed_dict = {self.points_pl: np.stack([r.point_sets[c] for r, c in batch]),
+                             self.colors_pl: np.stack([r.color_sets[c] for r, c in batch]),
+                             self.normals_pl: np.stack([r.normal_sets[c] for r, c in batch])}
+                predictions = self.sess.run(self.max_pred, feed_dict=feed_dict)
+            except Exception as e:
+                # e.g. chunks of a wrong shape or out of memory, the worker keeps serving the other requests
+                for request, _ in batch:
+                    request.set_error(e)
+                continue
+            for (request, chunk), prediction in zip(batch, predictions):
+                if request.error is not None:
+                    continue
+                try:
+                    request.set_prediction(chunk, prediction)
+                except Exception as e:
+                    request.set_error(e)
+
+    def stats(self) -> Dict:
+        """
+        latency percentiles of the last finished requests and current queue depth
+
+        :return: dict with the statistics
+        """
+        with self.stats_lock:
+            latencies = np.array(self.latencies)
+            requests_in_flight = self.requests_in_flight
+        stats = {"finished_requests": len(latencies),
+                 "requests_in_flight": requests_in_flight,
+                 "queued_chunks": self.chunk_queue.qsize()}
+        if len(latencies) > 0:
+            for p in [50, 90, 99]:
+                stats[f"latency_p{p}"] = float(np.percentile(latencies, p))
+        return stats
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+def make_handler(service: InferenceService):
+    """
+    creates the request handler class for the given service
+
+    :param service: the inference service answering the requests
+    :return: handler class
+    """
+
+    class InferenceRequestHandler(BaseHTTPRequestHandler):
+        def _send(self, code: int, body: bytes, content_type: str = "application/json"):
+            self.send_response(code)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/stats":
+                self._send(200, json.dumps(service.stats()).encode('utf-8'))
+            else:
+                self._send(404, b'{"error": "not found"}')
+
+        def do_POST(self):
+            if self.path != "/predict":
+                self._send(404, b'{"error": "not found"}')
+                return
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            try:
+                points, colors, normals = read_request_scene(body, self.headers.get("Content-Type", ""))
+                labels = service.predict(points, colors, normals)
+            except RuntimeError as e:
+                self._send(500, json.dumps({"error": str(e)}).encode('utf-8'))
+                return
+            except (ValueError, KeyError, OSError) as e:
+                self._send(400, json.dumps({"error": str(e)}).encode('utf-8'))
+                return
+            if self.headers.get("Accept") == "application/octet-stream":
+                buffer = io.BytesIO()
+                np.save(buffer, labels)
+                self._send(200, buffer.getvalue(), "application/octet-stream")
+            else:
+                self._send(200, json.dumps({"labels": labels.tolist()}).encode('utf-8'))
+
+    return InferenceRequestHandler
+
+
+def serve(model_path: str = model_save_path, host: str = HOST, port: int = PORT, batch_size: int = BATCH_SIZE):
+    """
+    restores the model and serves prediction requests until interrupted
+
+    :param model_path: directory of the saved model
+    :param host: host to bind to (should stay local)
+    :param port: port to listen on
+    :param batch_size: maximal number of chunks in a batch
+    :return:
+    """
+    service = InferenceService(model_path, batch_size)
+    server = ThreadingHTTPServer((host, port), make_handler(service))
+    print(f"serving predictions on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.server_close()
+
+
+if __name__ == '__main__':
+    serve()
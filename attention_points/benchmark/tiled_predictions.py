@@ -0,0 +1,160 @@
+"""
+Out-of-core prediction of the labels of point clouds which are too large to be held in memory
+(e.g. scans of complete buildings with tens of millions of points).
+
+The scene is read from memory-mapped ``.npy`` files and split into square tiles in the xy-plane.
+A tile contains all points of its area plus a halo of 0.2 m, the same border that the chunks of
+``scannet_dataset/complete_scene_loader.py`` use as context. Each tile is chunked, predicted and mapped back on its own
+and its labels are written directly into a memory-mapped output file.
+Therefore the memory usage only depends on the block size and the number of points of a single tile.
+
+Input:
+
+    - directory with ``points.npy`` (Nx3), ``colors.npy`` (Nx3) and ``normals.npy`` (Nx3)
+
+Output:
+
+    - ``labels.npy`` (N) with the predicted labels in the ScanNet format (0-20)
+"""
+
+import os
+import shutil
+import tempfile
+from typing import Tuple
+
+import numpy as np
+
+from attention_points.benchmark.inference_service import InferenceService
+
+CELL_SIZE = 1.5  # size of the cells of the complete scene loader
+HALO = 0.2  # context around each cell used by the complete scene loader
+TILE_SIZE = 10 * CELL_SIZE  # must be a multiple of the cell size to keep the chunk grid of the whole scene
+BLOCK_SIZE = 1000000  # number of points read from the memory-mapped input at once
+
+TILE_DTYPE = np.dtype([('point', np.float32, 3), ('color', np.int32, 3), ('normal', np.float32, 3),
+                       ('idx', np.int64)])
+
+input_path = "/home/tim/large_scans/building"
+model_save_path = "/home/tim/training_log/pointnet_and_features/long_run1563786310_continued_train"
+
+
+def get_bounds(points: np.ndarray, block_size: int = BLOCK_SIZE) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    computes the bounding box of the memory-mapped points block by block
+
+    :param points: memory-mapped points (Nx3)
+    :param block_size: number of points read at once
+    :return: coordmin (3), coordmax (3)
+    """
+    coordmin = np.full(3, np.inf)
+    coordmax = np.full(3, -np.inf)
+    for start in range(0, len(points), block_size):
+        block = points[start:start + block_size]
+        coordmin = np.minimum(coordmin, block.min(axis=0))
+        coordmax = np.maximum(coordmax, block.max(axis=0))
+    return coordmin, coordmax
+
+
+def split_into_tiles(points: np.ndarray, colors: np.ndarray, normals: np.ndarray, coordmin: np.ndarray,
+                     n_tiles: np.ndarray, tile_dir: str, tile_size: float = TILE_SIZE,
+                     block_size: int = BLOCK_SIZE):
+    """
+    streams over the memory-mapped scene and appends every point to the files of all tiles whose area
+    (including the halo) contains it
+    the tile files contain records of TILE_DTYPE and are named ``tile_<x>_<y>.bin``
+
+    :param points: memory-mapped points (Nx3)
+    :param colors: memory-mapped colors (Nx3)
+    :param normals: memory-mapped normals (Nx3)
+    :param coordmin: minimum of the scene (3)
+    :param n_tiles: number of tiles in x and y direction (2)
+    :param tile_dir: directory to write the tile files to
+    :param tile_size: edge length of a tile
+    :param block_size: number of points read at once
+    :return:
+    """
+    for start in range(0, len(points), block_size):
+        block = np.empty(len(points[start:start + block_size]), dtype=TILE_DTYPE)
+        block['point'] = points[start:start + block_size]
+        block['color'] = colors[start:start + block_size]
+        block['normal'] = normals[start:start + block_size]
+        block['idx'] = np.arange(start, start + len(block))
+
+        xy = block['point'][:, :2] - coordmin[:2]
+        low = np.clip(np.floor((xy - HALO) / tile_size).astype(np.int64), 0, n_tiles - 1)
+        high = np.clip(np.floor((xy + HALO) / tile_size).astype(np.int64), 0, n_tiles - 1)
+
+        # a point lies in the halo of at most one further tile per axis (tile_size > 2 * HALO)
+        all_points = np.ones(len(block), dtype=bool)
+        tile_ids, point_ids = [], []
+        for tile_x, use_x in [(low[:, 0], all_points), (high[:, 0], high[:, 0] != low[:, 0])]:
+            for tile_y, use_y in [(low[:, 1], all_points), (high[:, 1], high[:, 1] != low[:, 1])]:
+                selected = np.nonzero(use_x & use_y)[0]
+                tile_ids.append(tile_x[selected] * n_tiles[1] + tile_y[selected])
+                point_ids.append(selected)
+        tile_ids = np.concatenate(tile_ids)
+        point_ids = np.concatenate(point_ids)
+
+        order = np.argsort(tile_ids, kind='stable')
+        tile_ids, point_ids = tile_ids[order], point_ids[order]
+        unique_tiles, starts = np.unique(tile_ids, return_index=True)
+        for tile_id, points_of_tile in zip(unique_tiles, np.split(point_ids, starts[1:])):
+            tile_file = os.path.join(tile_dir, f"tile_{tile_id // n_tiles[1]}_{tile_id % n_tiles[1]}.bin")
+            with open(tile_file, "ab") as f:
+                block[points_of_tile].tofile(f)
+
+
+def predict_large_scene(service: InferenceService, scene_dir: str, output_file: str, tile_size: float = TILE_SIZE,
+                        block_size: int = BLOCK_SIZE, tmp_dir: str = None):
+    """
+    predicts the labels of a scene that does not fit into memory tile by tile
+
+    :param service: inference service with the restored model
+    :param scene_dir: directory containing points.npy, colors.npy and normals.npy
+    :param output_file: path of the .npy file to write the labels to
+    :param tile_size: edge length of a tile (multiple of the cell size)
+    :param block_size: number of points read at once
+    :param tmp_dir: directory for the temporary tile files, defaults to the system temp dir
+    :return:
+    """
+    assert tile_size % CELL_SIZE == 0, "the tile size must be a multiple of the cell size"
+    points = np.load(os.path.join(scene_dir, "points.npy"), mmap_mode='r')
+    colors = np.load(os.path.join(scene_dir, "colors.npy"), mmap_mode='r')
+    normals = np.load(os.path.join(scene_dir, "normals.npy"), mmap_mode='r')
+    assert len(points) == len(colors) == len(normals)
+
+    coordmin, coordmax = get_bounds(points, block_size)
+    n_tiles = np.maximum(np.ceil((coordmax[:2] - coordmin[:2]) / tile_size).astype(np.int64), 1)
+    print(f"splitting {len(points)} points into {n_tiles[0]}x{n_tiles[1]} tiles")
+
+    labels = np.lib.format.open_memmap(output_file, mode='w+', dtype=np.uint8, shape=(len(points),))
+    tile_dir = tempfile.mkdtemp(dir=tmp_dir)
+    try:
+        split_into_tiles(points, colors, normals, coordmin, n_tiles, tile_dir, tile_size, block_size)
+        for tile_x in range(n_tiles[0]):
+            for tile_y in range(n_tiles[1]):
+                tile_file = os.path.join(tile_dir, f"tile_{tile_x}_{tile_y}.bin")
+                if not os.path.isfile(tile_file):
+                    continue
+                tile = np.fromfile(tile_file, dtype=TILE_DTYPE)
+
+                # the points whose tile this is, all other points of the tile are only in its halo
+                tile_index = np.clip(np.floor((tile['point'][:, :2] - coordmin[:2]) / tile_size).astype(np.int64),
+                                     0, n_tiles - 1)
+                core = (tile_index[:, 0] == tile_x) & (tile_index[:, 1] == tile_y)
+                if not np.any(core):
+                    continue
+
+                tile_min = coordmin + [tile_x * tile_size, tile_y * tile_size, 0]
+                tile_max = np.minimum(coordmin + [(tile_x + 1) * tile_size, (tile_y + 1) * tile_size,
+                                                  coordmax[2] - coordmin[2]], coordmax)
+                tile_labels = service.predict(tile['point'], tile['color'], tile['normal'], tile_min, tile_max)
+                labels[tile['idx'][core]] = tile_labels[core]
+                print(f"predicted tile {tile_x}_{tile_y} with {np.sum(core)} points")
+        labels.flush()
+    finally:
+        shutil.rmtree(tile_dir)
+
+
+if __name__ == '__main__':
+    predict_large_scene(InferenceService(model_save_path), input_path, os.path.join(input_path, "labels.npy"))
@@ -0,0 +1,149 @@
+"""
+Compact store of the per-epoch metrics of training runs, written by ``train.py`` next to the tensorboard logs.
+
+All runs share one SQLite file with one row per run, split and epoch (loss, accuracy, iou, learning rate, batch norm
+decay, mean step time and the per-class IoU as float32 blob). Loading and plotting runs is a single indexed query
+instead of replaying the tensorboard event files.
+"""
+
+import os
+import sqlite3
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+COLUMNS = ['epoch', 'step', 'wall_time', 'loss', 'accuracy', 'iou', 'learning_rate', 'bn_decay', 'step_time']
+
+
+class MetricsStore:
+    """
+    appendable store of per-epoch metrics of any number of runs
+    """
+
+    def __init__(self, path: str):
+        """
+        opens the store, it is created if it does not exist
+
+        :param path: path of the SQLite file
+        """
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # autocommit, every epoch is stored immediately
+        self.connection = sqlite3.connect(path, isolation_level=None, timeout=30)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS metrics (run TEXT, split TEXT, epoch INTEGER, "
+                                "step INTEGER, wall_time REAL, loss REAL, accuracy REAL, iou REAL, "
+                                "learning_rate REAL, bn_decay REAL, step_time REAL, class_iou BLOB)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS metrics_run ON metrics (run, split, epoch)")
+
+    def log_epoch(self, run: str, split: str, epoch: int, loss: float, accuracy: float, iou: float,
+                  class_iou: Optional[np.ndarray] = None, step: Optional[int] = None,
+                  learning_rate: Optional[float] = None, bn_decay: Optional[float] = None,
+                  step_time: Optional[float] = None):
+        """
+        appends the metrics of one epoch
+
+        :param run: name of the run
+        :param split: 'train' or 'val'
+        :param epoch: index of the epoch
+        :param loss: mean loss
+        :param accuracy: mean accuracy
+        :param iou: mean iou
+        :param class_iou: iou of each class
+        :param step: global step
+        :param learning_rate: learning rate at the end of the epoch
+        :param bn_decay: batch norm decay at the end of the epoch
+        :param step_time: mean time of a training step in seconds
+        :return:
+        """
+        blob = None if class_iou is None else np.asarray(class_iou, dtype=np.float32).tobytes()
+        values = [run, split, epoch, step, time.time(), loss, accuracy, iou, learning_rate, bn_decay, step_time, blob]
+        values = [float(v) if isinstance(v, np.floating) else v for v in values]
+        self.connection.execute("INSERT INTO metrics VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", values)
+
+    def runs(self) -> List[str]:
+        """
+        :return: names of all runs in the store
+        """
+        return [row[0] for row in self.connection.execute("SELECT DISTINCT run FROM metrics ORDER BY run")]
+
+    def load(self, run: str, split: str = 'val') -> Dict[str, np.ndarray]:
+        """
+        loads the metrics of a run ordered by epoch
+
+        :param run: name of the run
+        :param split: 'train' or 'val'
+        :return: dict from column name to array (missing values are nan), 'class_iou' is (epochs x classes)
+        """
+        rows = self.connection.execute(f"SELECT {', '.join(COLUMNS)}, class_iou FROM metrics "
+                                       f"WHERE run = ? AND split = ? ORDER BY epoch", (run, split)).fetchall()
+        metrics = {column: np.array([np.nan if row[i] is None else row[i] for row in rows], dtype=np.float64)
+                   for i, column in enumerate(COLUMNS)}
+        class_ious = [np.frombuffer(row[-1], dtype=np.float32) for row in rows if row[-1] is not None]
+        metrics['class_iou'] = np.stack(class_ious) if len(class_ious) == len(rows) and rows else None
+        return metrics
+
+    def load_runs(self, runs: Optional[List[str]] = None, split: str = 'val') -> Dict[str, Dict[str, np.ndarray]]:
+        """
+        loads the metrics of several runs
+
+        :param runs: names of the runs, all runs if None
+        :param split: 'train' or 'val'
+        :return: dict from run name to its metrics (see `load`)
+        """
+        return {run: self.load(run, split) for run in (self.runs() if runs is None else runs)}
+
+    def time_to_iou(self, run: str, target_iou: float, split: str = 'val') -> Optional[float]:
+        """
+        wall-clock time until a run reaches an iou, e.g. to compare a progressive point schedule with the baseline
+
+        :param run: name of the run
+        :param target_iou: iou to reach
+        :param split: 'train' or 'val'
+        :return: seconds from the end of the first epoch of the run to the first epoch with at least `target_iou`,
+                 None if the run did not reach it
+        """
+        start = self.connection.execute("SELECT MIN(wall_time) FROM metrics WHERE run = ?", (run,)).fetchone()[0]
+        reached = self.connection.execute("SELECT MIN(wall_time) FROM metrics WHERE run = ? AND split = ? AND iou >= ?",
+                                          (run, split, target_iou)).fetchone()[0]
+        return None if reached is None else reached - start
+
+    def close(self):
+        self.connection.close()
+
+
+def plot_runs(path: str, runs: Optional[List[str]] = None, titles: Optional[List[str]] = None, split: str = 'val',
+              metric: str = 'iou', ylabel: str = "mIoU", output_file: Optional[str] = None, wall_time: bool = False):
+    """
+    plots a metric of several runs over the epochs or over the wall-clock time
+
+    :param path: path of the SQLite file
+    :param runs: names of the runs, all runs if None
+    :param titles: legend entry of each run, the run names if None
+    :param split: 'train' or 'val'
+    :param metric: element of ['loss', 'accuracy', 'iou', 'learning_rate', 'bn_decay', 'step_time']
+    :param ylabel: label for the y-axis
+    :param output_file: the plot is saved to this file if given
+    :param wall_time: the x-axis are the hours since the first epoch of each run instead of the epochs
+    :return:
+    """
+    import matplotlib.pyplot as plt
+
+    store = MetricsStore(path)
+    all_metrics = store.load_runs(runs, split)
+    store.close()
+    for idx, (run, metrics) in enumerate(all_metrics.items()):
+        x = (metrics['wall_time'] - metrics['wall_time'][0]) / 3600 if wall_time else metrics['epoch']
+        plt.plot(x, metrics[metric], label=run if titles is None else titles[idx])
+    plt.xlabel("Hours" if wall_time else "Epoch")
+    plt.ylabel(ylabel)
+    plt.legend(loc='upper left')
+    if output_file is not None:
+        plt.savefig(output_file)
+    plt.show()
+
+
+if __name__ == '__main__':
+    plot_runs('/home/tim/training_log/metrics.sqlite')
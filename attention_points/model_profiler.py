@@ -0,0 +1,252 @@
+"""
+Peak memory and step time of a training step of the model variants, for the attention variants also with the
+recomputation of the attention activations in the backward pass (gradient checkpointing).
+
+Every measurement runs in a fresh process, so that the peak memory of one configuration does not include the ones
+before. On a GPU the peak of the tensorflow allocator is reported, on the CPU the peak resident set size of the process.
+
+`find_batch_size` increases the batch size of a variant until a step runs out of memory and recommends the batch size
+with the highest throughput (chunks per second). The results are stored in ``BATCH_SIZE_FILE``, ``train.py`` uses the
+recommended batch size of its variant if no batch size is given.
+"""
+
+import json
+import multiprocessing
+import os
+import resource
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Optional, Tuple
+
+import tensorflow as tf
+
+from attention_points.models import pointnet2_sem_seg_features, pointnet2_sem_seg_attention, \
+    pointnet2_sem_seg_attention_single_layer, pointnet2_sem_seg_attention_and_pooling
+from pointnet2_tensorflow.models import pointnet2_sem_seg
+
+N_POINTS = 8192
+BATCH_SIZE = 16
+# fraction of the GPU memory used by tensorflow, for the measurements and for the training
+GPU_MEMORY_FRACTION = 0.9
+BATCH_SIZE_FILE = '/home/tim/training_log/batch_sizes.json'
+MODEL_VARIANTS = ['pointnet2_sem_seg', 'pointnet2_sem_seg_features', 'pointnet2_sem_seg_attention',
+                  'pointnet2_sem_seg_attention_and_pooling', 'pointnet2_sem_seg_attention_single_layer']
+# variants with attention layers, only these support `recompute`
+RECOMPUTE_VARIANTS = MODEL_VARIANTS[2:]
+
+
+def build_train_step(variant: str, batch_size: int, n_points: int = N_POINTS,
+                     recompute: bool = False) -> Tuple[tf.Operation, tf.Tensor]:
+    """
+    builds a training step of a model variant on random inputs in the default graph
+
+    :param variant: element of MODEL_VARIANTS
+    :param batch_size: batch size
+    :param n_points: number of points per chunk
+    :param recompute: recompute the attention activations in the backward pass
+    :return: train operation, loss
+    """
+    assert not recompute or variant in RECOMPUTE_VARIANTS, f"{variant} has no attention layers to recompute"
+    points = tf.random_uniform((batch_size, n_points, 3))
+    labels = tf.random_uniform((batch_size, n_points), maxval=21, dtype=tf.int32)
+    is_training = tf.Variable(True, trainable=False)
+    bn_decay = tf.constant(0.5)
+
+    if variant == 'pointnet2_sem_seg':
+        pred, _ = pointnet2_sem_seg.get_model(points, is_training, 21, bn_decay=bn_decay)
+    elif variant == 'pointnet2_sem_seg_features':
+        features = tf.random_uniform((batch_size, n_points, 6))
+        pred, _ = pointnet2_sem_seg_features.get_model(points, features, is_training, 21, bn_decay=bn_decay)
+    elif variant == 'pointnet2_sem_seg_attention':
+        pred, _ = pointnet2_sem_seg_attention.get_model(points, is_training, 21, bn_decay=bn_decay,
+                                                        recompute=recompute)
+    elif variant == 'pointnet2_sem_seg_attention_and_pooling':
+        pred, _ = pointnet2_sem_seg_attention_and_pooling.get_model(points, is_training, 21, bn_decay=bn_decay,
+                                                                    recompute=recompute)
+    elif variant == 'pointnet2_sem_seg_attention_single_layer':
+        pred, _ = pointnet2_sem_seg_attention_single_layer.get_model(points, 0, is_training, 21, bn_decay=bn_decay,
+                                                                     recompute=recompute)
+    else:
+        raise ValueError(f"unknown model variant {variant}")
+
+    loss = tf.losses.sparse_softmax_cross_entropy(labels=labels, logits=pred)
+    train_op = tf.train.AdamOptimizer(0.001).minimize(loss)
+    return train_op, loss
+
+
+def profile_step(variant: str, batch_size: int, n_points: int = N_POINTS, recompute: bool = False,
+                 steps: int = 5) -> Optional[Tuple[float, float]]:
+    """
+    measures the training step of a model variant in the current process
+
+    :param variant: element of MODEL_VARIANTS
+    :param batch_size: batch size
+    :param n_points: number of points per chunk
+    :param recompute: recompute the attention activations in the backward pass
+    :param steps: number of timed steps after one warm up step
+    :return: peak memory in MB and mean step time in seconds, None if the step ran out of memory
+    """
+    with tf.Graph().as_default():
+        train_op, loss = build_train_step(variant, batch_size, n_points, recompute)
+        on_gpu = tf.test.is_gpu_available()
+        if on_gpu:
+            max_bytes = tf.contrib.memory_stats.MaxBytesInUse()
+        gpu_options = tf.GPUOptions(per_process_gpu_memory_fraction=GPU_MEMORY_FRACTION)
+        with tf.Session(config=tf.ConfigProto(gpu_options=gpu_options)) as sess:
+            sess.run(tf.global_variables_initializer())
+            sess.run(tf.local_variables_initializer())
+            try:
+                sess.run(train_op)
+                start = time.time()
+                for _ in range(steps):
+                    sess.run(train_op)
+                step_time = (time.time() - start) / steps
+            except tf.errors.ResourceExhaustedError:
+                return None
+            if on_gpu:
+                peak_mb = sess.run(max_bytes) / 2 ** 20
+            else:
+                # kilobytes on linux
+                peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2 ** 10
+    return peak_mb, step_time
+
+
+def profile(variant: str, batch_size: int, n_points: int = N_POINTS, recompute: bool = False,
+            steps: int = 5) -> Optional[Tuple[float, float]]:
+    """
+    like `profile_step`, but in a fresh process
+
+    :return: peak memory in MB and mean step time in seconds, None if the step ran out of memory
+    """
+    with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context('spawn')) as executor:
+        try:
+            return executor.submit(profile_step, variant, batch_size, n_points, recompute, steps).result()
+        except (BrokenProcessPool, MemoryError):
+            # killed by the out of memory killer
+            return None
+
+
+def report_recompute(batch_size: int = BATCH_SIZE, n_points: int = N_POINTS):
+    """
+    prints peak memory and step time of the attention variants with and without recomputation
+
+    :param batch_size: batch size
+    :param n_points: number of points per chunk
+    :return:
+    """
+    for variant in RECOMPUTE_VARIANTS:
+        results = [profile(variant, batch_size, n_points, recompute) for recompute in [False, True]]
+        for recompute, result in zip([False, True], results):
+            if result is None:
+                print(f"{variant:42s} recompute {recompute!s:5s}: out of memory")
+            else:
+                print(f"{variant:42s} recompute {recompute!s:5s}: peak memory {result[0]:8.0f}MB"
+                      f"\tstep time {result[1]:.3f}s")
+        if None not in results:
+            print(f"{variant:42s} recomputation: {results[1][0] / results[0][0]:.2f}x memory, "
+                  f"{results[1][1] / results[0][1]:.2f}x step time")
+
+
+def variant_key(variant: str, recompute: bool = False) -> str:
+    """
+    :param variant: element of MODEL_VARIANTS
+    :param recompute: recompute the attention activations in the backward pass
+    :return: key of the variant in the batch size file
+    """
+    return variant + "_recompute" if recompute else variant
+
+
+def find_batch_size(variant: str, recompute: bool = False, n_points: int = N_POINTS, start: int = 4,
+                    max_batch_size: int = 256, steps: int = 3) -> Dict:
+    """
+    doubles the batch size until a step runs out of memory, then bisects between the largest fitting and the smallest
+    failing batch size
+
+    :param variant: element of MODEL_VARIANTS
+    :param recompute: recompute the attention activations in the backward pass
+    :param n_points: number of points per chunk
+    :param start: first batch size
+    :param max_batch_size: largest tried batch size
+    :param steps: number of timed steps per batch size
+    :return: dict with the device, the measurements per batch size ([peak memory in MB, step time] or None if out of
+             memory) and the recommended batch size with the highest throughput (None if even `start` does not fit)
+    """
+    measurements = {}
+
+    def fits(batch_size: int) -> bool:
+        result = profile(variant, batch_size, n_points, recompute, steps)
+        measurements[batch_size] = None if result is None else list(result)
+        print(f"{variant_key(variant, recompute)} batch size {batch_size:3d}: "
+              + ("out of memory" if result is None else f"peak memory {result[0]:.0f}MB\tstep time {result[1]:.3f}s"))
+        return result is not None
+
+    largest, smallest_failing = None, None
+    batch_size = start
+    while batch_size <= max_batch_size:
+        if not fits(batch_size):
+            smallest_failing = batch_size
+            break
+        largest = batch_size
+        batch_size *= 2
+    if largest is not None and smallest_failing is not None:
+        while smallest_failing - largest > 1:
+            middle = (largest + smallest_failing) // 2
+            if fits(middle):
+                largest = middle
+            else:
+                smallest_failing = middle
+
+    throughput = {batch_size: batch_size / result[1] for batch_size, result in measurements.items() if result}
+    return {'device': 'gpu' if tf.test.is_gpu_available() else 'cpu',
+            'batch_sizes': {str(batch_size): measurements[batch_size] for batch_size in sorted(measurements)},
+            'recommended': max(throughput, key=throughput.get) if throughput else None}
+
+
+def save_batch_size(result: Dict, variant: str, recompute: bool = False, n_points: int = N_POINTS,
+                    path: str = BATCH_SIZE_FILE):
+    """
+    stores the result of `find_batch_size` in the batch size file, the results of other variants are kept
+
+    :param result: result of `find_batch_size`
+    :param variant: element of MODEL_VARIANTS
+    :param recompute: recompute the attention activations in the backward pass
+    :param n_points: number of points per chunk
+    :param path: path of the batch size file
+    :return:
+    """
+    results = {}
+    if os.path.exists(path):
+        with open(path) as batch_size_file:
+            results = json.load(batch_size_file)
+    results.setdefault(variant_key(variant, recompute), {})[str(n_points)] = result
+    with open(path, 'w') as batch_size_file:
+        json.dump(results, batch_size_file, indent=2)
+
+
+def recommended_batch_size(variant: str, recompute: bool = False, n_points: int = N_POINTS,
+                           path: str = BATCH_SIZE_FILE, default: int = BATCH_SIZE) -> int:
+    """
+    :param variant: element of MODEL_VARIANTS
+    :param recompute: recompute the attention activations in the backward pass
+    :param n_points: number of points per chunk
+    :param path: path of the batch size file
+    :param default: batch size if the variant was not measured
+    :return: recommended batch size of the variant
+    """
+    if not os.path.exists(path):
+        return default
+    with open(path) as batch_size_file:
+        result = json.load(batch_size_file).get(variant_key(variant, recompute), {}).get(str(n_points))
+    if result is None or result['recommended'] is None:
+        return default
+    return result['recommended']
+
+
+if __name__ == '__main__':
+    report_recompute()
+    for variant in MODEL_VARIANTS:
+        for recompute in ([False, True] if variant in RECOMPUTE_VARIANTS else [False]):
+            result = find_batch_size(variant, recompute)
+            save_batch_size(result, variant, recompute)
+            print(f"{variant_key(variant, recompute)}: recommended batch size {result['recommended']}")
@@ -9,8 +9,8 @@ from pointnet2_tensorflow.utils import tf_util
 from pointnet2_tensorflow.utils.pointnet_util import pointnet_fp_module
 
 
-def get_model(point_cloud: tf.Tensor, is_training: tf.Variable, num_class: int, bn_decay=None) -> [tf.Tensor,
-                                                                                                   tf.Tensor]:
+def get_model(point_cloud: tf.Tensor, is_training: tf.Variable, num_class: int, bn_decay=None,
+              recompute: bool = False, npoint_scale: float = 1.0) -> [tf.Tensor, tf.Tensor]:
     """
     Return a PointNet++ model using Attention instead of the max-pooling operations
 
@@ -18,6 +18,8 @@ def get_model(point_cloud: tf.Tensor, is_training: tf.Variable, num_class: int,
     :param is_training: Flag whether or not the parameters should be trained or not
     :param num_class: Number of classes (e.g. 21 for ScanNet)
     :param bn_decay: BatchNorm decay
+    :param recompute: recompute the activations of the attention layers in the backward pass to save memory
+    :param npoint_scale: factor for the number of groups of the SA layers, N / 8192 for chunks with N points
     :return: predictions for each point (B x N x num_class)
     """
     end_points = {}
@@ -26,30 +28,38 @@ def get_model(point_cloud: tf.Tensor, is_training: tf.Variable, num_class: int,
     end_points['l0_xyz'] = l0_xyz
 
     # Instead of the max-pooling we use here attention as well as max-pooling together for all layers
-    l1_xyz, l1_points, l1_indices = pointnet_sa_module_attention_and_pooling(l0_xyz, l0_points, npoint=1024, radius=0.1,
+    l1_xyz, l1_points, l1_indices = pointnet_sa_module_attention_and_pooling(l0_xyz, l0_points,
+                                                                             npoint=int(1024 * npoint_scale),
+                                                                             radius=0.1,
                                                                              nsample=32,
                                                                              mlp=[32, 32, 64], mlp2=None,
                                                                              group_all=False,
                                                                              is_training=is_training, bn_decay=bn_decay,
-                                                                             scope='layer1')
-    l2_xyz, l2_points, l2_indices = pointnet_sa_module_attention_and_pooling(l1_xyz, l1_points, npoint=256, radius=0.2,
+                                                                             scope='layer1', recompute=recompute)
+    l2_xyz, l2_points, l2_indices = pointnet_sa_module_attention_and_pooling(l1_xyz, l1_points,
+                                                                             npoint=int(256 * npoint_scale),
+                                                                             radius=0.2,
                                                                              nsample=32,
                                                                              mlp=[64, 64, 128], mlp2=None,
                                                                              group_all=False,
                                                                              is_training=is_training, bn_decay=bn_decay,
-                                                                             scope='layer2')
-    l3_xyz, l3_points, l3_indices = pointnet_sa_module_attention_and_pooling(l2_xyz, l2_points, npoint=64, radius=0.4,
+                                                                             scope='layer2', recompute=recompute)
+    l3_xyz, l3_points, l3_indices = pointnet_sa_module_attention_and_pooling(l2_xyz, l2_points,
+                                                                             npoint=int(64 * npoint_scale),
+                                                                             radius=0.4,
                                                                              nsample=32,
                                                                              mlp=[128, 128, 256], mlp2=None,
                                                                              group_all=False,
                                                                              is_training=is_training, bn_decay=bn_decay,
-                                                                             scope='layer3')
-    l4_xyz, l4_points, l4_indices = pointnet_sa_module_attention_and_pooling(l3_xyz, l3_points, npoint=16, radius=0.8,
+                                                                             scope='layer3', recompute=recompute)
+    l4_xyz, l4_points, l4_indices = pointnet_sa_module_attention_and_pooling(l3_xyz, l3_points,
+                                                                             npoint=int(16 * npoint_scale),
+                                                                             radius=0.8,
                                                                              nsample=32,
                                                                              mlp=[256, 256, 512], mlp2=None,
                                                                              group_all=False,
                                                                              is_training=is_training, bn_decay=bn_decay,
-                                                                             scope='layer4')
+                                                                             scope='layer4', recompute=recompute)
 
     # Feature Propagation layers
     l3_points = pointnet_fp_module(l3_xyz, l4_xyz, l3_points, l4_points, [256, 256], is_training, bn_decay,
@@ -10,25 +10,25 @@ from pointnet2_tensorflow.utils.pointnet_util import pointnet_sa_module, pointne
 from typing import List
 
 
-def pointnet_sa_wrapper(args: List, attention=False) -> [tf.Tensor, tf.Tensor, tf.Tensor]:
+def pointnet_sa_wrapper(args: List, attention=False, recompute: bool = False) -> [tf.Tensor, tf.Tensor, tf.Tensor]:
     """
     Wraps the pointnet_sa module and depending on the attention flag either uses the max-pooling or the attention
     layer
 
     :param args: Arguments to be supplied to the pointnet_sa module
     :param attention: Whether or not attention should be used
+    :param recompute: recompute the activations of the attention layer in the backward pass to save memory
     :return: xyz and points after applying the pointNet++ sa module as well as their indices
     """
     if attention:
-        xyz, points, indices = pointnet_sa_module_attention(*args)
+        xyz, points, indices = pointnet_sa_module_attention(*args, recompute=recompute)
     else:
         xyz, points, indices = pointnet_sa_module(*args)
     return xyz, points, indices
 
 
 def get_model(point_cloud: tf.Tensor, attention_layer_idx: int, is_training: tf.Variable, num_class: int,
-              bn_decay=None) -> [tf.Tensor,
-                                 tf.Tensor]:
+              bn_decay=None, recompute: bool = False, npoint_scale: float = 1.0) -> [tf.Tensor, tf.Tensor]:
     """
     Return a PointNet++ model using Attention instead of the max-pooling operations for a single layer.
     This layer is specified with the attention_layer_idx (0-3)
@@ -38,6 +38,8 @@ def get_model(point_cloud: tf.Tensor, attention_layer_idx: int, is_training: tf.
     :param is_training: Flag whether or not the parameters should be trained or not
     :param num_class: Number of classes (e.g. 21 for ScanNet)
     :param bn_decay: BatchNorm decay
+    :param recompute: recompute the activations of the attention layer in the backward pass to save memory
+    :param npoint_scale: factor for the number of groups of the SA layers, N / 8192 for chunks with N points
     :return: predictions for each point (B x N x num_class)
     """
     assert (0 <= attention_layer_idx < 4)
@@ -47,14 +49,18 @@ def get_model(point_cloud: tf.Tensor, attention_layer_idx: int, is_training: tf.
     end_points['l0_xyz'] = l0_xyz
 
     # Instead of the max-pooling we use here attention, but only for the specified layer
-    params_l1 = [l0_xyz, l0_points, 1024, 0.1, 32, [32, 32, 64], None, False, is_training, bn_decay, 'layer1']
-    l1_xyz, l1_points, l1_indices = pointnet_sa_wrapper(params_l1, attention_layer_idx == 0)
-    params_l2 = [l1_xyz, l1_points, 256, 0.2, 32, [64, 64, 128], None, False, is_training, bn_decay, 'layer2']
-    l2_xyz, l2_points, l2_indices = pointnet_sa_wrapper(params_l2, attention_layer_idx == 1)
-    params_l3 = [l2_xyz, l2_points, 64, 0.4, 32, [128, 128, 256], None, False, is_training, bn_decay, 'layer3']
-    l3_xyz, l3_points, l3_indices = pointnet_sa_wrapper(params_l3, attention_layer_idx == 2)
-    params_l4 = [l3_xyz, l3_points, 16, 0.8, 32, [256, 256, 512], None, False, is_training, bn_decay, 'layer4']
-    l4_xyz, l4_points, l4_indices = pointnet_sa_wrapper(params_l4, attention_layer_idx == 3)
+    params_l1 = [l0_xyz, l0_points, int(1024 * npoint_scale), 0.1, 32, [32, 32, 64],
+                 None, False, is_training, bn_decay, 'layer1']
+    l1_xyz, l1_points, l1_indices = pointnet_sa_wrapper(params_l1, attention_layer_idx == 0, recompute)
+    params_l2 = [l1_xyz, l1_points, int(256 * npoint_scale), 0.2, 32, [64, 64, 128],
+                 None, False, is_training, bn_decay, 'layer2']
+    l2_xyz, l2_points, l2_indices = pointnet_sa_wrapper(params_l2, attention_layer_idx == 1, recompute)
+    params_l3 = [l2_xyz, l2_points, int(64 * npoint_scale), 0.4, 32, [128, 128, 256],
+                 None, False, is_training, bn_decay, 'layer3']
+    l3_xyz, l3_points, l3_indices = pointnet_sa_wrapper(params_l3, attention_layer_idx == 2, recompute)
+    params_l4 = [l3_xyz, l3_points, int(16 * npoint_scale), 0.8, 32, [256, 256, 512],
+                 None, False, is_training, bn_decay, 'layer4']
+    l4_xyz, l4_points, l4_indices = pointnet_sa_wrapper(params_l4, attention_layer_idx == 3, recompute)
 
     # Feature Propagation layers
     l3_points = pointnet_fp_module(l3_xyz, l4_xyz, l3_points, l4_points, [256, 256], is_training, bn_decay,
@@ -8,8 +8,8 @@ from pointnet2_tensorflow.utils import tf_util
 from pointnet2_tensorflow.utils.pointnet_util import pointnet_sa_module, pointnet_fp_module
 
 
-def get_model(point_cloud: tf.Tensor, features: tf.Tensor, is_training: tf.Variable, num_class: int, bn_decay=None) -> \
-        [tf.Tensor, tf.Tensor]:
+def get_model(point_cloud: tf.Tensor, features: tf.Tensor, is_training: tf.Variable, num_class: int, bn_decay=None,
+              npoint_scale: float = 1.0) -> [tf.Tensor, tf.Tensor]:
     """
     Return a PointNet++ model using additional features as input for the first layer
 
@@ -18,6 +18,7 @@ def get_model(point_cloud: tf.Tensor, features: tf.Tensor, is_training: tf.Varia
     :param is_training: Flag whether or not the parameters should be trained or not
     :param num_class: Number of classes (e.g. 21 for ScanNet)
     :param bn_decay: BatchNorm decay
+    :param npoint_scale: factor for the number of groups of the SA layers, N / 8192 for chunks with N points
     :return: predictions for each point (B x N x num_class)
     """
     end_points = {}
@@ -26,16 +27,20 @@ def get_model(point_cloud: tf.Tensor, features: tf.Tensor, is_training: tf.Varia
     end_points['l0_xyz'] = l0_xyz
 
     # Layer 1
-    l1_xyz, l1_points, l1_indices = pointnet_sa_module(l0_xyz, l0_points, npoint=1024, radius=0.1, nsample=32,
+    l1_xyz, l1_points, l1_indices = pointnet_sa_module(l0_xyz, l0_points, npoint=int(1024 * npoint_scale),
+                                                       radius=0.1, nsample=32,
                                                        mlp=[32, 32, 64], mlp2=None, group_all=False,
                                                        is_training=is_training, bn_decay=bn_decay, scope='layer1')
-    l2_xyz, l2_points, l2_indices = pointnet_sa_module(l1_xyz, l1_points, npoint=256, radius=0.2, nsample=32,
+    l2_xyz, l2_points, l2_indices = pointnet_sa_module(l1_xyz, l1_points, npoint=int(256 * npoint_scale),
+                                                       radius=0.2, nsample=32,
                                                        mlp=[64, 64, 128], mlp2=None, group_all=False,
                                                        is_training=is_training, bn_decay=bn_decay, scope='layer2')
-    l3_xyz, l3_points, l3_indices = pointnet_sa_module(l2_xyz, l2_points, npoint=64, radius=0.4, nsample=32,
+    l3_xyz, l3_points, l3_indices = pointnet_sa_module(l2_xyz, l2_points, npoint=int(64 * npoint_scale),
+                                                       radius=0.4, nsample=32,
                                                        mlp=[128, 128, 256], mlp2=None, group_all=False,
                                                        is_training=is_training, bn_decay=bn_decay, scope='layer3')
-    l4_xyz, l4_points, l4_indices = pointnet_sa_module(l3_xyz, l3_points, npoint=16, radius=0.8, nsample=32,
+    l4_xyz, l4_points, l4_indices = pointnet_sa_module(l3_xyz, l3_points, npoint=int(16 * npoint_scale),
+                                                       radius=0.8, nsample=32,
                                                        mlp=[256, 256, 512], mlp2=None, group_all=False,
                                                        is_training=is_training, bn_decay=bn_decay, scope='layer4')
 
@@ -1,11 +1,14 @@
 import numpy as np
 
 
-def get_all_subsets_with_all_points_for_scene_features(points, features, get_sample_weights):
+def get_all_subsets_with_all_points_for_scene_features(points, features, get_sample_weights, coordmin=None,
+                                                       coordmax=None):
     """
     numpy function to get all points of a scene grouped by chunks
     this method can be used to get values for all points of a scene e.g. the test set
     it also returns the original indices of all samples to map values or predictions back to original points
+    coordmin and coordmax can restrict the chunk grid to a part of the points (e.g. a tile of a larger scene),
+    points outside of these bounds are then only used as context for the border chunks
     :return: point_sets, feature sets, masks_sets, points_orig_idxs_sets
     """
     npoints = 8192
@@ -18,8 +21,10 @@ def get_all_subsets_with_all_points_for_scene_features(points, features, get_sam
         np.random.shuffle(order)
         return list(np.array(l)[order]), order
 
-    coordmax = np.max(points, axis=0)
-    coordmin = np.min(points, axis=0)
+    if coordmax is None:
+        coordmax = np.max(points, axis=0)
+    if coordmin is None:
+        coordmin = np.min(points, axis=0)
     nsubvolume_x = np.ceil((coordmax[0] - coordmin[0]) / 1.5).astype(np.int32)
     nsubvolume_y = np.ceil((coordmax[1] - coordmin[1]) / 1.5).astype(np.int32)
     point_sets = []
@@ -124,7 +129,7 @@ def get_all_subsets_with_all_points_for_scene_numpy(points, labels, colors, norm
            sample_weights, masks_sets, points_orig_idxs_sets
 
 
-def get_all_subsets_with_all_points_for_scene_numpy_test(points, colors, normals):
+def get_all_subsets_with_all_points_for_scene_numpy_test(points, colors, normals, coordmin=None, coordmax=None):
     point_sets, feature_sets, sample_weights, masks_sets, points_orig_idxs_sets = \
-        get_all_subsets_with_all_points_for_scene_features(points, [colors, normals], False)
+        get_all_subsets_with_all_points_for_scene_features(points, [colors, normals], False, coordmin, coordmax)
     return point_sets, feature_sets[0], feature_sets[1], masks_sets, points_orig_idxs_sets
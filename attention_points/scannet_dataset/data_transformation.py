@@ -10,6 +10,7 @@ This module contains methods to transform the dataset These transformations incl
 Some of these methods are implemented in both tensorflow and numpy.
 When executing on CPU the numpy versions are considerably faster.
 """
+import functools
 import math
 from typing import Dict, Tuple
 
@@ -352,22 +353,42 @@ def random_rotate(points: tf.Tensor, labels: tf.Tensor, colors: tf.Tensor, norma
     return rot_points, labels, colors, rot_normals, sample_weight
 
 
-def get_transformed_dataset(train: str, prefetch: bool = True, threads: int = 4):
+def keep_scene_name(transformation):
+    """
+    applies a transformation to all elements but the last one, which is the scene name and is passed through
+
+    :param transformation: tensorflow function of the dataset elements
+    :return: transformation of the elements with the scene name
+    """
+    def transformation_with_scene_name(*elements):
+        return tuple(transformation(*elements[:-1])) + (elements[-1],)
+    return transformation_with_scene_name
+
+
+def get_transformed_dataset(train: str, prefetch: bool = True, threads: int = 4, npoints: int = 8192,
+                            with_scene_name: bool = False):
     """
     tensorflow dataset, to load and transform files asynchronous
 
     :param train: one of  {"train", "val", "train_subset"}
     :param prefetch: prefetches data if True
     :param threads: number of parallel threads to use
+    :param npoints: number of points per training chunk
+    :param with_scene_name: the train chunks also contain the name of their scene
     :return:
     """
-    ds = gd.get_dataset(train)
+    ds = gd.get_dataset(train, with_scene_name)
     if prefetch:
         # prefetch loading from disk
         ds = ds.prefetch(threads)
+    if with_scene_name:
+        ds = ds.map(keep_scene_name(label_map), threads)
+        ds = ds.map(keep_scene_name(functools.partial(get_subset, npoints=npoints)), threads)
+        ds = ds.map(keep_scene_name(random_rotate), threads)
+        return ds
     ds = ds.map(label_map, threads)
     if train == "train" or train == "train_subset":
-        ds = ds.map(get_subset, threads)
+        ds = ds.map(functools.partial(get_subset, npoints=npoints), threads)
         ds = ds.map(random_rotate, threads)
     elif train == "val":
         ds = ds.map(get_all_subsets_for_scene, threads)
@@ -2,6 +2,7 @@
 this module provides several generators which yield scenes of the dataset
 these generators are used to create tensorflow datasets
 """
+import functools
 import random
 from typing import Generator, List
 
@@ -77,15 +78,19 @@ def load_from_scene_name_test(scene_name: str, pre_files_dir: str = "/home/tim/s
     return [points, colors, normals]
 
 
-def tf_train_generator() -> Generator:
+def tf_train_generator(with_scene_name: bool = False) -> Generator:
     """
     yields train scenes
 
-    :return: (points, labels, colors, normals)
+    :param with_scene_name: also yield the scene name
+    :return: (points, labels, colors, normals) or (points, labels, colors, normals, scene_name)
     """
     for scene_name in scene_name_generator("train"):
         points, labels, colors, normals = load_from_scene_name(scene_name)
-        yield (points, labels, colors, normals)
+        if with_scene_name:
+            yield (points, labels, colors, normals, scene_name)
+        else:
+            yield (points, labels, colors, normals)
 
 
 def tf_val_generator() -> Generator:
@@ -99,14 +104,19 @@ def tf_val_generator() -> Generator:
         yield (points, labels, colors, normals)
 
 
-def tf_train_subset_generator() -> Generator:
+def tf_train_subset_generator(with_scene_name: bool = False) -> Generator:
     """
     yields subset scenes
-    :return: (points, labels, colors, normals)
+
+    :param with_scene_name: also yield the scene name
+    :return: (points, labels, colors, normals) or (points, labels, colors, normals, scene_name)
     """
     for scene_name in scene_name_generator("train_subset"):
         points, labels, colors, normals = load_from_scene_name(scene_name)
-        yield (points, labels, colors, normals)
+        if with_scene_name:
+            yield (points, labels, colors, normals, scene_name)
+        else:
+            yield (points, labels, colors, normals)
 
 
 def tf_eval_generator() -> Generator:
@@ -131,13 +141,26 @@ def tf_test_generator() -> Generator:
         yield (points, colors, normals, scene_name)
 
 
-def get_dataset(train: str) -> tf.data.Dataset:
+def get_dataset(train: str, with_scene_name: bool = False) -> tf.data.Dataset:
     """
     returns a tensorflow dataset with the data specified in train
 
     :param train: can be ["train", "val", "eval", "test", "train_subset"]
+    :param with_scene_name: the train scenes also contain the scene name (only for "train" and "train_subset")
     :return: the tensorflow dataset
     """
+    if with_scene_name:
+        if train == "train":
+            gen = functools.partial(tf_train_generator, with_scene_name=True)
+        elif train == "train_subset":
+            gen = functools.partial(tf_train_subset_generator, with_scene_name=True)
+        else:
+            raise ValueError("with_scene_name is only supported for 'train' and 'train_subset'")
+        return tf.data.Dataset.from_generator(gen,
+                                              output_types=(tf.float32, tf.int32, tf.int32, tf.float32, tf.string),
+                                              output_shapes=(tf.TensorShape([None, 3]), tf.TensorShape([None]),
+                                                             tf.TensorShape([None, 3]), tf.TensorShape([None, 3]),
+                                                             tf.TensorShape([])))
     if train == "train":
         gen = tf_train_generator
         return tf.data.Dataset.from_generator(gen,
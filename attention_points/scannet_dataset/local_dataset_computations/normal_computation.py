@@ -0,0 +1,99 @@
+"""
+Computes the normal vectors of the ScanNet meshes with numpy and stores them as numpy arrays.
+This replaces the Meshlab Server (``normal_computation_meshlab.py``) and the extraction of its output
+(``normal_extraction.py``) and also runs on Linux.
+
+The normal of a vertex is the sum of the normals of its adjacent faces, weighted by the area of the faces
+(the cross product of two edges of a triangle has twice the area of the triangle as its length).
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import List, Optional
+
+import numpy as np
+
+from attention_points.scannet_dataset.local_dataset_computations.ply_ingestion import columns, read_ply_faces, \
+    read_ply_vertices
+
+
+def compute_vertex_normals(points: np.ndarray, faces: np.ndarray) -> np.ndarray:
+    """
+    computes area weighted vertex normals of a triangle mesh
+
+    :param points: vertex coordinates (Nx3)
+    :param faces: vertex indices of the triangles (Fx3)
+    :return: normalized normals (Nx3), vertices without faces get a zero vector
+    """
+    points = points.astype(np.float64)
+    faces = np.asarray(faces, dtype=np.int64)
+    face_normals = np.cross(points[faces[:, 1]] - points[faces[:, 0]], points[faces[:, 2]] - points[faces[:, 0]])
+    # scatter-add the face normals to their three vertices (bincount is much faster than np.add.at)
+    vertex_ids = faces.reshape(-1)
+    normals = np.stack([np.bincount(vertex_ids, weights=np.repeat(face_normals[:, axis], 3),
+                                    minlength=len(points)) for axis in range(3)], axis=1)
+    lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+    return (normals / np.maximum(lengths, 1e-12)).astype(np.float32)
+
+
+def compute_normals_for_file(mesh_file: str, target_dir: str) -> str:
+    """
+    computes the normals of a ply file and saves them as ``normals/<file>.npy``
+
+    :param mesh_file: path to the ``_vh_clean_2.ply`` file
+    :param target_dir: directory to store the numpy files at
+    :return: name of the file
+    """
+    file = os.path.basename(mesh_file)
+    points = columns(read_ply_vertices(mesh_file), ['x', 'y', 'z'], np.float32)
+    normals = compute_vertex_normals(points, read_ply_faces(mesh_file))
+    np.save(os.path.join(target_dir, "normals", file + ".npy"), normals)
+    return file
+
+
+def compute_normals(source_dir: str = "C:/scannet", target_dir: str = "C:/scannet-pre/",
+                    processes: Optional[int] = None):
+    """
+    computes the normals of all ply files in source_dir in parallel and saves them in target_dir
+
+    :param source_dir: directory containing the ply files (also in sub folders)
+    :param target_dir: directory to store the numpy files at
+    :param processes: number of worker processes, defaults to the number of cpus
+    :return:
+    """
+    mesh_files = [os.path.join(subdir, file) for subdir, dirs, files in os.walk(source_dir) for file in files
+                  if file.endswith("_vh_clean_2.ply")]
+    os.makedirs(os.path.join(target_dir, "normals"), exist_ok=True)
+
+    start = time.time()
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        for i, file in enumerate(executor.map(partial(compute_normals_for_file, target_dir=target_dir), mesh_files)):
+            print(f"computed normals of {file} ({i + 1}/{len(mesh_files)}, "
+                  f"{(i + 1) / (time.time() - start):.2f} files/s)")
+
+
+def compare_with_meshlab(scene_files: List[str], source_dir: str = "C:/scannet",
+                         meshlab_dir: str = "C:/scannet_normal"):
+    """
+    compares the normals computed with numpy to the normals computed by the Meshlab Server
+
+    :param scene_files: names of the ply files to compare, e.g. ['scene0000_00_vh_clean_2.ply']
+    :param source_dir: directory containing the scan folders with the original ply files
+    :param meshlab_dir: directory containing the ply files written by the Meshlab Server
+    :return:
+    """
+    for file in scene_files:
+        mesh_file = os.path.join(source_dir, file[:-len("_vh_clean_2.ply")], file)
+        points = columns(read_ply_vertices(mesh_file), ['x', 'y', 'z'], np.float32)
+        normals = compute_vertex_normals(points, read_ply_faces(mesh_file))
+        meshlab_normals = columns(read_ply_vertices(os.path.join(meshlab_dir, file)), ['nx', 'ny', 'nz'],
+                                  np.float32)
+        cos = np.clip(np.sum(normals * meshlab_normals, axis=1), -1, 1)
+        angles = np.degrees(np.arccos(cos))
+        print(f"{file}: mean angle {np.mean(angles):.3f} deg, max angle {np.max(angles):.3f} deg, "
+              f"{np.mean(angles > 1) * 100:.2f}% of the normals differ by more than 1 deg")
+
+
+if __name__ == '__main__':
+    compute_normals()
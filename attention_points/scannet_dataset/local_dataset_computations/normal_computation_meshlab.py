@@ -1,6 +1,7 @@
 """
 This script allows to use a Meshlab Server to compute and extract normal vectors from ply files
 This script is designed for Windows commands, to adapt the commands, see https://github.com/TheNerdJedi/MeshlabAuto
+Note: normal_computation.py computes the same normals with numpy without the Meshlab Server
 """
 import os
 import subprocess
@@ -0,0 +1,205 @@
+"""
+Converts the ScanNet ply files of all scans to the numpy arrays used by our data pipeline in a single pass.
+
+Instead of reading the whole file with ``PlyData.read`` and copying every property into a new array,
+the header of a binary ply file is parsed once and the vertex block is mapped with ``np.memmap``.
+Points, colors, labels and normals of a scene are written together and the scans are processed by a process pool.
+
+Input (per scan, either in one folder or in one sub folder per scan):
+
+    - ``<scene>_vh_clean_2.ply`` with points and colors (and normals, if computed with meshlab)
+    - ``<scene>_vh_clean_2.labels.ply`` with the labels (missing for the test scans)
+    - optionally ``<normals_dir>/<scene>_vh_clean_2.ply`` with normals computed by meshlab,
+      without normals in either file they are computed from the faces of the mesh (``normal_computation.py``)
+
+Output (same naming as expected by ``scannet_dataset/generator_dataset.py``):
+
+    - ``points/<scene>.npy``, ``labels/<scene>.npy``, ``colors/<scene>_vh_clean_2.ply.npy``,
+      ``normals/<scene>_vh_clean_2.ply.npy`` for labeled scans
+    - ``points/<scene>_vh_clean_2.ply.npy``, ``colors/...``, ``normals/...`` for test scans
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+PLY_TYPES: Dict[str, str] = {'char': 'i1', 'int8': 'i1', 'uchar': 'u1', 'uint8': 'u1', 'short': 'i2', 'int16': 'i2',
+                             'ushort': 'u2', 'uint16': 'u2', 'int': 'i4', 'int32': 'i4', 'uint': 'u4', 'uint32': 'u4',
+                             'float': 'f4', 'float32': 'f4', 'double': 'f8', 'float64': 'f8'}
+
+
+def read_ply_header(filename: str) -> Tuple[str, List[Tuple[str, int, List[List[str]]]], int]:
+    """
+    parses the header of a ply file
+
+    :param filename: path to ply file
+    :return: format, elements as (name, count, properties), length of the header in bytes
+    """
+    elements = []
+    with open(filename, 'rb') as f:
+        if f.readline().strip() != b'ply':
+            raise ValueError(f"{filename} is not a ply file")
+        ply_format = None
+        while True:
+            line = f.readline()
+            if not line:
+                raise ValueError(f"{filename} has no end_header")
+            words = line.decode('ascii').split()
+            if not words or words[0] in ('comment', 'obj_info'):
+                continue
+            if words[0] == 'end_header':
+                break
+            if words[0] == 'format':
+                ply_format = words[1]
+            elif words[0] == 'element':
+                elements.append((words[1], int(words[2]), []))
+            elif words[0] == 'property':
+                elements[-1][2].append(words[1:])
+        return ply_format, elements, f.tell()
+
+
+def element_dtype(properties: List[List[str]], ply_format: str) -> np.dtype:
+    """
+    numpy dtype of an element with only scalar properties
+
+    :param properties: properties of the element as in the header, e.g. ['float', 'x']
+    :param ply_format: binary_little_endian or binary_big_endian
+    :return: structured dtype of one element record
+    """
+    byte_order = '<' if ply_format == 'binary_little_endian' else '>'
+    if any(p[0] == 'list' for p in properties):
+        raise ValueError("elements with list properties have no fixed size")
+    return np.dtype([(p[1], byte_order + PLY_TYPES[p[0]]) for p in properties])
+
+
+def read_ply_vertices(filename: str) -> np.ndarray:
+    """
+    maps the vertex block of a binary ply file without reading the rest of the file
+
+    :param filename: path to ply file
+    :return: structured array (memory-mapped) with one record per vertex
+    """
+    ply_format, elements, offset = read_ply_header(filename)
+    if ply_format not in ('binary_little_endian', 'binary_big_endian'):
+        raise ValueError(f"{filename}: only binary ply files are supported, not {ply_format}")
+    for name, count, properties in elements:
+        dtype = element_dtype(properties, ply_format)
+        if name == 'vertex':
+            return np.memmap(filename, dtype=dtype, mode='r', offset=offset, shape=(count,))
+        offset += count * dtype.itemsize
+    raise ValueError(f"{filename} has no vertex element")
+
+
+def read_ply_faces(filename: str) -> np.ndarray:
+    """
+    maps the face block of a binary ply file of a triangle mesh (as the ScanNet meshes)
+
+    :param filename: path to ply file
+    :return: vertex indices of the triangles (Fx3)
+    """
+    ply_format, elements, offset = read_ply_header(filename)
+    if ply_format not in ('binary_little_endian', 'binary_big_endian'):
+        raise ValueError(f"{filename}: only binary ply files are supported, not {ply_format}")
+    byte_order = '<' if ply_format == 'binary_little_endian' else '>'
+    for name, count, properties in elements:
+        if name == 'face':
+            if len(properties) != 1 or properties[0][0] != 'list':
+                raise ValueError(f"{filename}: the faces must only have a list of vertex indices")
+            _, count_type, index_type, _ = properties[0]
+            # all faces are triangles, so every record has the same size
+            dtype = np.dtype([('count', byte_order + PLY_TYPES[count_type]),
+                              ('vertex_indices', byte_order + PLY_TYPES[index_type], (3,))])
+            faces = np.memmap(filename, dtype=dtype, mode='r', offset=offset, shape=(count,))
+            if np.any(faces['count'] != 3):
+                raise ValueError(f"{filename}: only triangle meshes are supported")
+            return faces['vertex_indices']
+        offset += count * element_dtype(properties, ply_format).itemsize
+    raise ValueError(f"{filename} has no face element")
+
+
+def columns(vertices: np.ndarray, names: List[str], dtype) -> np.ndarray:
+    """
+    copies some properties of the vertices into one array
+
+    :param vertices: structured vertex array
+    :param names: names of the properties, e.g. ['x', 'y', 'z']
+    :param dtype: dtype of the result
+    :return: array (NxK)
+    """
+    result = np.empty((len(vertices), len(names)), dtype=dtype)
+    for i, name in enumerate(names):
+        result[:, i] = vertices[name]
+    return result
+
+
+def ingest_scan(mesh_file: str, target_dir: str, normals_dir: Optional[str] = None) -> str:
+    """
+    reads the mesh file of a scan together with its label file (and normals) and stores all arrays
+
+    :param mesh_file: path to the ``_vh_clean_2.ply`` file
+    :param target_dir: directory to store the numpy files at
+    :param normals_dir: directory containing ply files with normals (meshlab output), the normals are computed from
+                        the mesh faces if neither this directory nor the mesh file contains them
+    :return: name of the scene
+    """
+    file = os.path.basename(mesh_file)
+    scene_name = file[:-len("_vh_clean_2.ply")]
+    vertices = read_ply_vertices(mesh_file)
+    points = columns(vertices, ['x', 'y', 'z'], np.float32)
+    colors = columns(vertices, ['red', 'green', 'blue'], int)
+
+    if 'nx' in vertices.dtype.names:
+        normals = columns(vertices, ['nx', 'ny', 'nz'], np.float32)
+    elif normals_dir is not None and os.path.isfile(os.path.join(normals_dir, file)):
+        normals = columns(read_ply_vertices(os.path.join(normals_dir, file)), ['nx', 'ny', 'nz'], np.float32)
+    else:
+        # imported here, normal_computation imports the ply readers of this module
+        from attention_points.scannet_dataset.local_dataset_computations.normal_computation import \
+            compute_vertex_normals
+        normals = compute_vertex_normals(points, read_ply_faces(mesh_file))
+
+    label_file = mesh_file[:-len(".ply")] + ".labels.ply"
+    if os.path.isfile(label_file):
+        labels = np.array(read_ply_vertices(label_file)['label'])
+        assert len(labels) == len(points)
+        np.save(os.path.join(target_dir, "points", scene_name + ".npy"), points)
+        np.save(os.path.join(target_dir, "labels", scene_name + ".npy"), labels)
+    else:
+        np.save(os.path.join(target_dir, "points", file + ".npy"), points)
+    np.save(os.path.join(target_dir, "colors", file + ".npy"), colors)
+    assert len(normals) == len(points)
+    np.save(os.path.join(target_dir, "normals", file + ".npy"), normals)
+    return scene_name
+
+
+def ingest_scans(source_dir: str = "C:/scannet", target_dir: str = "C:/scannet-pre/",
+                 normals_dir: Optional[str] = None, processes: Optional[int] = None):
+    """
+    converts all scans in source_dir in parallel and reports the throughput
+
+    :param source_dir: directory containing the ply files (also in sub folders)
+    :param target_dir: directory to store the numpy files at
+    :param normals_dir: directory containing ply files with normals (meshlab output)
+    :param processes: number of worker processes, defaults to the number of cpus
+    :return:
+    """
+    mesh_files = [os.path.join(subdir, file) for subdir, dirs, files in os.walk(source_dir) for file in files
+                  if file.endswith("_vh_clean_2.ply")]
+    for sub_dir in ["points", "labels", "colors", "normals"]:
+        os.makedirs(os.path.join(target_dir, sub_dir), exist_ok=True)
+
+    start = time.time()
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        for i, scene_name in enumerate(executor.map(partial(ingest_scan, target_dir=target_dir,
+                                                            normals_dir=normals_dir), mesh_files)):
+            elapsed = time.time() - start
+            print(f"converted {scene_name} ({i + 1}/{len(mesh_files)}, {(i + 1) / elapsed:.2f} files/s)")
+    elapsed = time.time() - start
+    print(f"converted {len(mesh_files)} scans in {elapsed:.1f}s ({len(mesh_files) / max(elapsed, 1e-9):.2f} files/s)")
+
+
+if __name__ == '__main__':
+    ingest_scans()
@@ -1,10 +1,15 @@
 """
 This module provides methods to precompute, save and load training data.
 This allows to speed up training, as the random subscenes do not have to be generated on the fly.
+
+`LossSampler` replaces the uniform replay of the precomputed training chunks: scenes with a high recent loss are drawn
+more often and their chunks get importance weights, so that the expected gradient stays the same.
 """
+import functools
 import os.path
 import pickle
-from typing import Generator
+import threading
+from typing import Generator, Optional, Tuple
 
 import numpy as np
 import tensorflow as tf
@@ -19,7 +24,8 @@ def precompute_train_data(epochs: int, elements_per_epoch: int, out_dir: str, da
     files saved are a tuple of numpy arrays:
     (points(Nx3), labels(N), colors(N,3), normals(Nx3), sample_weight(N))
     N is the number of points needed by the model (default 8192)
-    naming scheme: epoch-scene.pickle
+    naming scheme: epoch-index.pickle, the scenes are shuffled in every epoch so the index does not identify a scene.
+    If the dataset also contains the scene names (``with_scene_name``), the scheme is epoch-index-scene.pickle
 
     :param epochs: number of epochs to precompute (random chunks do not cover whole scenes, set >=20)
     :param elements_per_epoch: number of elements loaded from dataset for a single epoch
@@ -33,12 +39,13 @@ def precompute_train_data(epochs: int, elements_per_epoch: int, out_dir: str, da
     data_iterator = tf.data.Iterator.from_structure(dataset.output_types, dataset.output_shapes)
     train_data_init = data_iterator.make_initializer(dataset)
     sess.run(train_data_init)
-    points, labels, colors, normals, sample_weight = data_iterator.get_next()
+    elements = data_iterator.get_next()
     for i in range(epochs):
         for j in range(elements_per_epoch):
-            points_val, labels_val, colors_val, normals_val, sample_weight_val = sess.run(
-                [points, labels, colors, normals, sample_weight])
-            filename = f"{out_dir}/{i + add_epoch:03d}-{j:04d}.pickle"
+            values = sess.run(elements)
+            points_val, labels_val, colors_val, normals_val, sample_weight_val = values[:5]
+            scene_suffix = f"-{values[5].decode('utf-8')}" if len(values) > 5 else ""
+            filename = f"{out_dir}/{i + add_epoch:03d}-{j:04d}{scene_suffix}.pickle"
             if not os.path.isfile(filename):
                 with open(filename, "wb")as file:
                     pickle.dump((points_val, labels_val, colors_val, normals_val, sample_weight_val), file)
@@ -146,30 +153,50 @@ def test_dataset_from_generator() -> tf.data.Dataset:
                                                          tf.TensorShape([None])))
 
 
-def precomputed_train_data_generator(dir: str = "/home/tim/data/train_precomputed") -> Generator:
+def subsample_chunk(chunk: Tuple[np.ndarray, ...], n_points: Optional[int]) -> Tuple[np.ndarray, ...]:
+    """
+    random subset of the points of a chunk, for training with fewer points per chunk
+
+    :param chunk: (points(NX3), labels(N), colors(Nx3), normals(Nx3), sample_weight(N))
+    :param n_points: number of points to keep, the chunk is not changed if this is None or at least N
+    :return: chunk with `n_points` points
+    """
+    if n_points is None or n_points >= len(chunk[0]):
+        return chunk
+    choice = np.sort(np.random.choice(len(chunk[0]), n_points, replace=False))
+    return tuple(array[choice] for array in chunk)
+
+
+def precomputed_train_data_generator(dir: str = "/home/tim/data/train_precomputed", n_points: Optional[int] = None,
+                                     start: int = 0) -> Generator:
     """
     iterates over precomputed train data and yields single chunks
 
     :param dir: directory of precomputed train data
+    :param n_points: number of points per chunk, the chunks are randomly subsampled if they have more points
+    :param start: index of the first chunk, e.g. to continue the stream of an earlier training stage
     :return: (points(NX3), labels(N), colors(Nx3), normals(Nx3), sample_weight(N))
     """
-    file_list = sorted(os.listdir(dir))
+    file_list = [filename for filename in sorted(os.listdir(dir)) if filename.endswith(".pickle")]
+    start = start % len(file_list)
     while True:
-        for filename in file_list:
-            if filename.endswith(".pickle"):
-                file = (os.path.join(dir, filename))
-                with open(file, "rb") as file:
-                    points_val, labels_val, colors_val, normals_val, sample_weight_val = pickle.load(file)
-                    yield points_val, labels_val, colors_val, normals_val, sample_weight_val
+        for filename in file_list[start:]:
+            file = (os.path.join(dir, filename))
+            with open(file, "rb") as file:
+                points_val, labels_val, colors_val, normals_val, sample_weight_val = pickle.load(file)
+                yield subsample_chunk((points_val, labels_val, colors_val, normals_val, sample_weight_val), n_points)
+        start = 0
 
 
-def get_precomputed_train_data_set() -> tf.data.Dataset:
+def get_precomputed_train_data_set(n_points: Optional[int] = None, start: int = 0) -> tf.data.Dataset:
     """
     tensorflow dataset from precomputed train data generator
 
+    :param n_points: number of points per chunk, the chunks are randomly subsampled if they have more points
+    :param start: index of the first chunk
     :return: tf dataset
     """
-    gen = precomputed_train_data_generator
+    gen = functools.partial(precomputed_train_data_generator, n_points=n_points, start=start)
     return tf.data.Dataset.from_generator(gen,
                                           output_types=(tf.float32, tf.int32, tf.int32, tf.float32, tf.float32),
                                           output_shapes=(tf.TensorShape([None, 3]), tf.TensorShape([None]),
@@ -177,6 +204,135 @@ def get_precomputed_train_data_set() -> tf.data.Dataset:
                                                          tf.TensorShape([None])))
 
 
+class LossSampler:
+    """
+    draws the chunks of the next epoch with probability proportional to the smoothed loss of their scene
+
+    Every precomputed epoch holds a different random chunk of each scene, so a single chunk file is only seen once
+    every precomputed epochs. The loss is therefore smoothed per scene, which is read from the epoch-index-scene.pickle
+    names written by `precompute_train_data` with scene names, and a drawn scene yields its next chunk. For files
+    without a scene name (epoch-index.pickle) every file is its own group and the loss rarely recurs. The train loop
+    feeds the loss of every chunk back with `update`, the data set generators call `draw` once per epoch. They run in
+    different threads.
+    """
+
+    def __init__(self, dir: str = "/home/tim/data/train_precomputed", smoothing: float = 0.9,
+                 uniform_mix: float = 0.1, beta: float = 1.0):
+        """
+        :param dir: directory of precomputed train data
+        :param smoothing: factor of the exponential moving average of the loss of a scene
+        :param uniform_mix: fraction of the uniform distribution in the sampling distribution, bounds the importance
+                            weights by 1 / uniform_mix
+        :param beta: exponent of the importance weights, 1 corrects the sampling bias completely, 0 not at all
+        """
+        file_list = [filename for filename in sorted(os.listdir(dir)) if filename.endswith(".pickle")]
+        groups = {}
+        for filename in file_list:
+            name_parts = filename[:-len(".pickle")].split("-", 2)
+            key = name_parts[2] if len(name_parts) == 3 else filename
+            groups.setdefault(key, []).append(os.path.join(dir, filename))
+        self.scenes = sorted(groups)
+        self.chunk_files = [groups[scene] for scene in self.scenes]
+        self.next_chunk = np.zeros(len(self.scenes), dtype=np.int64)
+        # one epoch draws as many chunks as one precomputed epoch holds
+        self.chunks_per_epoch = len(file_list) // len({filename.split("-")[0] for filename in file_list})
+        self.smoothing = smoothing
+        self.uniform_mix = uniform_mix
+        self.beta = beta
+        # smoothed loss of each scene, nan until the first loss of the scene is known
+        self.loss = np.full(len(self.scenes), np.nan)
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.scenes)
+
+    def probabilities(self) -> np.ndarray:
+        """
+        :return: sampling probability of each scene, scenes without a loss get the mean known loss
+        """
+        with self.lock:
+            loss = self.loss.copy()
+        if np.all(np.isnan(loss)):
+            return np.full(len(self), 1 / len(self))
+        loss[np.isnan(loss)] = np.nanmean(loss)
+        loss = np.maximum(loss, 0)
+        if loss.sum() == 0:
+            return np.full(len(self), 1 / len(self))
+        return (1 - self.uniform_mix) * loss / loss.sum() + self.uniform_mix / len(self)
+
+    def draw(self, n: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        draws scenes with replacement
+
+        :param n: number of drawn scenes, one epoch if None
+        :return: indices of the scenes (n), importance weights (n)
+        """
+        p = self.probabilities()
+        indices = np.random.choice(len(self), self.chunks_per_epoch if n is None else n, p=p)
+        weights = (1 / (len(self) * p[indices])) ** self.beta
+        return indices, weights.astype(np.float32)
+
+    def next_chunk_file(self, index: int) -> str:
+        """
+        :param index: index of a scene
+        :return: path of the next chunk of the scene, the chunks of a scene are cycled
+        """
+        with self.lock:
+            chunk = self.next_chunk[index]
+            self.next_chunk[index] += 1
+        files = self.chunk_files[index]
+        return files[chunk % len(files)]
+
+    def update(self, indices: np.ndarray, losses: np.ndarray):
+        """
+        side channel from the train loop, records the losses of the chunks of a batch
+
+        :param indices: indices of the scenes of the chunks (B)
+        :param losses: loss of each chunk (B)
+        :return:
+        """
+        with self.lock:
+            for index, loss in zip(indices, losses):
+                if np.isnan(self.loss[index]):
+                    self.loss[index] = loss
+                else:
+                    self.loss[index] = self.smoothing * self.loss[index] + (1 - self.smoothing) * loss
+
+
+def loss_sampled_train_data_generator(sampler: LossSampler, n_points: Optional[int] = None) -> Generator:
+    """
+    yields the chunks of the scenes drawn by the sampler, one epoch is drawn at a time
+
+    :param sampler: sampler of the train scenes
+    :param n_points: number of points per chunk, the chunks are randomly subsampled if they have more points
+    :return: (points(NX3), labels(N), colors(Nx3), normals(Nx3), sample_weight(N), scene index, importance weight)
+    """
+    while True:
+        indices, weights = sampler.draw()
+        for index, weight in zip(indices, weights):
+            with open(sampler.next_chunk_file(index), "rb") as file:
+                chunk = subsample_chunk(pickle.load(file), n_points)
+            yield chunk + (index, weight)
+
+
+def get_loss_sampled_train_data_set(sampler: LossSampler, n_points: Optional[int] = None) -> tf.data.Dataset:
+    """
+    tensorflow dataset from loss sampled train data generator
+
+    :param sampler: sampler of the train scenes, shared with the train loop
+    :param n_points: number of points per chunk, the chunks are randomly subsampled if they have more points
+    :return: tf dataset
+    """
+    gen = functools.partial(loss_sampled_train_data_generator, sampler, n_points)
+    return tf.data.Dataset.from_generator(gen,
+                                          output_types=(tf.float32, tf.int32, tf.int32, tf.float32, tf.float32,
+                                                        tf.int32, tf.float32),
+                                          output_shapes=(tf.TensorShape([None, 3]), tf.TensorShape([None]),
+                                                         tf.TensorShape([None, 3]), tf.TensorShape([None, 3]),
+                                                         tf.TensorShape([None]), tf.TensorShape([]),
+                                                         tf.TensorShape([])))
+
+
 def precomputed_val_data_generator(dir: str = "/home/tim/data/val_precomputed") -> Generator:
     """
     iterates over precomputed val data and yields single chunks
@@ -225,13 +381,15 @@ def precomputed_train_subset_data_generator(dir: str = "/home/tim/data/train_sub
                     yield points_val, labels_val, colors_val, normals_val, sample_weight_val
 
 
-def get_precomputed_train_subset_data_set() -> tf.data.Dataset:
+def get_precomputed_train_subset_data_set(n_points: Optional[int] = None, start: int = 0) -> tf.data.Dataset:
     """
     tensorflow dataset from precomputed subset of train data generator
 
+    :param n_points: number of points per chunk, the chunks are randomly subsampled if they have more points
+    :param start: index of the first chunk
     :return: tf dataset
     """
-    gen = precomputed_train_data_generator
+    gen = functools.partial(precomputed_train_data_generator, n_points=n_points, start=start)
     return tf.data.Dataset.from_generator(gen,
                                           output_types=(tf.float32, tf.int32, tf.int32, tf.float32, tf.float32),
                                           output_shapes=(tf.TensorShape([None, 3]), tf.TensorShape([None]),
@@ -277,5 +435,5 @@ def precompute_subset_train_data():
 
     :return:
     """
-    ds = data_transformation.get_transformed_dataset("train_subset").prefetch(4)
+    ds = data_transformation.get_transformed_dataset("train_subset", with_scene_name=True).prefetch(4)
     precompute_train_data(100, 1201 // 3, "/home/tim/data/train_subset_precomputed", ds, 0)
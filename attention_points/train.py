@@ -1,6 +1,7 @@
+import functools
 import os
 import time
-from typing import Tuple, Optional, Callable
+from typing import Tuple, Optional, Callable, List, Dict
 
 import matplotlib.pyplot as plt
 import numpy as np
@@ -8,14 +9,24 @@ import tensorflow as tf
 
 from attention_points.models import pointnet2_sem_seg_features, pointnet2_sem_seg_attention, \
     pointnet2_sem_seg_attention_single_layer
+from attention_points import model_profiler
+from attention_points.metrics_store import MetricsStore
 from attention_points.scannet_dataset import precompute_dataset
+from attention_points.visualization.label_history import LabelHistoryRecorder
 from pointnet2_tensorflow.models import pointnet2_sem_seg
+from pointnet2_tensorflow.scannet import scene_evaluator
 
 N_POINTS = 8192
+# progressive training: (first epoch, points per chunk), the SA layers sample proportionally fewer groups
+POINT_SCHEDULE = [(1, 2048), (21, 4096), (41, N_POINTS)]
 N_TRAIN_SAMPLES = 1201  # number of train scenes
 N_VAL_SAMPLES = 4542  # number of chunks in the validation set
 BATCH_SIZE = 16
 LOG_DIR = os.path.join('/home/tim/training_log/tmp%s' % int(time.time()))
+# per-epoch metrics of all runs, the run is named after its log dir
+METRICS_FILE = os.path.join(os.path.dirname(LOG_DIR), 'metrics.sqlite')
+# predictions of one validation chunk at every evaluation, for visualization/labels_during_training.py
+LABEL_HISTORY_FILE = LOG_DIR + "_labels.hist"
 
 CLASS_WEIGHTS = tf.constant([0, 2.743064592944318, 3.0830506790927132, 4.785754459526457, 4.9963745147506184,
                              4.372710774561782, 5.039124880965811, 4.86451825464344, 4.717751595568025,
@@ -24,16 +35,17 @@ CLASS_WEIGHTS = tf.constant([0, 2.743064592944318, 3.0830506790927132, 4.7857544
                              5.422955391988761, 5.433705358072363, 5.417426773812747, 4.870172044153657])
 
 
-def get_learning_rate(batch: tf.Variable) -> tf.Variable:
+def get_learning_rate(batch: tf.Variable, batch_size: int = BATCH_SIZE) -> tf.Variable:
     """
     computes learning rate from batch index
 
     :param batch: index of the current batch
+    :param batch_size: batch size
     :return: learning rate
     """
     learning_rate = tf.train.exponential_decay(
         1e-3,  # Base learning rate.
-        tf.multiply(batch, BATCH_SIZE),  # Current index into the dataset. batch * BATCH_SIZE
+        tf.multiply(batch, batch_size),  # Current index into the dataset. batch * BATCH_SIZE
         N_TRAIN_SAMPLES * 80,  # decay step original was 2000000, now it's after 45 epochs
         0.7,  # decay rate
         staircase=True)
@@ -41,16 +53,17 @@ def get_learning_rate(batch: tf.Variable) -> tf.Variable:
     return learning_rate
 
 
-def get_bn_decay(batch: tf.Variable) -> tf.Variable:
+def get_bn_decay(batch: tf.Variable, batch_size: int = BATCH_SIZE) -> tf.Variable:
     """
     computes batch norm decay from batch index
 
     :param batch: index of the current batch
+    :param batch_size: batch size
     :return: batch norm decay
     """
     bn_momentum = tf.train.exponential_decay(
         0.5,
-        tf.multiply(batch, BATCH_SIZE),
+        tf.multiply(batch, batch_size),
         N_TRAIN_SAMPLES * 80,  # decay step original was 2000000, now it's after 45 epochs
         0.5,
         staircase=True)
@@ -92,6 +105,52 @@ def get_data_tensors(data_set: tf.data.Dataset,
     data_init = iterator.make_initializer(data)
     sess.run(data_init)
     points, labels, colors, normals, sample_weight = iterator.get_next()
+    features, sample_weight = get_features_and_sample_weight(labels, colors, normals, sample_weight, color, normal)
+    return points, labels, features, sample_weight
+
+
+def get_sampled_data_tensors(data_set: tf.data.Dataset,
+                             sess: tf.Session,
+                             batch_size: int,
+                             color: bool,
+                             normal: bool) \
+        -> Tuple[tf.Tensor, tf.Tensor, Optional[tf.Tensor], tf.Tensor, tf.Tensor, tf.Tensor]:
+    """
+    like `get_data_tensors` for the loss sampled train data set, which also yields scene indices and importance weights
+
+    :param data_set: tf dataset from precompute_dataset.get_loss_sampled_train_data_set
+    :param sess: tf session
+    :param batch_size: batch size
+    :param color: include colors in features
+    :param normal: include normals in features
+    :return: points(BxNx3), labels(BxN), features(BxNx?), sample_weigth(BxN), scene indices(B), importance weights(B)
+    """
+    data = data_set.batch(batch_size).prefetch(4)
+    iterator = tf.data.Iterator.from_structure(data.output_types, data.output_shapes)
+    data_init = iterator.make_initializer(data)
+    sess.run(data_init)
+    points, labels, colors, normals, sample_weight, scene_indices, importance_weights = iterator.get_next()
+    features, sample_weight = get_features_and_sample_weight(labels, colors, normals, sample_weight, color, normal)
+    return points, labels, features, sample_weight, scene_indices, importance_weights
+
+
+def get_features_and_sample_weight(labels: tf.Tensor,
+                                   colors: tf.Tensor,
+                                   normals: tf.Tensor,
+                                   sample_weight: tf.Tensor,
+                                   color: bool,
+                                   normal: bool) -> Tuple[Optional[tf.Tensor], tf.Tensor]:
+    """
+    combines the features of a batch and weights the points with the class weights
+
+    :param labels: labels(BxN)
+    :param colors: colors(BxNx3) in [0, 255]
+    :param normals: normals(BxNx3)
+    :param sample_weight: sample weight of the chunks(BxN), points with weight 0 are ignored
+    :param color: include colors in features
+    :param normal: include normals in features
+    :return: features(BxNx?), sample_weigth(BxN)
+    """
     colors = tf.div(tf.cast(colors, tf.float32), tf.constant(255, dtype=tf.float32))
 
     if color and normal:
@@ -106,7 +165,7 @@ def get_data_tensors(data_set: tf.data.Dataset,
     mask = tf.not_equal(sample_weight, 0.0)
     mask = tf.cast(mask, tf.float32)
     sample_weight = tf.multiply(tf.gather(CLASS_WEIGHTS, labels), mask)
-    return points, labels, features, sample_weight
+    return features, sample_weight
 
 
 def get_metrics(get_model: Callable,
@@ -164,6 +223,33 @@ def get_metrics(get_model: Callable,
     return loss, acc, pred, iou_update, iou, iou_reset
 
 
+def get_chunk_loss(pred: tf.Tensor, labels: tf.Tensor, sample_weight: tf.Tensor) -> tf.Tensor:
+    """
+    weighted cross entropy of each chunk, fed back to the loss sampler
+
+    :param pred: prediction logits (BxNxC)
+    :param labels: label tensor (BxN)
+    :param sample_weight: sample weight tensor (BxN) without importance weights
+    :return: mean loss of the weighted points of each chunk (B)
+    """
+    cross_entropy = tf.nn.sparse_softmax_cross_entropy_with_logits(labels=labels, logits=pred)
+    n_weighted = tf.reduce_sum(tf.cast(tf.not_equal(sample_weight, 0.0), tf.float32), axis=1)
+    return tf.reduce_sum(cross_entropy * sample_weight, axis=1) / tf.maximum(n_weighted, 1.0)
+
+
+def points_for_epoch(epoch: int, point_schedule: List[Tuple[int, int]]) -> int:
+    """
+    :param epoch: index of the epoch (starting at 1)
+    :param point_schedule: list of (first epoch, points per chunk) sorted by the first epoch
+    :return: points per chunk in this epoch
+    """
+    n_points = point_schedule[0][1]
+    for first_epoch, stage_points in point_schedule:
+        if epoch >= first_epoch:
+            n_points = stage_points
+    return n_points
+
+
 def get_tf_summary(loss: float, acc: float, iou: float) -> tf.Summary:
     """
     creates a tf Summary with loss, accuracy and iou
@@ -189,7 +275,10 @@ def summarize_epoch(epoch: int,
                     acc_sum: float,
                     train_iou_val: float,
                     train_writer: tf.summary.FileWriter,
-                    train_iou_reset: tf.Operation):
+                    train_iou_reset: tf.Operation,
+                    metrics_store: Optional[MetricsStore] = None,
+                    class_iou: Optional[np.ndarray] = None,
+                    step_time: Optional[float] = None):
     """
     summarizes train metrics of one epoch
 
@@ -203,6 +292,9 @@ def summarize_epoch(epoch: int,
     :param train_iou_val: accumulated train iou
     :param train_writer: train summary writer
     :param train_iou_reset: operation to reset train iou
+    :param metrics_store: store for the epoch metrics (optional)
+    :param class_iou: train iou of each class
+    :param step_time: mean duration of a training step in seconds
     :return:
     """
     lr, bn_d = sess.run([learning_rate, bn_decay])
@@ -214,6 +306,9 @@ def summarize_epoch(epoch: int,
     summary.value.add(tag="learning_rate", simple_value=lr)
     summary.value.add(tag="bn_decay", simple_value=bn_d)
     train_writer.add_summary(summary, epoch)
+    if metrics_store is not None:
+        metrics_store.log_epoch(os.path.basename(LOG_DIR), "train", epoch, epoch_loss, epoch_acc, epoch_iou,
+                                class_iou=class_iou, learning_rate=lr, bn_decay=bn_d, step_time=step_time)
     # reset accumulator
     sess.run(train_iou_reset)
 
@@ -226,9 +321,16 @@ def eval_model(is_training: tf.Variable,
                val_iou_update: tf.Operation,
                val_iou: tf.Tensor,
                val_iou_reset: tf.Operation,
+               val_pred: tf.Tensor,
+               val_labels: tf.Tensor,
+               val_coordinates: tf.Tensor,
+               val_sample_weight: tf.Tensor,
                val_writer: tf.summary.FileWriter,
                epoch: int,
-               saver: tf.train.Saver) -> float:
+               saver: tf.train.Saver,
+               metrics_store: Optional[MetricsStore] = None,
+               label_recorder: Optional[LabelHistoryRecorder] = None,
+               batch_size: int = BATCH_SIZE) -> float:
     """
     evaluates model with one pass over validation set
 
@@ -240,22 +342,35 @@ def eval_model(is_training: tf.Variable,
     :param val_iou_update: val iou update operation
     :param val_iou: val iou tensor
     :param val_iou_reset: val iou reset operation
+    :param val_pred: val prediction tensor (BxNxC)
+    :param val_labels: val label tensor (BxN)
+    :param val_coordinates: val point coordinates (BxNx3), used for the voxel based metrics
+    :param val_sample_weight: val sample weight tensor (BxN), points with weight 0 are not evaluated
     :param val_writer: val summary writer
     :param epoch: index of current epoch
     :param saver: tf model saver
+    :param metrics_store: store for the epoch metrics (optional)
+    :param label_recorder: recorder of the predicted labels of one validation chunk (optional)
+    :param batch_size: batch size of the validation data
     :return: new best iou
     """
     acc_sum, loss_sum = 0, 0
+    evaluator = scene_evaluator.SceneEvaluator(21)
 
     # toggle training off
     assign_op = is_training.assign(False)
     sess.run(assign_op)
 
-    val_batches = N_VAL_SAMPLES // BATCH_SIZE
+    val_batches = N_VAL_SAMPLES // batch_size
     print(f"starting evaluation {val_batches} batches")
 
     for j in range(val_batches):
-        loss_val, acc_val, _, val_iou_val = sess.run([val_loss, val_acc, val_iou_update, val_iou])
+        loss_val, acc_val, _, val_iou_val, pred_val, labels_val, coordinates_val, sample_weight_val = sess.run(
+            [val_loss, val_acc, val_iou_update, val_iou, val_pred, val_labels, val_coordinates, val_sample_weight])
+        pred_labels_val = np.argmax(pred_val, axis=2)
+        evaluator.update(coordinates_val, labels_val, pred_labels_val, sample_weight_val, loss_val)
+        if label_recorder is not None:
+            label_recorder.observe(epoch, pred_labels_val, coordinates_val)
         print(f"\tevaluation epoch: {epoch:03d}\tbatch {j:03d} eval:"
               f"\tloss: {loss_val:.4f}\taccuracy: {acc_val:.4f}\taccumulated iou {val_iou_val:.4f}")
         acc_sum += acc_val
@@ -266,8 +381,13 @@ def eval_model(is_training: tf.Variable,
     acc = acc_sum / val_batches
     iou = val_iou_val
     summary = get_tf_summary(loss, acc, iou)
+    summary.value.add(tag="accuracy_vox", simple_value=evaluator.accuracy(vox=True))
+    summary.value.add(tag="calibrated_accuracy_vox", simple_value=evaluator.calibrated_accuracy(vox=True))
     val_writer.add_summary(summary, epoch)
-    print(f"evaluation:\tmean loss: {loss:.4f}\tmean acc: {acc:.4f}\tmean iou {iou:.4f}\n")
+    print(f"evaluation:\tmean loss: {loss:.4f}\tmean acc: {acc:.4f}\tmean iou {iou:.4f}")
+    print("\n".join(evaluator.summary("evaluation")) + "\n")
+    if metrics_store is not None:
+        metrics_store.log_epoch(os.path.basename(LOG_DIR), "val", epoch, loss, acc, iou, class_iou=evaluator.iou())
 
     # save model if it is better
     if iou > best_iou:
@@ -285,26 +405,59 @@ def eval_model(is_training: tf.Variable,
     return best_iou
 
 
-def train(epochs=1000, batch_size=BATCH_SIZE, use_color: bool = True, use_normal: bool = True,
-          use_attention: bool = False, attention_single_layer: int = -1, use_subset: bool = False, n_epochs_to_val=4):
+def train(epochs=1000, batch_size: Optional[int] = None, use_color: bool = True, use_normal: bool = True,
+          use_attention: bool = False, attention_single_layer: int = -1, use_subset: bool = False, n_epochs_to_val=4,
+          recompute: bool = False, point_schedule: Optional[List[Tuple[int, int]]] = None, loss_sampling: bool = False):
+    """
+    trains a model variant and evaluates it every `n_epochs_to_val` epochs
+
+    :param epochs: number of epochs
+    :param batch_size: batch size, the recommended batch size of model_profiler.py if None
+    :param use_color: use colors as features
+    :param use_normal: use normals as features
+    :param use_attention: use attention instead of max-pooling in all layers
+    :param attention_single_layer: if this value is not -1 than we use attention instead of
+                                   the `attention_single_layer`-th max-pooling layer
+    :param use_subset: train and validate on a subset of the data
+    :param n_epochs_to_val: number of epochs between two evaluations
+    :param recompute: recompute the attention activations in the backward pass to save memory
+    :param point_schedule: list of (first epoch, points per chunk) for progressive training, e.g. POINT_SCHEDULE,
+                           all epochs use N_POINTS if None. Validation always uses N_POINTS.
+    :param loss_sampling: draw the train scenes with probability proportional to their smoothed loss
+                          (precompute_dataset.LossSampler) instead of replaying the chunks in order, the train data
+                          has to be precomputed with scene names
+    :return:
+    """
     # make sure only valid combination
     assert use_color != use_attention, "Attention not supported in combination with the usage of color features"
     assert use_normal != use_attention, "Attention not supported in combination with the usage of color features"
     assert attention_single_layer == -1 or not use_attention, "Either attention on all or a single layer"
+    if point_schedule is None:
+        point_schedule = [(1, N_POINTS)]
+    assert len({n_points for _, n_points in point_schedule}) == len(point_schedule), "Point counts must be distinct"
 
     tf.Graph().as_default()
     tf.device('/gpu:0')
-    gpu_options = tf.GPUOptions(per_process_gpu_memory_fraction=0.9)
+    gpu_options = tf.GPUOptions(per_process_gpu_memory_fraction=model_profiler.GPU_MEMORY_FRACTION)
     sess = tf.Session(config=tf.ConfigProto(gpu_options=gpu_options))
 
-    # define train data
-    if use_subset:
-        train_data = precompute_dataset.get_precomputed_train_subset_data_set()
+    if use_normal or use_color:
+        model = pointnet2_sem_seg_features
+    elif use_attention:
+        model = pointnet2_sem_seg_attention
+    elif attention_single_layer != -1:
+        model = pointnet2_sem_seg_attention_single_layer
     else:
-        train_data = precompute_dataset.get_precomputed_train_data_set()
-
-    train_coordinates, train_labels, train_features, train_sample_weight = \
-        get_data_tensors(train_data, sess, batch_size, use_color, use_normal)
+        model = pointnet2_sem_seg
+    # TODO model
+    variant = model.__name__.split('.')[-1]
+    # the feature model is selected as soon as colors or normals are used, also with attention on a single layer
+    assert not recompute or variant in model_profiler.RECOMPUTE_VARIANTS, \
+        f"Recomputation only for attention layers, {variant} has none"
+    if batch_size is None:
+        # throughput optimal batch size of the model variant, found with model_profiler.py
+        batch_size = model_profiler.recommended_batch_size(variant, recompute, N_POINTS)
+    print(f"batch size: {batch_size}")
 
     # define validation data
     if use_subset:
@@ -317,31 +470,60 @@ def train(epochs=1000, batch_size=BATCH_SIZE, use_color: bool = True, use_normal
     # define model and metrics
     is_training = tf.Variable(True)
     step = tf.Variable(0, trainable=False)
-    bn_decay = get_bn_decay(step)
-    learning_rate = get_learning_rate(step)
+    bn_decay = get_bn_decay(step, batch_size)
+    learning_rate = get_learning_rate(step, batch_size)
 
-    if use_normal or use_color:
-        model = pointnet2_sem_seg_features
-    elif use_attention:
-        model = pointnet2_sem_seg_attention
-    elif attention_single_layer != -1:
-        model = pointnet2_sem_seg_attention_single_layer
-    else:
-        model = pointnet2_sem_seg
-    # TODO model
+    get_model = model.get_model
+    if recompute:
+        # the attention activations are recomputed in the backward pass, allows larger batches
+        get_model = functools.partial(model.get_model, recompute=True)
 
-    # train metrics
-    train_loss, train_acc, train_pred, train_iou_update, train_iou, train_iou_reset = \
-        get_metrics(model.get_model, train_coordinates, train_features, is_training, bn_decay, train_labels,
-                    train_sample_weight, True, attention_single_layer)
     optimizer = tf.train.AdamOptimizer(learning_rate)
+    batches_per_epoch = N_TRAIN_SAMPLES / batch_size
+    print(f"batches per epoch: {batches_per_epoch}")
 
-    train_op = optimizer.minimize(train_loss, global_step=step)
+    sampler = None
+    if loss_sampling:
+        # shared by the data sets of all stages, the train loop feeds the loss of each chunk back
+        sampler = precompute_dataset.LossSampler("/home/tim/data/train_subset_precomputed" if use_subset
+                                                 else "/home/tim/data/train_precomputed")
+
+    # train data, metrics and train operation of each point count, all stages share the variables
+    train_stages: Dict[int, Dict] = {}
+    for first_epoch, n_points in point_schedule:
+        if sampler is not None:
+            train_data = precompute_dataset.get_loss_sampled_train_data_set(sampler, n_points)
+            train_coordinates, train_labels, train_features, train_sample_weight, scene_indices, importance_weights = \
+                get_sampled_data_tensors(train_data, sess, batch_size, use_color, use_normal)
+            # the importance weights keep the expected gradient of the uniform sampling
+            train_loss_weight = train_sample_weight * tf.expand_dims(importance_weights, 1)
+        else:
+            # each stage continues the stream of chunks where the previous stage stopped
+            start = (first_epoch - 1) * int(batches_per_epoch) * batch_size
+            if use_subset:
+                train_data = precompute_dataset.get_precomputed_train_subset_data_set(n_points, start)
+            else:
+                train_data = precompute_dataset.get_precomputed_train_data_set(n_points, start)
+            train_coordinates, train_labels, train_features, train_sample_weight = \
+                get_data_tensors(train_data, sess, batch_size, use_color, use_normal)
+            train_loss_weight = train_sample_weight
+
+        train_loss, train_acc, train_pred, train_iou_update, train_iou, train_iou_reset = \
+            get_metrics(functools.partial(get_model, npoint_scale=n_points / N_POINTS), train_coordinates,
+                        train_features, is_training, bn_decay, train_labels, train_loss_weight, True,
+                        attention_single_layer)
+        train_op = optimizer.minimize(train_loss, global_step=step)
+        train_stages[n_points] = {'fetches': [train_op, train_loss, train_acc, train_pred, train_labels,
+                                              train_sample_weight, train_iou_update, train_iou],
+                                  'iou_reset': train_iou_reset}
+        if sampler is not None:
+            train_stages[n_points]['sampler_fetches'] = \
+                [scene_indices, get_chunk_loss(train_pred, train_labels, train_sample_weight)]
 
     # validation metrics
     val_loss, val_acc, val_pred, val_iou_update, val_iou, val_iou_reset = \
-        get_metrics(model.get_model, val_coordinates, val_features, is_training, bn_decay, val_labels,
-                    train_sample_weight, False, attention_single_layer)
+        get_metrics(get_model, val_coordinates, val_features, is_training, bn_decay, val_labels,
+                    val_sample_weight, False, attention_single_layer)
 
     # initialize variables
     variable_init = tf.global_variables_initializer()
@@ -355,19 +537,32 @@ def train(epochs=1000, batch_size=BATCH_SIZE, use_color: bool = True, use_normal
     val_writer = tf.summary.FileWriter(LOG_DIR + "_val")
     saver = tf.train.Saver()
 
-    batches_per_epoch = N_TRAIN_SAMPLES / batch_size
-    print(f"batches per epoch: {batches_per_epoch}")
-
-    acc_sum, loss_sum = 0, 0
+    acc_sum, loss_sum, step_time_sum = 0, 0, 0
     best_iou = 0
+    metrics_store = MetricsStore(METRICS_FILE)
+    train_evaluator = scene_evaluator.SceneEvaluator(21)
+    # the subset generator cycles over the first third of the validation chunks
+    label_recorder = LabelHistoryRecorder(LABEL_HISTORY_FILE, N_VAL_SAMPLES // 3 if use_subset else N_VAL_SAMPLES)
 
     # train loop
-    for i in range(int(epochs * batches_per_epoch)):
+    for i in range(epochs * int(batches_per_epoch)):
         step.assign(i)
-        epoch = int((i + 1) / batches_per_epoch) + 1
-
-        _, loss_val, acc_train, pred_train, labels_val, _, train_iou_val = sess.run(
-            [train_op, train_loss, train_acc, train_pred, train_labels, train_iou_update, train_iou])
+        # whole batches per epoch, like the epoch summaries and the stream start of each stage
+        epoch = i // int(batches_per_epoch) + 1
+        train_stage = train_stages[points_for_epoch(epoch, point_schedule)]
+
+        step_start = time.time()
+        if sampler is None:
+            _, loss_val, acc_train, pred_train, labels_val, sample_weight_val, _, train_iou_val = \
+                sess.run(train_stage['fetches'])
+        else:
+            (_, loss_val, acc_train, pred_train, labels_val, sample_weight_val, _, train_iou_val), \
+                (scene_indices_val, chunk_loss_val) = \
+                sess.run([train_stage['fetches'], train_stage['sampler_fetches']])
+            sampler.update(scene_indices_val, chunk_loss_val)
+        step_time_sum += time.time() - step_start
+        # per class iou of the epoch, points with sample weight 0 (unannotated or masked) are not evaluated
+        train_evaluator.update(None, labels_val, np.argmax(pred_train, axis=2), sample_weight_val, vox=False)
 
         acc_sum += acc_train
         loss_sum += loss_val
@@ -378,12 +573,15 @@ def train(epochs=1000, batch_size=BATCH_SIZE, use_color: bool = True, use_normal
             # end of epoch
             print(f"epoch {epoch} finished")
             summarize_epoch(epoch, sess, learning_rate, bn_decay, loss_sum, batches_per_epoch,
-                            acc_sum, train_iou_val, train_writer, train_iou_reset)
-            acc_sum, loss_sum = 0, 0
+                            acc_sum, train_iou_val, train_writer, train_stage['iou_reset'], metrics_store,
+                            train_evaluator.iou(), step_time_sum / int(batches_per_epoch))
+            acc_sum, loss_sum, step_time_sum = 0, 0, 0
+            train_evaluator.reset()
             if epoch % n_epochs_to_val == 0:
                 # pass over validation set
                 best_iou = eval_model(is_training, sess, best_iou, val_loss, val_acc, val_iou_update, val_iou,
-                                      val_iou_reset, val_writer, epoch, saver)
+                                      val_iou_reset, val_pred, val_labels, val_coordinates, val_sample_weight,
+                                      val_writer, epoch, saver, metrics_store, label_recorder, batch_size)
             print(f"starting epoch {epoch + 1}")
 
 
@@ -6,6 +6,9 @@ Plotted Models:
 - Attention Models (using attention in layer X)
 - PointNet++ with Additional Features
 
+Runs trained with the current ``train.py`` also write their epoch metrics to a ``metrics.sqlite`` file next to the logs,
+they can be plotted without reading the event files with ``attention_points.metrics_store.plot_runs``.
+
 """
 
 import matplotlib.pyplot as plt
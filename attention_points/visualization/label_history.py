@@ -0,0 +1,222 @@
+"""
+Delta-encoded history of the predicted labels of one chunk during training, read by ``labels_during_training.py``.
+
+All snapshots are appended to one binary file. The first snapshot is stored in full as uint8, later snapshots only
+store the points whose label changed as (index, new label) pairs. A snapshot is stored in full again if that is
+smaller than its delta.
+
+File layout:
+
+    - header: magic ``LBLHIST1``, number of points (uint32), points flag (uint8), points (float32 Nx3) if flag is 1
+    - records: epoch (int32), kind (uint8, 0 full, 1 delta), count (uint32), then either count uint8 labels or
+      count uint32 indices followed by count uint8 labels
+"""
+
+import os
+import struct
+from typing import Iterator, Optional, Tuple
+
+import numpy as np
+
+MAGIC = b'LBLHIST1'
+FULL = 0
+DELTA = 1
+_RECORD_HEADER = struct.Struct('<iBI')
+
+
+class LabelHistory:
+    """
+    random access reader of a label history file, the records are indexed when it is opened
+    """
+
+    def __init__(self, path: str):
+        """
+        :param path: path of the label history file
+        """
+        self.path = path
+        self.file = open(path, 'rb')
+        if self.file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a label history file")
+        self.num_points, has_points = struct.unpack('<IB', self.file.read(5))
+        self.points = None
+        if has_points:
+            self.points = np.frombuffer(self.file.read(self.num_points * 12), dtype=np.float32).reshape(-1, 3)
+
+        # index of the records: epoch, kind, count, offset of the payload
+        epochs, kinds, counts, offsets = [], [], [], []
+        file_size = os.fstat(self.file.fileno()).st_size
+        offset = self.file.tell()
+        while offset + _RECORD_HEADER.size <= file_size:
+            self.file.seek(offset)
+            epoch, kind, count = _RECORD_HEADER.unpack(self.file.read(_RECORD_HEADER.size))
+            payload = count if kind == FULL else 5 * count
+            if offset + _RECORD_HEADER.size + payload > file_size:
+                # incomplete last record of an interrupted write
+                break
+            epochs.append(epoch)
+            kinds.append(kind)
+            counts.append(count)
+            offsets.append(offset + _RECORD_HEADER.size)
+            offset += _RECORD_HEADER.size + payload
+        self.epochs = np.array(epochs, dtype=np.int64)
+        self.kinds = np.array(kinds, dtype=np.uint8)
+        self.counts = np.array(counts, dtype=np.int64)
+        self.offsets = np.array(offsets, dtype=np.int64)
+        self.end_offset = offset
+
+    def __len__(self) -> int:
+        return len(self.epochs)
+
+    def _read_record(self, i: int) -> Tuple[Optional[np.ndarray], np.ndarray]:
+        """
+        :param i: index of the record
+        :return: indices (None for a full snapshot) and labels of the record
+        """
+        self.file.seek(self.offsets[i])
+        count = self.counts[i]
+        if self.kinds[i] == FULL:
+            return None, np.frombuffer(self.file.read(count), dtype=np.uint8)
+        payload = self.file.read(5 * count)
+        return np.frombuffer(payload, dtype='<u4', count=count), np.frombuffer(payload, dtype=np.uint8, offset=4 * count)
+
+    def labels_at(self, epoch: int) -> np.ndarray:
+        """
+        labels of the last snapshot up to `epoch`, starting from the last full snapshot before it
+
+        :param epoch: epoch of the snapshot
+        :return: labels (N) as uint8
+        """
+        last = np.searchsorted(self.epochs, epoch, side='right') - 1
+        if last < 0:
+            raise KeyError(f"no snapshot up to epoch {epoch} in {self.path}")
+        first = np.flatnonzero(self.kinds[:last + 1] == FULL)[-1]
+        labels = self._read_record(first)[1].copy()
+        for i in range(first + 1, last + 1):
+            indices, new_labels = self._read_record(i)
+            if indices is None:
+                labels[:] = new_labels
+            else:
+                labels[indices] = new_labels
+        return labels
+
+    def iter_changes(self) -> Iterator[Tuple[int, np.ndarray, np.ndarray]]:
+        """
+        streams the changes of all snapshots, full snapshots change every point
+
+        :return: iterator of (epoch, indices of the changed points, new labels)
+        """
+        for i in range(len(self)):
+            indices, new_labels = self._read_record(i)
+            if indices is None:
+                indices = np.arange(self.num_points)
+            yield int(self.epochs[i]), indices, new_labels
+
+    def iter_labels(self) -> Iterator[Tuple[int, np.ndarray]]:
+        """
+        streams the labels of all snapshots, the same array is updated in place
+
+        :return: iterator of (epoch, labels)
+        """
+        labels = np.zeros(self.num_points, dtype=np.uint8)
+        for epoch, indices, new_labels in self.iter_changes():
+            labels[indices] = new_labels
+            yield epoch, labels
+
+    def close(self):
+        self.file.close()
+
+
+class LabelHistoryWriter:
+    """
+    appends label snapshots to a label history file, an existing file is continued
+    """
+
+    def __init__(self, path: str, num_points: int, points: Optional[np.ndarray] = None):
+        """
+        :param path: path of the label history file
+        :param num_points: number of points of the recorded chunk
+        :param points: points of the chunk (Nx3), stored in the header for the visualization
+        """
+        self.path = path
+        self.last_labels = None
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            history = LabelHistory(path)
+            if history.num_points != num_points:
+                raise ValueError(f"{path} has {history.num_points} points instead of {num_points}")
+            if len(history) > 0:
+                self.last_labels = history.labels_at(int(history.epochs[-1]))
+            end_offset = history.end_offset
+            history.close()
+            self.file = open(path, 'r+b')
+            # drop an incomplete last record
+            self.file.truncate(end_offset)
+            self.file.seek(end_offset)
+        else:
+            self.file = open(path, 'wb')
+            self.file.write(MAGIC)
+            self.file.write(struct.pack('<IB', num_points, points is not None))
+            if points is not None:
+                self.file.write(np.asarray(points, dtype=np.float32).reshape(num_points, 3).tobytes())
+        self.num_points = num_points
+
+    def record(self, epoch: int, labels: np.ndarray):
+        """
+        appends the snapshot of an epoch
+
+        :param epoch: epoch of the snapshot
+        :param labels: labels of all points (N)
+        :return:
+        """
+        labels = np.asarray(labels).reshape(-1).astype(np.uint8)
+        if self.last_labels is not None:
+            changed = np.flatnonzero(labels != self.last_labels).astype('<u4')
+        if self.last_labels is None or 5 * len(changed) >= self.num_points:
+            self.file.write(_RECORD_HEADER.pack(epoch, FULL, self.num_points))
+            self.file.write(labels.tobytes())
+        else:
+            self.file.write(_RECORD_HEADER.pack(epoch, DELTA, len(changed)))
+            self.file.write(changed.tobytes())
+            self.file.write(labels[changed].tobytes())
+        self.file.flush()
+        self.last_labels = labels
+
+    def close(self):
+        self.file.close()
+
+
+class LabelHistoryRecorder:
+    """
+    training hook that records the predictions of one chunk of the validation set, which is repeated endlessly
+    """
+
+    def __init__(self, path: str, num_chunks: int, chunk_index: int = 0):
+        """
+        :param path: path of the label history file
+        :param num_chunks: number of chunks in the repeated validation set
+        :param chunk_index: index of the recorded chunk
+        """
+        self.path = path
+        self.num_chunks = num_chunks
+        self.chunk_index = chunk_index
+        self.position = 0
+        self.writer = None
+
+    def observe(self, epoch: int, labels: np.ndarray, points: np.ndarray):
+        """
+        has to be called with every evaluated batch, in order
+
+        :param epoch: current epoch
+        :param labels: predicted labels of the batch (BxN)
+        :param points: points of the batch (BxNx3)
+        :return:
+        """
+        batch_index = (self.chunk_index - self.position) % self.num_chunks
+        if batch_index < len(labels):
+            if self.writer is None:
+                self.writer = LabelHistoryWriter(self.path, labels.shape[1], points[batch_index])
+            self.writer.record(epoch, labels[batch_index])
+        self.position = (self.position + len(labels)) % self.num_chunks
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
@@ -4,6 +4,10 @@ the training process
 
 Input:
 
+- Path to a label history file written by ``train.py`` (points and delta-encoded labels of every evaluation)
+
+or
+
 - Path to a pickle file containing the points of a scene
 - List of paths to pickle files containing the labels at different time steps of the training process
 """
@@ -13,14 +17,19 @@ import pickle
 import time
 from typing import List
 
+import numpy as np
 import pptk
 
+from attention_points.visualization.label_history import LabelHistory
+
 files = [os.path.join('/tmp/to_visualize1562169522_19.pickle'),
          os.path.join('/tmp/to_visualize1562169522_29.pickle'),
          os.path.join('/tmp/to_visualize1562169522_74.pickle')]
 
 scene_points = os.path.join('/tmp/to_visualize1562169522_74.pickle')
 
+label_history_file = os.path.join('/home/tim/training_log/tmp1562169522_labels.hist')
+
 g_label_names = ['unannotated', 'wall', 'floor', 'cabinet', 'bed', 'chair', 'sofa', 'table', 'door', 'window',
                  'bookshelf', 'picture', 'counter', 'desk', 'curtain', 'refrigerator', 'shower curtain', 'toilet',
                  'sink', 'bathtub', 'otherfurniture']
@@ -69,6 +78,34 @@ def animate_prediction_changes(points_path: str, files_to_visualize: List[str]):
         v2.attributes(colors)
 
 
+def animate_label_history(history_path: str, delay: float = 3):
+    """
+    animates the labels of a label history file, the snapshots are streamed and only the changed points are updated
+
+    :param history_path: path to a label history file containing the points
+    :param delay: seconds between two snapshots
+    :return:
+    """
+    history = LabelHistory(history_path)
+    color_table = np.asarray(g_label_colors, dtype=np.float32)
+    colors = np.zeros((history.num_points, 3), dtype=np.float32)
+
+    v2 = None
+    for epoch, indices, new_labels in history.iter_changes():
+        colors[indices] = color_table[new_labels]
+        if v2 is None:
+            v2 = pptk.viewer(history.points, colors)
+            v2.set(point_size=0.005)
+        else:
+            time.sleep(delay)
+            v2.attributes(colors)
+        print(f"epoch {epoch}: {len(indices)} labels changed")
+    history.close()
+
+
 if __name__ == '__main__':
     normalize_colors()
-    animate_prediction_changes(scene_points, files)
+    if os.path.exists(label_history_file):
+        animate_label_history(label_history_file)
+    else:
+        animate_prediction_changes(scene_points, files)
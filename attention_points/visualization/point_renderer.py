@@ -0,0 +1,154 @@
+"""
+Headless software renderer for point clouds, used instead of the pptk-viewer to render animation frames without a display.
+
+Points are projected with a perspective camera and drawn as disk splats whose pixel radius shrinks with the depth,
+a z-buffer keeps the nearest splat per pixel. Everything is vectorized with numpy, the only loop is over the distinct
+splat radii of a frame.
+
+The camera poses follow the convention of ``pptk.viewer.record``: ``[x, y, z, phi, theta, r]`` looks at the point
+``(x, y, z)`` from the azimuth ``phi``, the elevation ``theta`` and the distance ``r`` (z is up).
+"""
+
+import os
+from typing import Tuple, Sequence
+
+import numpy as np
+
+
+def label_color_table(label_colors: Sequence[Sequence[int]]) -> np.ndarray:
+    """
+    creates a lookup table from labels to colors
+
+    :param label_colors: list of RGB colors in range [0, 255], one for each label
+    :return: lookup table (Lx3) as uint8, colors of labels are `table[labels]`
+    """
+    return np.asarray(label_colors, dtype=np.uint8).reshape(-1, 3)
+
+
+def orbit_poses(lookat: np.ndarray, n_frames: int, theta: float = np.pi / 4, r: float = 10,
+                phi_start: float = 0, phi_end: float = 2 * np.pi) -> np.ndarray:
+    """
+    camera poses of a circular orbit around a point, the last frame is at `phi_end`
+
+    :param lookat: point the camera looks at (3)
+    :param n_frames: number of frames
+    :param theta: elevation of the camera
+    :param r: distance of the camera to `lookat`
+    :param phi_start: azimuth of the first frame
+    :param phi_end: azimuth of the last frame
+    :return: poses (n_frames x 6)
+    """
+    poses = np.zeros((n_frames, 6))
+    poses[:, 0:3] = lookat
+    poses[:, 3] = np.linspace(phi_start, phi_end, n_frames)
+    poses[:, 4] = theta
+    poses[:, 5] = r
+    return poses
+
+
+def camera_frame(pose: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    position and orientation of the camera of a pose
+
+    :param pose: camera pose `[x, y, z, phi, theta, r]`
+    :return: eye position (3), rotation (3x3) with the rows right, up and forward
+    """
+    lookat = np.asarray(pose[0:3], dtype=np.float64)
+    phi, theta, r = pose[3], pose[4], pose[5]
+    direction = np.array([np.cos(theta) * np.cos(phi), np.cos(theta) * np.sin(phi), np.sin(theta)])
+    eye = lookat + r * direction
+    forward = -direction
+    right = np.cross(forward, [0, 0, 1])
+    if np.linalg.norm(right) < 1e-8:
+        # looking straight down or up
+        right = np.array([-np.sin(phi), np.cos(phi), 0])
+    right /= np.linalg.norm(right)
+    up = np.cross(right, forward)
+    return eye, np.stack([right, up, forward])
+
+
+def disk_offsets(radius: int) -> np.ndarray:
+    """
+    pixel offsets of a disk splat
+
+    :param radius: radius in pixels (0 is a single pixel)
+    :return: offsets (Kx2) as (row, column)
+    """
+    d = np.arange(-radius, radius + 1)
+    dy, dx = np.meshgrid(d, d, indexing='ij')
+    inside = dx ** 2 + dy ** 2 <= radius ** 2 + radius
+    return np.stack([dy[inside], dx[inside]], axis=1)
+
+
+def render_points(points: np.ndarray, colors: np.ndarray, pose: np.ndarray, width: int = 800, height: int = 600,
+                  point_size: float = 0.009, fov: float = np.pi / 4, bg_color=(255, 255, 255),
+                  max_radius: int = 10) -> np.ndarray:
+    """
+    renders points with z-buffered disk splats
+
+    :param points: points (Nx3)
+    :param colors: RGB colors of the points (Nx3) in range [0, 255]
+    :param pose: camera pose `[x, y, z, phi, theta, r]`
+    :param width: image width in pixels
+    :param height: image height in pixels
+    :param point_size: diameter of a point in world units
+    :param fov: vertical field of view in radians
+    :param bg_color: RGB background color
+    :param max_radius: maximal splat radius in pixels for points close to the camera
+    :return: image (height x width x 3) as uint8
+    """
+    image = np.empty((height, width, 3), dtype=np.uint8)
+    image[:] = bg_color
+
+    eye, rotation = camera_frame(pose)
+    camera_points = (points - eye) @ rotation.T
+    depth = camera_points[:, 2]
+    visible = np.flatnonzero(depth > 1e-3)
+    depth = depth[visible]
+    focal = 0.5 * height / np.tan(fov / 2)
+    row = np.round(0.5 * height - focal * camera_points[visible, 1] / depth).astype(np.int64)
+    col = np.round(0.5 * width + focal * camera_points[visible, 0] / depth).astype(np.int64)
+    radius = np.clip(np.round(0.5 * point_size * focal / depth), 0, max_radius).astype(np.int64)
+
+    # splat pixels of all points, grouped by their radius
+    pixels, pixel_depth, pixel_point = [], [], []
+    for rad in np.unique(radius):
+        idx = np.flatnonzero(radius == rad)
+        offsets = disk_offsets(rad)
+        r = (row[idx, None] + offsets[None, :, 0]).ravel()
+        c = (col[idx, None] + offsets[None, :, 1]).ravel()
+        inside = (r >= 0) & (r < height) & (c >= 0) & (c < width)
+        pixels.append((r * width + c)[inside])
+        pixel_depth.append(np.repeat(depth[idx], len(offsets))[inside])
+        pixel_point.append(np.repeat(visible[idx], len(offsets))[inside])
+    if not pixels:
+        return image
+    pixels = np.concatenate(pixels)
+    pixel_depth = np.concatenate(pixel_depth)
+    pixel_point = np.concatenate(pixel_point)
+
+    # z-buffer: the nearest splat of each pixel
+    order = np.lexsort((pixel_depth, pixels))
+    pixels = pixels[order]
+    nearest = np.concatenate(([True], pixels[1:] != pixels[:-1]))
+    image.reshape(-1, 3)[pixels[nearest]] = colors[pixel_point[order][nearest]]
+    return image
+
+
+def render_frames(points: np.ndarray, colors: np.ndarray, poses: np.ndarray, path: str, **render_args):
+    """
+    renders one frame per pose and stores them as `frame_%03d.png` in `path` (naming of ``pptk.viewer.record``)
+
+    :param points: points (Nx3)
+    :param colors: RGB colors of the points (Nx3) in range [0, 255]
+    :param poses: camera poses (Fx6)
+    :param path: directory of the frames, it is created if it does not exist
+    :param render_args: further arguments of `render_points`
+    :return:
+    """
+    # headless backend, no display needed
+    from matplotlib import image as mpimg
+
+    os.makedirs(path, exist_ok=True)
+    for i, pose in enumerate(poses):
+        mpimg.imsave(os.path.join(path, f"frame_{i:03d}.png"), render_points(points, colors, pose, **render_args))
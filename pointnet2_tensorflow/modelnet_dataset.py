@@ -11,6 +11,7 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 ROOT_DIR = BASE_DIR
 sys.path.append(os.path.join(ROOT_DIR, 'utils'))
 import provider
+import packed_dataset
 
 def pc_normalize(pc):
     l = pc.shape[0]
@@ -21,7 +22,7 @@ def pc_normalize(pc):
     return pc
 
 class ModelNetDataset():
-    def __init__(self, root, batch_size = 32, npoints = 1024, split='train', normalize=True, normal_channel=False, modelnet10=False, cache_size=15000, shuffle=None):
+    def __init__(self, root, batch_size = 32, npoints = 1024, split='train', normalize=True, normal_channel=False, modelnet10=False, cache_size=15000, shuffle=None, packed=True, packed_dir=None):
         self.root = root
         self.batch_size = batch_size
         self.npoints = npoints
@@ -49,6 +50,13 @@ class ModelNetDataset():
         self.cache_size = cache_size # how many data points to cache in memory
         self.cache = {} # from index to (point_set, cls) tuple
 
+        # the text files are converted once to a memory-mapped archive, which replaces the cache
+        self.packed = None
+        if packed:
+            if packed_dir is None: packed_dir = os.path.join(self.root, 'packed')
+            name = '%s_%s' % ('modelnet10' if modelnet10 else 'modelnet40', split)
+            self.packed = packed_dataset.load_or_pack(os.path.join(packed_dir, name), self.datapath, self.classes, delimiter=',')
+
         if shuffle is None:
             if split == 'train': self.shuffle = True
             else: self.shuffle = False
@@ -58,22 +66,20 @@ class ModelNetDataset():
         self.reset()
 
     def _augment_batch_data(self, batch_data):
-        if self.normal_channel:
-            rotated_data = provider.rotate_point_cloud_with_normal(batch_data)
-            rotated_data = provider.rotate_perturbation_point_cloud_with_normal(rotated_data)
-        else:
-            rotated_data = provider.rotate_point_cloud(batch_data)
-            rotated_data = provider.rotate_perturbation_point_cloud(rotated_data)
-    
-        jittered_data = provider.random_scale_point_cloud(rotated_data[:,:,0:3])
-        jittered_data = provider.shift_point_cloud(jittered_data)
-        jittered_data = provider.jitter_point_cloud(jittered_data)
-        rotated_data[:,:,0:3] = jittered_data
-        return provider.shuffle_points(rotated_data)
+        return provider.augment_batch_data(batch_data, normal=self.normal_channel)
 
 
     def _get_item(self, index): 
-        if index in self.cache:
+        if self.packed is not None:
+            point_set, cls = self.packed[index]
+            # Take the first npoints
+            point_set = point_set[0:self.npoints,:]
+            if not self.normal_channel:
+                point_set = point_set[:,0:3]
+            if self.normalize:
+                point_set = np.array(point_set)
+                point_set[:,0:3] = pc_normalize(point_set[:,0:3])
+        elif index in self.cache:
             point_set, cls = self.cache[index]
         else:
             fn = self.datapath[index]
@@ -90,6 +96,15 @@ class ModelNetDataset():
                 self.cache[index] = (point_set, cls)
         return point_set, cls
         
+    def _get_packed_batch(self, idxs):
+        ''' gathers the first npoints of all samples of the batch from the packed archive at once '''
+        rows = self.packed.offsets[idxs][:,None] + np.arange(self.npoints)[None,:]
+        batch_data = self.packed.data[rows, 0:self.num_channel()].astype(np.float64)
+        if self.normalize:
+            xyz = batch_data[:,:,0:3] - np.mean(batch_data[:,:,0:3], axis=1, keepdims=True)
+            batch_data[:,:,0:3] = xyz / np.max(np.sqrt(np.sum(xyz**2, axis=2)), axis=1)[:,None,None]
+        return batch_data, self.packed.cls[idxs]
+
     def __getitem__(self, index):
         return self._get_item(index)
 
@@ -117,18 +132,25 @@ class ModelNetDataset():
         start_idx = self.batch_idx * self.batch_size
         end_idx = min((self.batch_idx+1) * self.batch_size, len(self.datapath))
         bsize = end_idx - start_idx
-        batch_data = np.zeros((bsize, self.npoints, self.num_channel()))
-        batch_label = np.zeros((bsize), dtype=np.int32)
-        for i in range(bsize):
-            ps,cls = self._get_item(self.idxs[i+start_idx])
-            batch_data[i] = ps
-            batch_label[i] = cls
+        idxs = self.idxs[start_idx:end_idx]
+        if self.packed is not None and np.all(np.diff(self.packed.offsets)[idxs] >= self.npoints):
+            batch_data, batch_label = self._get_packed_batch(idxs)
+        else:
+            batch_data = np.zeros((bsize, self.npoints, self.num_channel()))
+            batch_label = np.zeros((bsize), dtype=np.int32)
+            for i in range(bsize):
+                ps,cls = self._get_item(idxs[i])
+                batch_data[i] = ps
+                batch_label[i] = cls
         self.batch_idx += 1
         if augment: batch_data = self._augment_batch_data(batch_data)
         return batch_data, batch_label
     
 if __name__ == '__main__':
     d = ModelNetDataset(root = '../data/modelnet40_normal_resampled', split='test')
+    d_txt = ModelNetDataset(root = '../data/modelnet40_normal_resampled', split='test', packed=False)
+    print('epoch time loadtxt: %fs' % packed_dataset.time_epoch(d_txt))
+    print('epoch time packed: %fs' % packed_dataset.time_epoch(d))
     print(d.shuffle)
     print(len(d))
     import time
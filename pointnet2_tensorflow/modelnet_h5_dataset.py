@@ -7,6 +7,7 @@ import os
 import sys
 import numpy as np
 import h5py
+from concurrent.futures import ThreadPoolExecutor
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(BASE_DIR)
 ROOT_DIR = BASE_DIR
@@ -52,12 +53,15 @@ def loadDataFile(filename):
 
 
 class ModelNetH5Dataset(object):
-    def __init__(self, list_filename, batch_size = 32, npoints = 1024, shuffle=True):
+    def __init__(self, list_filename, batch_size = 32, npoints = 1024, shuffle=True, double_buffer=False):
         self.list_filename = list_filename
         self.batch_size = batch_size
         self.npoints = npoints
         self.shuffle = shuffle
         self.h5_files = getDataFiles(self.list_filename)
+        # with double buffering the next h5 file is loaded in the background while the current one is used
+        self.loader = ThreadPoolExecutor(max_workers=1) if double_buffer else None
+        self.next_file = None # (filename, future of load_h5)
         self.reset()
 
     def reset(self):
@@ -68,22 +72,29 @@ class ModelNetH5Dataset(object):
         self.current_label = None
         self.current_file_idx = 0
         self.batch_idx = 0
+        self._preload_file(0)
+
+    def _preload_file(self, file_idx):
+        if self.loader is None or file_idx >= len(self.h5_files):
+            return
+        filename = self.h5_files[self.file_idxs[file_idx]]
+        if self.next_file is None or self.next_file[0] != filename:
+            self.next_file = (filename, self.loader.submit(load_h5, filename))
    
     def _augment_batch_data(self, batch_data):
-        rotated_data = provider.rotate_point_cloud(batch_data)
-        rotated_data = provider.rotate_perturbation_point_cloud(rotated_data)
-        jittered_data = provider.random_scale_point_cloud(rotated_data[:,:,0:3])
-        jittered_data = provider.shift_point_cloud(jittered_data)
-        jittered_data = provider.jitter_point_cloud(jittered_data)
-        rotated_data[:,:,0:3] = jittered_data
-        return provider.shuffle_points(rotated_data)
+        return provider.augment_batch_data(batch_data)
 
 
     def _get_data_filename(self):
         return self.h5_files[self.file_idxs[self.current_file_idx]]
 
     def _load_data_file(self, filename):
-        self.current_data,self.current_label = load_h5(filename)
+        if self.next_file is not None and self.next_file[0] == filename:
+            self.current_data,self.current_label = self.next_file[1].result()
+        else:
+            self.current_data,self.current_label = load_h5(filename)
+        self.next_file = None
+        self._preload_file(self.current_file_idx + 1)
         self.current_label = np.squeeze(self.current_label)
         self.batch_idx = 0
         if self.shuffle:
@@ -96,7 +107,6 @@ class ModelNetH5Dataset(object):
         return 3
 
     def has_next_batch(self):
-        # TODO: add backend thread to load data
         if (self.current_data is None) or (not self._has_next_batch_in_file()):
             if self.current_file_idx >= len(self.h5_files):
                 return False
@@ -16,8 +16,9 @@ def placeholder_inputs(batch_size, num_point):
     return pointclouds_pl, labels_pl, smpws_pl
 
 
-def get_model(point_cloud, is_training, num_class, bn_decay=None):
-    """ Semantic segmentation PointNet, input is BxNx3, output Bxnum_class """
+def get_model(point_cloud, is_training, num_class, bn_decay=None, npoint_scale=1.0):
+    """ Semantic segmentation PointNet, input is BxNx3, output Bxnum_class
+        npoint_scale scales the number of groups of the SA layers, N/8192 for N input points """
     batch_size = point_cloud.get_shape()[0].value
     num_point = point_cloud.get_shape()[1].value
     end_points = {}
@@ -26,16 +27,20 @@ def get_model(point_cloud, is_training, num_class, bn_decay=None):
     end_points['l0_xyz'] = l0_xyz
 
     # Layer 1
-    l1_xyz, l1_points, l1_indices = pointnet_sa_module(l0_xyz, l0_points, npoint=1024, radius=0.1, nsample=32,
+    l1_xyz, l1_points, l1_indices = pointnet_sa_module(l0_xyz, l0_points, npoint=int(1024 * npoint_scale),
+                                                       radius=0.1, nsample=32,
                                                        mlp=[32, 32, 64], mlp2=None, group_all=False,
                                                        is_training=is_training, bn_decay=bn_decay, scope='layer1')
-    l2_xyz, l2_points, l2_indices = pointnet_sa_module(l1_xyz, l1_points, npoint=256, radius=0.2, nsample=32,
+    l2_xyz, l2_points, l2_indices = pointnet_sa_module(l1_xyz, l1_points, npoint=int(256 * npoint_scale),
+                                                       radius=0.2, nsample=32,
                                                        mlp=[64, 64, 128], mlp2=None, group_all=False,
                                                        is_training=is_training, bn_decay=bn_decay, scope='layer2')
-    l3_xyz, l3_points, l3_indices = pointnet_sa_module(l2_xyz, l2_points, npoint=64, radius=0.4, nsample=32,
+    l3_xyz, l3_points, l3_indices = pointnet_sa_module(l2_xyz, l2_points, npoint=int(64 * npoint_scale),
+                                                       radius=0.4, nsample=32,
                                                        mlp=[128, 128, 256], mlp2=None, group_all=False,
                                                        is_training=is_training, bn_decay=bn_decay, scope='layer3')
-    l4_xyz, l4_points, l4_indices = pointnet_sa_module(l3_xyz, l3_points, npoint=16, radius=0.8, nsample=32,
+    l4_xyz, l4_points, l4_indices = pointnet_sa_module(l3_xyz, l3_points, npoint=int(16 * npoint_scale),
+                                                       radius=0.8, nsample=32,
                                                        mlp=[256, 256, 512], mlp2=None, group_all=False,
                                                        is_training=is_training, bn_decay=bn_decay, scope='layer4')
 
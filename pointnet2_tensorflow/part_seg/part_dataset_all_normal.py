@@ -7,6 +7,10 @@ import os.path
 import json
 import numpy as np
 import sys
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BASE_DIR)
+sys.path.append(os.path.join(ROOT_DIR, 'utils'))
+import packed_dataset
 
 def pc_normalize(pc):
     l = pc.shape[0]
@@ -17,7 +21,7 @@ def pc_normalize(pc):
     return pc
 
 class PartNormalDataset():
-    def __init__(self, root, npoints = 2500, classification = False, split='train', normalize=True, return_cls_label = False):
+    def __init__(self, root, npoints = 2500, classification = False, split='train', normalize=True, return_cls_label = False, packed=True, packed_dir=None):
         self.npoints = npoints
         self.root = root
         self.catfile = os.path.join(self.root, 'synsetoffset2category.txt')
@@ -79,9 +83,22 @@ class PartNormalDataset():
         
         self.cache = {} # from index to (point_set, cls, seg) tuple
         self.cache_size = 20000
+
+        # the text files are converted once to a memory-mapped archive, which replaces the cache
+        self.packed = None
+        if packed:
+            if packed_dir is None: packed_dir = os.path.join(self.root, 'packed')
+            self.packed = packed_dataset.load_or_pack(os.path.join(packed_dir, split), self.datapath, self.classes)
         
     def __getitem__(self, index):
-        if index in self.cache:
+        if self.packed is not None:
+            data, cls = self.packed[index]
+            point_set = data[:,0:3]
+            if self.normalize:
+                point_set = pc_normalize(point_set)
+            normal = data[:,3:6]
+            seg = data[:,-1].astype(np.int32)
+        elif index in self.cache:
             point_set, normal, seg, cls = self.cache[index]
         else:
             fn = self.datapath[index]
@@ -118,6 +135,9 @@ class PartNormalDataset():
 if __name__ == '__main__':
     d = PartNormalDataset(root = '../data/shapenetcore_partanno_segmentation_benchmark_v0_normal', split='trainval', npoints=3000)
     print(len(d))
+    d_txt = PartNormalDataset(root = '../data/shapenetcore_partanno_segmentation_benchmark_v0_normal', split='trainval', npoints=3000, packed=False)
+    print('epoch time loadtxt: %fs' % packed_dataset.time_epoch(d_txt))
+    print('epoch time packed: %fs' % packed_dataset.time_epoch(d))
 
     i = 500
     ps, normal, seg = d[i]
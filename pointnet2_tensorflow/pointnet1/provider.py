@@ -87,10 +87,11 @@ def jitter_point_cloud(batch_data, sigma=0.01, clip=0.05):
 def getDataFiles(list_filename):
     return [line.rstrip() for line in open(list_filename)]
 
-def load_h5(h5_filename):
-    f = h5py.File(h5_filename)
-    data = f['data'][:]
-    label = f['label'][:]
+def load_h5(h5_filename, start=0, end=None):
+    ''' Read the samples start:end, of a chunked file only the chunks containing them are decompressed '''
+    with h5py.File(h5_filename, 'r') as f:
+        data = f['data'][start:end]
+        label = f['label'][start:end]
     return (data, label)
 
 def loadDataFile(filename):
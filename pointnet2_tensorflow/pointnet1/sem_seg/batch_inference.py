@@ -1,6 +1,11 @@
 import argparse
 import os
 import sys
+import threading
+try:
+    import queue
+except ImportError:
+    import Queue as queue
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 ROOT_DIR = os.path.dirname(BASE_DIR)
 sys.path.append(BASE_DIR)
@@ -30,12 +35,52 @@ LOG_FOUT.write(str(FLAGS)+'\n')
 ROOM_PATH_LIST = [os.path.join(ROOT_DIR,line.rstrip()) for line in open(FLAGS.room_data_filelist)]
 
 NUM_CLASSES = 13
+LABEL2COLOR = np.array([indoor3d_util.g_label2color[l] for l in range(NUM_CLASSES)])
 
 def log_string(out_str):
     LOG_FOUT.write(out_str+'\n')
     LOG_FOUT.flush()
     print(out_str)
 
+def format_rows(fmt, rows):
+    """ formats all rows of a 2D array with one % operation, fmt is the format of one line """
+    return ((fmt+'\n') * rows.shape[0]) % tuple(rows.ravel().tolist())
+
+class BackgroundWriter(object):
+    """ Formats and writes rows in a worker thread, so that the session
+        does not wait for the text output of the previous batch.
+    """
+    def __init__(self, max_pending=16):
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.error = None
+        self.worker = threading.Thread(target=self._work)
+        self.worker.daemon = True
+        self.worker.start()
+
+    def _work(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            fout, fmt, rows = item
+            if self.error is None:
+                try:
+                    fout.write(format_rows(fmt, rows))
+                except Exception as e:
+                    self.error = e
+
+    def write_rows(self, fout, fmt, rows):
+        if self.error is not None:
+            raise self.error
+        self.queue.put((fout, fmt, rows))
+
+    def close(self):
+        """ waits until everything is written """
+        self.queue.put(None)
+        self.worker.join()
+        if self.error is not None:
+            raise self.error
+
 def evaluate():
     is_training = False
      
@@ -91,8 +136,9 @@ def eval_one_epoch(sess, ops, room_path, out_data_label_filename, out_gt_label_f
     total_correct = 0
     total_seen = 0
     loss_sum = 0
-    total_seen_class = [0 for _ in range(NUM_CLASSES)]
-    total_correct_class = [0 for _ in range(NUM_CLASSES)]
+    total_seen_class = np.zeros(NUM_CLASSES, dtype=np.int64)
+    total_correct_class = np.zeros(NUM_CLASSES, dtype=np.int64)
+    writer = BackgroundWriter()
     if FLAGS.visu:
         fout = open(os.path.join(DUMP_DIR, os.path.basename(room_path)[:-4]+'_pred.obj'), 'w')
         fout_gt = open(os.path.join(DUMP_DIR, os.path.basename(room_path)[:-4]+'_gt.obj'), 'w')
@@ -133,31 +179,26 @@ def eval_one_epoch(sess, ops, room_path, out_data_label_filename, out_gt_label_f
         for b in range(BATCH_SIZE):
             pts = current_data[start_idx+b, :, :]
             l = current_label[start_idx+b,:]
-            pts[:,6] *= max_room_x
-            pts[:,7] *= max_room_y
-            pts[:,8] *= max_room_z
-            pts[:,3:6] *= 255.0
+            xyz = pts[:,6:9] * [max_room_x, max_room_y, max_room_z]
+            rgb = pts[:,3:6] * 255.0
             pred = pred_label[b, :]
-            for i in range(NUM_POINT):
-                color = indoor3d_util.g_label2color[pred[i]]
-                color_gt = indoor3d_util.g_label2color[current_label[start_idx+b, i]]
-                if FLAGS.visu:
-                    fout.write('v %f %f %f %d %d %d\n' % (pts[i,6], pts[i,7], pts[i,8], color[0], color[1], color[2]))
-                    fout_gt.write('v %f %f %f %d %d %d\n' % (pts[i,6], pts[i,7], pts[i,8], color_gt[0], color_gt[1], color_gt[2]))
-                fout_data_label.write('%f %f %f %d %d %d %f %d\n' % (pts[i,6], pts[i,7], pts[i,8], pts[i,3], pts[i,4], pts[i,5], pred_val[b,i,pred[i]], pred[i]))
-                fout_gt_label.write('%d\n' % (l[i]))
+            if FLAGS.visu:
+                writer.write_rows(fout, 'v %f %f %f %d %d %d', np.hstack((xyz, LABEL2COLOR[pred])))
+                writer.write_rows(fout_gt, 'v %f %f %f %d %d %d', np.hstack((xyz, LABEL2COLOR[l])))
+            writer.write_rows(fout_data_label, '%f %f %f %d %d %d %f %d',
+                              np.hstack((xyz, rgb, pred_val[b, np.arange(NUM_POINT), pred][:,None], pred[:,None])))
+            writer.write_rows(fout_gt_label, '%d', l[:,None])
         correct = np.sum(pred_label == current_label[start_idx:end_idx,:])
         total_correct += correct
         total_seen += (cur_batch_size*NUM_POINT)
         loss_sum += (loss_val*BATCH_SIZE)
-        for i in range(start_idx, end_idx):
-            for j in range(NUM_POINT):
-                l = current_label[i, j]
-                total_seen_class[l] += 1
-                total_correct_class[l] += (pred_label[i-start_idx, j] == l)
+        batch_label = current_label[start_idx:end_idx].ravel()
+        total_seen_class += np.bincount(batch_label, minlength=NUM_CLASSES)
+        total_correct_class += np.bincount(batch_label[pred_label.ravel() == batch_label], minlength=NUM_CLASSES)
 
     log_string('eval mean loss: %f' % (loss_sum / float(total_seen/NUM_POINT)))
     log_string('eval accuracy: %f'% (total_correct / float(total_seen)))
+    writer.close()
     fout_data_label.close()
     fout_gt_label.close()
     if FLAGS.visu:
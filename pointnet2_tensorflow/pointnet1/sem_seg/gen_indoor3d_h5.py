@@ -1,6 +1,9 @@
+import argparse
 import os
 import numpy as np
 import sys
+from collections import deque
+from multiprocessing import Pool
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 ROOT_DIR = os.path.dirname(BASE_DIR)
 sys.path.append(BASE_DIR)
@@ -8,6 +11,13 @@ sys.path.append(os.path.join(ROOT_DIR, 'utils'))
 import data_prep_util
 import indoor3d_util
 
+parser = argparse.ArgumentParser()
+parser.add_argument('--compression', default='lzf', help='gzip, lzf or none [default: lzf]')
+parser.add_argument('--chunk_size', type=int, default=32, help='Blocks per HDF5 chunk [default: 32]')
+parser.add_argument('--num_workers', type=int, default=None, help='Processes extracting blocks [default: number of CPUs]')
+parser.add_argument('--max_pending_rooms', type=int, default=None,
+                    help='Rooms extracted ahead of the writer, bounds the memory [default: 2 * num_workers]')
+
 # Constants
 data_dir = os.path.join(ROOT_DIR, 'data')
 indoor3d_data_dir = os.path.join(data_dir, 'stanford_indoor3d')
@@ -22,11 +32,8 @@ label_dtype = 'uint8'
 filelist = os.path.join(BASE_DIR, 'meta/all_data_label.txt')
 data_label_files = [os.path.join(indoor3d_data_dir, line.rstrip()) for line in open(filelist)]
 output_dir = os.path.join(data_dir, 'indoor3d_sem_seg_hdf5_data')
-if not os.path.exists(output_dir):
-    os.mkdir(output_dir)
 output_filename_prefix = os.path.join(output_dir, 'ply_data_all')
 output_room_filelist = os.path.join(output_dir, 'room_filelist.txt')
-fout_room = open(output_room_filelist, 'w')
 
 # --------------------------------------
 # ----- BATCH WRITE TO HDF5 -----
@@ -37,6 +44,16 @@ h5_batch_data = np.zeros(batch_data_dim, dtype = np.float32)
 h5_batch_label = np.zeros(batch_label_dim, dtype = np.uint8)
 buffer_size = 0  # state: record how many samples are currently in buffer
 h5_index = 0 # state: the next h5 file to save
+h5_compression = 'lzf'
+h5_chunk_size = 32
+
+def save_batch(size):
+    global h5_index
+    h5_filename =  output_filename_prefix + '_' + str(h5_index) + '.h5'
+    data_prep_util.save_h5(h5_filename, h5_batch_data[0:size, ...], h5_batch_label[0:size, ...], data_dtype, label_dtype,
+                           compression=h5_compression, chunk_size=h5_chunk_size)
+    print('Stored {0} with size {1}'.format(h5_filename, size))
+    h5_index += 1
 
 def insert_batch(data, label, last_batch=False):
     global h5_batch_data, h5_batch_label
@@ -51,36 +68,56 @@ def insert_batch(data, label, last_batch=False):
         capacity = h5_batch_data.shape[0] - buffer_size
         assert(capacity>=0)
         if capacity > 0:
-           h5_batch_data[buffer_size:buffer_size+capacity, ...] = data[0:capacity, ...] 
-           h5_batch_label[buffer_size:buffer_size+capacity, ...] = label[0:capacity, ...] 
+           h5_batch_data[buffer_size:buffer_size+capacity, ...] = data[0:capacity, ...]
+           h5_batch_label[buffer_size:buffer_size+capacity, ...] = label[0:capacity, ...]
         # Save batch data and label to h5 file, reset buffer_size
-        h5_filename =  output_filename_prefix + '_' + str(h5_index) + '.h5'
-        data_prep_util.save_h5(h5_filename, h5_batch_data, h5_batch_label, data_dtype, label_dtype) 
-        print('Stored {0} with size {1}'.format(h5_filename, h5_batch_data.shape[0]))
-        h5_index += 1
+        save_batch(h5_batch_data.shape[0])
         buffer_size = 0
         # recursive call
         insert_batch(data[capacity:, ...], label[capacity:, ...], last_batch)
     if last_batch and buffer_size > 0:
-        h5_filename =  output_filename_prefix + '_' + str(h5_index) + '.h5'
-        data_prep_util.save_h5(h5_filename, h5_batch_data[0:buffer_size, ...], h5_batch_label[0:buffer_size, ...], data_dtype, label_dtype)
-        print('Stored {0} with size {1}'.format(h5_filename, buffer_size))
-        h5_index += 1
+        save_batch(buffer_size)
         buffer_size = 0
     return
 
 
-sample_cnt = 0
-for i, data_label_filename in enumerate(data_label_files):
-    print(data_label_filename)
+def room_blocks(data_label_filename):
+    ''' block extraction of one room, runs in the worker processes '''
     data, label = indoor3d_util.room2blocks_wrapper_normalized(data_label_filename, NUM_POINT, block_size=1.0, stride=0.5,
                                                  random_sample=False, sample_num=None)
-    print('{0}, {1}'.format(data.shape, label.shape))
-    for _ in range(data.shape[0]):
-        fout_room.write(os.path.basename(data_label_filename)[0:-4]+'\n')
+    return data.astype(np.float32), label.astype(np.uint8)
+
+
+if __name__ == '__main__':
+    FLAGS = parser.parse_args()
+    h5_compression = None if FLAGS.compression == 'none' else FLAGS.compression
+    h5_chunk_size = FLAGS.chunk_size
+    if not os.path.exists(output_dir):
+        os.mkdir(output_dir)
+    fout_room = open(output_room_filelist, 'w')
+
+    # the workers extract the blocks of the next rooms while the main process writes the h5 files,
+    # at most max_pending_rooms rooms are submitted ahead so that the finished blocks do not pile up in memory
+    num_workers = FLAGS.num_workers or os.cpu_count()
+    max_pending_rooms = FLAGS.max_pending_rooms or 2 * num_workers
+    pool = Pool(num_workers)
+    pending = deque()
+    next_room = 0
+    sample_cnt = 0
+    for i, data_label_filename in enumerate(data_label_files):
+        while next_room < len(data_label_files) and len(pending) < max_pending_rooms:
+            pending.append(pool.apply_async(room_blocks, (data_label_files[next_room],)))
+            next_room += 1
+        data, label = pending.popleft().get()
+        print(data_label_filename)
+        print('{0}, {1}'.format(data.shape, label.shape))
+        for _ in range(data.shape[0]):
+            fout_room.write(os.path.basename(data_label_filename)[0:-4]+'\n')
 
-    sample_cnt += data.shape[0]
-    insert_batch(data, label, i == len(data_label_files)-1)
+        sample_cnt += data.shape[0]
+        insert_batch(data, label, i == len(data_label_files)-1)
+    pool.close()
+    pool.join()
 
-fout_room.close()
-print("Total samples: {0}".format(sample_cnt))
+    fout_room.close()
+    print("Total samples: {0}".format(sample_cnt))
@@ -129,6 +129,45 @@ def sample_data_label(data, label, num_sample):
     new_label = label[sample_indices]
     return new_data, new_label
     
+class BlockGrid(object):
+    """ Points sorted into a 2D grid of square cells, the points of a
+        block are collected from the cells it overlaps instead of
+        testing every point of the room.
+    """
+    def __init__(self, xy, cell_size):
+        """ xy: N x 2 numpy array, XY of the points
+            cell_size: float, edge length of a cell in meters
+        """
+        self.xy = xy
+        self.cell_size = cell_size
+        cell = np.floor(xy / cell_size).astype(np.int64)
+        self.cell_min = np.amin(cell, 0)
+        self.num_cells = np.amax(cell, 0) - self.cell_min + 1
+        cell -= self.cell_min
+        key = cell[:,0] * self.num_cells[1] + cell[:,1]
+        self.order = np.argsort(key, kind='stable')
+        # points of cell (i,j) are order[cell_start[k]:cell_start[k+1]], k = i*num_cells[1]+j
+        self.cell_start = np.searchsorted(key[self.order], np.arange(np.prod(self.num_cells)+1))
+
+    def block_indices(self, xbeg, ybeg, block_size):
+        """ Indices (ascending) of the points with xbeg <= x <= xbeg+block_size
+            and ybeg <= y <= ybeg+block_size.
+        """
+        lo = np.floor(np.array([xbeg, ybeg]) / self.cell_size).astype(np.int64) - self.cell_min
+        hi = np.floor(np.array([xbeg+block_size, ybeg+block_size]) / self.cell_size).astype(np.int64) - self.cell_min
+        lo = np.maximum(lo, 0)
+        hi = np.minimum(hi, self.num_cells - 1)
+        if np.any(lo > hi):
+            return np.zeros(0, dtype=np.int64)
+        # cells of one x column are consecutive in the sorted order
+        candidates = np.concatenate([self.order[self.cell_start[i*self.num_cells[1]+lo[1]]:
+                                                self.cell_start[i*self.num_cells[1]+hi[1]+1]]
+                                     for i in range(lo[0], hi[0]+1)])
+        x = self.xy[candidates,0]
+        y = self.xy[candidates,1]
+        cond = (x<=xbeg+block_size) & (x>=xbeg) & (y<=ybeg+block_size) & (y>=ybeg)
+        return np.sort(candidates[cond])
+
 def room2blocks(data, label, num_point, block_size=1.0, stride=1.0,
                 random_sample=False, sample_num=None, sample_aug=1):
     """ Prepare block training data.
@@ -175,17 +214,16 @@ def room2blocks(data, label, num_point, block_size=1.0, stride=1.0,
             xbeg_list.append(xbeg)
             ybeg_list.append(ybeg)
 
-    # Collect blocks
+    # Collect blocks, the points of each block are looked up in a grid of the room
+    grid = BlockGrid(data[:,0:2], block_size if random_sample else stride)
     block_data_list = []
     block_label_list = []
     idx = 0
     for idx in range(len(xbeg_list)): 
        xbeg = xbeg_list[idx]
        ybeg = ybeg_list[idx]
-       xcond = (data[:,0]<=xbeg+block_size) & (data[:,0]>=xbeg)
-       ycond = (data[:,1]<=ybeg+block_size) & (data[:,1]>=ybeg)
-       cond = xcond & ycond
-       if np.sum(cond) < 100: # discard block if there are less than 100 pts.
+       cond = grid.block_indices(xbeg, ybeg, block_size)
+       if len(cond) < 100: # discard block if there are less than 100 pts.
            continue
        
        block_data = data[cond, :]
@@ -287,16 +325,14 @@ def room2samples(data, label, sample_num_point):
     sample_datas = np.zeros((batch_num, sample_num_point, 6))
     sample_labels = np.zeros((batch_num, sample_num_point, 1))
 
-    for i in range(batch_num):
-        beg_idx = i*sample_num_point
-        end_idx = min((i+1)*sample_num_point, N)
-        num = end_idx - beg_idx
-        sample_datas[i,0:num,:] = data[beg_idx:end_idx, :]
-        sample_labels[i,0:num,0] = label[beg_idx:end_idx]
-        if num < sample_num_point:
-            makeup_indices = np.random.choice(N, sample_num_point - num)
-            sample_datas[i,num:,:] = data[makeup_indices, :]
-            sample_labels[i,num:,0] = label[makeup_indices]
+    # the shuffled points fill the samples in order, only the last one is made up
+    sample_datas.reshape(-1, 6)[0:N,:] = data
+    sample_labels.reshape(-1)[0:N] = label
+    num = N - (batch_num-1)*sample_num_point
+    if num < sample_num_point:
+        makeup_indices = np.random.choice(N, sample_num_point - num)
+        sample_datas[-1,num:,:] = data[makeup_indices, :]
+        sample_labels[-1,num:,0] = label[makeup_indices]
     return sample_datas, sample_labels
 
 def room2samples_plus_normalized(data_label, num_point):
@@ -4,6 +4,7 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(BASE_DIR)
 from plyfile import (PlyData, PlyElement, make2d, PlyParseError, PlyProperty)
 import numpy as np
+from numpy.lib.recfunctions import structured_to_unstructured
 import h5py
 
 SAMPLING_BIN = os.path.join(BASE_DIR, 'third_party/mesh_sampling/build/pcsample')
@@ -76,16 +77,29 @@ def save_h5_data_label_normal(h5_filename, data, label, normal,
 
 
 # Write numpy array data and label to h5_filename
-def save_h5(h5_filename, data, label, data_dtype='uint8', label_dtype='uint8'):
-    h5_fout = h5py.File(h5_filename)
+def save_h5(h5_filename, data, label, data_dtype='uint8', label_dtype='uint8',
+            compression='gzip', chunk_size=None):
+    """ compression: 'gzip' (level 4 for data, 1 for label), 'lzf' or None
+        chunk_size: number of samples per HDF5 chunk, None for h5py's choice
+            (contiguous if uncompressed), partial reads decompress whole chunks
+    """
+    data_opts = {}
+    label_opts = {}
+    if compression is not None:
+        data_opts['compression'] = label_opts['compression'] = compression
+        if compression == 'gzip':
+            data_opts['compression_opts'] = 4
+            label_opts['compression_opts'] = 1
+    if chunk_size is not None:
+        data_opts['chunks'] = (max(min(chunk_size, data.shape[0]), 1),) + data.shape[1:]
+        label_opts['chunks'] = (max(min(chunk_size, label.shape[0]), 1),) + label.shape[1:]
+    h5_fout = h5py.File(h5_filename, 'w')
     h5_fout.create_dataset(
             'data', data=data,
-            compression='gzip', compression_opts=4,
-            dtype=data_dtype)
+            dtype=data_dtype, **data_opts)
     h5_fout.create_dataset(
             'label', data=label,
-            compression='gzip', compression_opts=1,
-            dtype=label_dtype)
+            dtype=label_dtype, **label_opts)
     h5_fout.close()
 
 # Read numpy array data and label from h5_filename
@@ -116,17 +130,18 @@ def load_h5(h5_filename):
 # ----------------------------------------------------------------
 
 # Load PLY file
+# The points are a view of the memory-mapped file (no copy) if the vertex properties have the same type
 def load_ply_data(filename, point_num):
     plydata = PlyData.read(filename)
     pc = plydata['vertex'].data[:point_num]
-    pc_array = np.array([[x, y, z] for x,y,z in pc])
+    pc_array = structured_to_unstructured(pc)
     return pc_array
 
 # Load PLY file
 def load_ply_normal(filename, point_num):
     plydata = PlyData.read(filename)
     pc = plydata['normal'].data[:point_num]
-    pc_array = np.array([[x, y, z] for x,y,z in pc])
+    pc_array = structured_to_unstructured(pc)
     return pc_array
 
 # Make up rows for Nxk array
@@ -16,6 +16,7 @@
 #   along with python-plyfile.  If not, see
 #       <http://www.gnu.org/licenses/>.
 
+from io import UnsupportedOperation as _UnsupportedOperation
 from itertools import islice as _islice
 
 import numpy as _np
@@ -88,6 +89,19 @@ def _lookup_type(type_str):
     return _data_type_reverse[type_str]
 
 
+def _can_mmap(stream):
+    '''
+    Return whether the stream is backed by a file descriptor, which is
+    needed for memory-mapping.
+
+    '''
+    try:
+        stream.fileno()
+    except (AttributeError, _UnsupportedOperation):
+        return False
+    return True
+
+
 def _split_line(line, n):
     fields = line.split(None, n)
     if len(fields) == n:
@@ -104,6 +118,10 @@ def make2d(array, cols=None, dtype=None):
     arguments can be omitted if the array is not empty.
 
     '''
+    if array.ndim == 2:
+        # lists of memory-mapped elements are already 2D
+        return array
+
     if (cols is None or dtype is None) and not len(array):
         raise RuntimeError("cols and dtype must be specified for empty "
                            "array")
@@ -272,16 +290,27 @@ class PlyData(object):
                        comments['comment'], comments['obj_info'])
 
     @staticmethod
-    def read(stream):
+    def read(stream, mmap='c'):
         '''
         Read PLY data from a readable file-like object or filename.
 
+        mmap: memory-map mode ('c' for copy-on-write or 'r' for
+            read-only) for the elements of binary files, or False to
+            read them into memory.  Elements without list properties
+            and elements whose lists all have the same length (like the
+            faces of a triangle mesh) are memory-mapped, so accessing
+            e.g. ply['vertex']['x'] only reads the pages it touches.
+            Lists of memory-mapped elements are 2D subarray fields
+            instead of object arrays.
+
         '''
         (must_close, stream) = _open_stream(stream, 'read')
         try:
             data = PlyData._parse_header(stream)
+            if mmap and not _can_mmap(stream):
+                mmap = False
             for elt in data:
-                elt._read(stream, data.text, data.byte_order)
+                elt._read(stream, data.text, data.byte_order, mmap)
         finally:
             if must_close:
                 stream.close()
@@ -564,13 +593,15 @@ class PlyElement(object):
 
         return elt
 
-    def _read(self, stream, text, byte_order):
+    def _read(self, stream, text, byte_order, mmap=False):
         '''
         Read the actual data from a PLY file.
 
         '''
         if text:
             self._read_txt(stream)
+        elif mmap and self._read_mmap(stream, byte_order, mmap):
+            pass
         else:
             if self._have_list:
                 # There are list properties, so a simple load is
@@ -608,16 +639,152 @@ class PlyElement(object):
                 self.data.astype(self.dtype(byte_order),
                                  copy=False).tofile(stream)
 
+    def _fixed_dtype(self, stream, byte_order):
+        '''
+        Return the on-disk dtype of the element assuming that all lists
+        have the same lengths as in the first record, together with the
+        names of the list length fields.  The stream position is not
+        changed.
+
+        '''
+        start = stream.tell()
+        fields = []
+        len_names = []
+        try:
+            for prop in self.properties:
+                if isinstance(prop, PlyListProperty):
+                    (len_t, val_t) = prop.list_dtype(byte_order)
+                    n = _np.fromfile(stream, len_t, 1)
+                    if len(n) < 1:
+                        return (None, [])
+                    len_names.append('\0len_' + prop.name)
+                    fields.append((len_names[-1], len_t))
+                    fields.append((prop.name, val_t, (int(n[0]),)))
+                    stream.seek(int(n[0]) * _np.dtype(val_t).itemsize, 1)
+                else:
+                    fields.append((prop.name, prop.dtype(byte_order)))
+        finally:
+            stream.seek(start)
+
+        return (_np.dtype(fields), len_names)
+
+    def _read_mmap(self, stream, byte_order, mode):
+        '''
+        Memory-map a PLY element from a binary PLY file.  Returns False
+        if the records of the element have different sizes, in which
+        case nothing is read.
+
+        '''
+        if self._have_list:
+            (dtype, len_names) = self._fixed_dtype(stream, byte_order)
+            if dtype is None:
+                return False
+        else:
+            (dtype, len_names) = (_np.dtype(self.dtype(byte_order)), [])
+
+        offset = stream.tell()
+        stream.seek(0, 2)
+        available = (stream.tell() - offset) // max(dtype.itemsize, 1)
+        stream.seek(offset)
+        if available < self.count:
+            if self._have_list:
+                return False
+            raise PlyParseError("early end-of-file", self, available)
+
+        if self.count == 0:
+            data = _np.empty(0, dtype)
+        else:
+            data = _np.memmap(stream, dtype, mode, offset, (self.count,))
+
+        if len_names:
+            for name in len_names:
+                if _np.any(data[name] != data[name][0]):
+                    # np.memmap moves the stream position
+                    stream.seek(offset)
+                    return False
+            # hide the list lengths, they are given by the field shapes
+            names = [prop.name for prop in self.properties]
+            data = data.view(_np.dtype({
+                'names': names,
+                'formats': [dtype.fields[name][0] for name in names],
+                'offsets': [dtype.fields[name][1] for name in names],
+                'itemsize': dtype.itemsize}))
+
+        stream.seek(offset + self.count * dtype.itemsize)
+        self._data = data
+        return True
+
     def _read_txt(self, stream):
         '''
         Load a PLY element from an ASCII-format PLY file.  The element
         may contain list properties.
 
+        '''
+        lines = list(_islice(iter(stream.readline, b''), self.count))
+        if len(lines) < self.count:
+            raise PlyParseError("early end-of-file", self, len(lines))
+
+        if not self._read_txt_table(lines):
+            self._read_txt_rows(lines)
+
+    def _read_txt_table(self, lines):
+        '''
+        Vectorized parsing of an ASCII element whose rows all have the
+        same number of fields and whose lists all have the same length.
+        Returns False if the element does not have this form, in which
+        case nothing is read.
+
+        '''
+        if not lines:
+            self._data = _np.empty(0, dtype=self.dtype())
+            return True
+
+        try:
+            table = _np.loadtxt([line.decode('ascii') for line in lines],
+                                dtype='f8', ndmin=2)
+        except ValueError:
+            return False
+
+        fields = []
+        columns = []
+        k = 0
+        for prop in self.properties:
+            if isinstance(prop, PlyListProperty):
+                if k >= table.shape[1]:
+                    return False
+                n = table[0, k]
+                if _np.any(table[:, k] != n) or n != int(n) or n < 0:
+                    return False
+                fields.append((prop.name, prop.list_dtype()[1], (int(n),)))
+                columns.append(slice(k + 1, k + 1 + int(n)))
+                k += 1 + int(n)
+            else:
+                fields.append((prop.name, prop.dtype()))
+                columns.append(k)
+                k += 1
+        if k != table.shape[1]:
+            return False
+
+        data = _np.empty(len(lines), dtype=fields)
+        for (field, cols) in zip(fields, columns):
+            values = table[:, cols]
+            if (_np.dtype(field[1]).kind in 'iub' and
+                    _np.any(values != _np.round(values))):
+                return False
+            data[field[0]] = values
+
+        self._data = data
+        return True
+
+    def _read_txt_rows(self, lines):
+        '''
+        Parse an ASCII element row by row.
+
         '''
         self._data = _np.empty(self.count, dtype=self.dtype())
 
         k = 0
-        for line in _islice(iter(stream.readline, b''), self.count):
+        for line in lines:
             fields = iter(line.strip().split())
             for prop in self.properties:
                 try:
@@ -636,10 +803,6 @@ class PlyElement(object):
                 raise PlyParseError("expected end-of-line", self, k)
             k += 1
 
-        if k < self.count:
-            del self._data
-            raise PlyParseError("early end-of-file", self, k)
-
     def _write_txt(self, stream):
         '''
         Save a PLY element to an ASCII-format PLY file.  The element may
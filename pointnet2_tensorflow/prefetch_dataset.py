@@ -0,0 +1,93 @@
+'''
+    Prefetching wrapper for ModelNetDataset and ModelNetH5Dataset.
+    A worker thread assembles (and augments) the next batches of the epoch while the current training step runs.
+'''
+
+import threading
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+
+class PrefetchDataset(object):
+    def __init__(self, dataset, augment=False, num_prefetch=4):
+        ''' dataset: ModelNetDataset or ModelNetH5Dataset
+            augment: whether the batches are augmented, fixed since they are assembled ahead of time
+            num_prefetch: maximal number of batches waiting in the queue
+        '''
+        self.dataset = dataset
+        self.augment = augment
+        self.num_prefetch = num_prefetch
+        self.worker = None
+        self._start()
+
+    def __getattr__(self, name):
+        return getattr(self.dataset, name)
+
+    def _start(self):
+        self.queue = queue.Queue(maxsize=self.num_prefetch)
+        self.stop = threading.Event()
+        self.next_item = None
+        self.worker = threading.Thread(target=self._work, args=(self.queue, self.stop))
+        self.worker.daemon = True
+        self.worker.start()
+
+    def _put(self, batches, stop, item):
+        while not stop.is_set():
+            try:
+                batches.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def _work(self, batches, stop):
+        ''' runs one epoch of the wrapped dataset, the end of the epoch is marked by ('end', None) '''
+        try:
+            while not stop.is_set() and self.dataset.has_next_batch():
+                self._put(batches, stop, ('batch', self.dataset.next_batch(augment=self.augment)))
+        except Exception as e:
+            self._put(batches, stop, ('error', e))
+        self._put(batches, stop, ('end', None))
+
+    def has_next_batch(self):
+        if self.next_item is None:
+            self.next_item = self.queue.get()
+        if self.next_item[0] == 'error':
+            raise self.next_item[1]
+        return self.next_item[0] == 'batch'
+
+    def next_batch(self, augment=None):
+        ''' returned dimension may be smaller than self.batch_size '''
+        if augment is not None and augment != self.augment:
+            raise ValueError('augmentation is set when creating the PrefetchDataset')
+        if not self.has_next_batch():
+            raise StopIteration
+        batch = self.next_item[1]
+        self.next_item = None
+        return batch
+
+    def num_channel(self):
+        return self.dataset.num_channel()
+
+    def reset(self):
+        ''' stops the worker of the current epoch and starts prefetching the next one '''
+        self.stop.set()
+        self.worker.join()
+        self.dataset.reset()
+        self._start()
+
+
+if __name__ == '__main__':
+    import os
+    import time
+    import modelnet_h5_dataset
+    BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+    d = modelnet_h5_dataset.ModelNetH5Dataset(os.path.join(BASE_DIR, 'data/modelnet40_ply_hdf5_2048/train_files.txt'))
+    for dataset in [d, PrefetchDataset(d, augment=True)]:
+        dataset.reset()
+        tic = time.time()
+        while dataset.has_next_batch():
+            dataset.next_batch(augment=True)
+            time.sleep(0.01) # training step
+        print('epoch time %s: %fs' % (type(dataset).__name__, time.time() - tic))
@@ -17,6 +17,8 @@ from pointnet1.utils.eulerangles import euler2mat
 import numpy as np
 from plyfile import PlyData, PlyElement
 
+from pointnet2_tensorflow.scannet.scene_evaluator import voxel_majority_label
+
 
 # ----------------------------------------
 # Point Cloud/Volume Conversions
@@ -27,14 +29,13 @@ def point_cloud_label_to_surface_voxel_label(point_cloud, label, res=0.0484):
     nvox = np.ceil((coordmax - coordmin) / res)
     vidx = np.ceil((point_cloud - coordmin) / res)
     vidx = vidx[:, 0] + vidx[:, 1] * nvox[0] + vidx[:, 2] * nvox[0] * nvox[1]
-    uvidx = np.unique(vidx)
+    uvidx, inverse = np.unique(vidx, return_inverse=True)
+    inverse = inverse.reshape(-1)
     if label.ndim == 1:
-        uvlabel = [np.argmax(np.bincount(label[vidx == uv].astype(np.uint32))) for uv in uvidx]
+        uvlabel = voxel_majority_label(inverse, label)
     else:
         assert (label.ndim == 2)
-        uvlabel = np.zeros(len(uvidx), label.shape[1])
-        for i in range(label.shape[1]):
-            uvlabel[:, i] = np.array([np.argmax(np.bincount(label[vidx == uv, i].astype(np.uint32))) for uv in uvidx])
+        uvlabel = np.stack([voxel_majority_label(inverse, label[:, i]) for i in range(label.shape[1])], axis=1)
     return uvidx, uvlabel, nvox
 
 
@@ -1,8 +1,8 @@
-import pickle
 import os
 import sys
 import numpy as np
 from pointnet2_tensorflow.scannet import pc_util
+from pointnet2_tensorflow.scannet import scene_archive
 from scannet import scene_util
 
 
@@ -11,24 +11,14 @@ class ScannetDataset():
         self.npoints = npoints
         self.root = root
         self.split = split
-        self.data_filename = os.path.join(self.root, 'scannet_%s.pickle' % (split))
-        with open(self.data_filename, 'rb') as fp:
-            self.scene_points_list = pickle.load(fp, encoding='latin1')
-            self.semantic_labels_list = pickle.load(fp, encoding='latin1')
+        self.archive = scene_archive.open_archive(root, split)
         if split == 'train':
-            labelweights = np.zeros(21)
-            for seg in self.semantic_labels_list:
-                tmp, _ = np.histogram(seg, range(22))
-                labelweights += tmp
-            labelweights = labelweights.astype(np.float32)
-            labelweights = labelweights / np.sum(labelweights)
-            self.labelweights = 1 / np.log(1.2 + labelweights)
+            self.labelweights = self.archive.labelweights()
         elif split == 'test':
             self.labelweights = np.ones(21)
 
     def __getitem__(self, index):
-        point_set = self.scene_points_list[index]
-        semantic_seg = self.semantic_labels_list[index].astype(np.int32)
+        point_set, semantic_seg = self.archive[index]
         coordmax = np.max(point_set, axis=0)
         coordmin = np.min(point_set, axis=0)
         smpmin = np.maximum(coordmax - [1.5, 1.5, 3.0], coordmin)
@@ -63,7 +53,7 @@ class ScannetDataset():
         return point_set, semantic_seg, sample_weight
 
     def __len__(self):
-        return len(self.scene_points_list)
+        return len(self.archive)
 
 
 class ScannetDatasetWholeScene():
@@ -71,25 +61,14 @@ class ScannetDatasetWholeScene():
         self.npoints = npoints
         self.root = root
         self.split = split
-        self.data_filename = os.path.join(self.root, 'scannet_%s.pickle' % (split))
-        print(self.data_filename)
-        with open(self.data_filename, 'rb') as fp:
-            self.scene_points_list = pickle.load(fp, encoding='latin1')
-            self.semantic_labels_list = pickle.load(fp, encoding='latin1')
+        self.archive = scene_archive.open_archive(root, split)
         if split == 'train':
-            labelweights = np.zeros(21)
-            for seg in self.semantic_labels_list:
-                tmp, _ = np.histogram(seg, range(22))
-                labelweights += tmp
-            labelweights = labelweights.astype(np.float32)
-            labelweights = labelweights / np.sum(labelweights)
-            self.labelweights = 1 / np.log(1.2 + labelweights)
+            self.labelweights = self.archive.labelweights()
         elif split == 'test':
             self.labelweights = np.ones(21)
 
     def __getitem__(self, index):
-        point_set_ini = self.scene_points_list[index]
-        semantic_seg_ini = self.semantic_labels_list[index].astype(np.int32)
+        point_set_ini, semantic_seg_ini = self.archive[index]
         coordmax = np.max(point_set_ini, axis=0)
         coordmin = np.min(point_set_ini, axis=0)
         nsubvolume_x = np.ceil((coordmax[0] - coordmin[0]) / 1.5).astype(np.int32)
@@ -125,7 +104,7 @@ class ScannetDatasetWholeScene():
         return point_sets, semantic_segs, sample_weights
 
     def __len__(self):
-        return len(self.scene_points_list)
+        return len(self.archive)
 
 
 class ScannetDatasetVirtualScan():
@@ -133,25 +112,14 @@ class ScannetDatasetVirtualScan():
         self.npoints = npoints
         self.root = root
         self.split = split
-        self.data_filename = os.path.join(self.root, 'scannet_%s.pickle' % (split))
-        print(self.data_filename)
-        with open(self.data_filename, 'rb') as fp:
-            self.scene_points_list = pickle.load(fp)
-            self.semantic_labels_list = pickle.load(fp)
+        self.archive = scene_archive.open_archive(root, split)
         if split == 'train':
-            labelweights = np.zeros(21)
-            for seg in self.semantic_labels_list:
-                tmp, _ = np.histogram(seg, range(22))
-                labelweights += tmp
-            labelweights = labelweights.astype(np.float32)
-            labelweights = labelweights / np.sum(labelweights)
-            self.labelweights = 1 / np.log(1.2 + labelweights)
+            self.labelweights = self.archive.labelweights()
         elif split == 'test':
             self.labelweights = np.ones(21)
 
     def __getitem__(self, index):
-        point_set_ini = self.scene_points_list[index]
-        semantic_seg_ini = self.semantic_labels_list[index].astype(np.int32)
+        point_set_ini, semantic_seg_ini = self.archive[index]
         sample_weight_ini = self.labelweights[semantic_seg_ini]
         point_sets = list()
         semantic_segs = list()
@@ -176,7 +144,7 @@ class ScannetDatasetVirtualScan():
         return point_sets, semantic_segs, sample_weights
 
     def __len__(self):
-        return len(self.scene_points_list)
+        return len(self.archive)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,112 @@
+''' Memory-mapped scene archive for the ScanNet datasets in scannet_dataset.py.
+
+    scannet_<split>.pickle is converted once into a directory next to it. The points and labels of all scenes are
+    concatenated and memory-mapped, scene i are the rows offsets[i]:offsets[i+1].
+    Opened archives are cached per process, so all dataset views of a split share the same memory maps.
+
+    Archive layout (directory scannet_<split>_archive):
+        points.bin        Mx3 points of all scenes (dtype of the pickle)
+        labels.bin        M int32 semantic labels
+        offsets.npy       int64 (num_scenes+1) first row of each scene
+        label_counts.npy  int64 (21) histogram of all labels, for the label weights
+        meta.json         dtype of the points and size/mtime of the source pickle
+'''
+
+import os
+import json
+import pickle
+import shutil
+import numpy as np
+
+NUM_CLASSES = 21
+
+_archives = {}
+
+
+class SceneArchive():
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'meta.json'), 'r') as f:
+            self.meta = json.load(f)
+        self.offsets = np.load(os.path.join(path, 'offsets.npy'))
+        self.label_counts = np.load(os.path.join(path, 'label_counts.npy'))
+        num_rows = int(self.offsets[-1])
+        if num_rows > 0:
+            self.points = np.memmap(os.path.join(path, 'points.bin'), dtype=self.meta['points_dtype'], mode='r',
+                                    shape=(num_rows, 3))
+            self.labels = np.memmap(os.path.join(path, 'labels.bin'), dtype=np.int32, mode='r', shape=(num_rows,))
+        else:
+            self.points = np.zeros((0, 3), dtype=self.meta['points_dtype'])
+            self.labels = np.zeros(0, dtype=np.int32)
+
+    def __getitem__(self, index):
+        ''' returns points (Nx3) and labels (N) of the scene, views of the memory maps '''
+        start, end = self.offsets[index], self.offsets[index+1]
+        return np.asarray(self.points[start:end]), np.asarray(self.labels[start:end])
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def labelweights(self):
+        ''' inverse log frequency of the labels, as weights for the loss '''
+        labelweights = self.label_counts.astype(np.float32)
+        labelweights = labelweights / np.sum(labelweights)
+        return 1 / np.log(1.2 + labelweights)
+
+
+def _source_stat(data_filename):
+    stat = os.stat(data_filename)
+    return {'size': stat.st_size, 'mtime': stat.st_mtime}
+
+
+def pack_pickle(path, data_filename):
+    ''' Convert the scene lists of data_filename to an archive at path '''
+    with open(data_filename, 'rb') as fp:
+        scene_points_list = pickle.load(fp, encoding='latin1')
+        semantic_labels_list = pickle.load(fp, encoding='latin1')
+
+    tmp_path = path + '.tmp'
+    if os.path.exists(tmp_path):
+        shutil.rmtree(tmp_path)
+    os.makedirs(tmp_path)
+
+    points_dtype = np.result_type(*[p.dtype for p in scene_points_list]) if scene_points_list else np.float32
+    offsets = np.zeros(len(scene_points_list)+1, dtype=np.int64)
+    label_counts = np.zeros(NUM_CLASSES, dtype=np.int64)
+    with open(os.path.join(tmp_path, 'points.bin'), 'wb') as fp, \
+            open(os.path.join(tmp_path, 'labels.bin'), 'wb') as fl:
+        for i, (points, labels) in enumerate(zip(scene_points_list, semantic_labels_list)):
+            labels = np.asarray(labels).reshape(-1).astype(np.int32)
+            np.ascontiguousarray(points, dtype=points_dtype).tofile(fp)
+            labels.tofile(fl)
+            offsets[i+1] = offsets[i] + len(labels)
+            label_counts += np.bincount(labels[(labels >= 0) & (labels < NUM_CLASSES)], minlength=NUM_CLASSES)
+
+    np.save(os.path.join(tmp_path, 'offsets.npy'), offsets)
+    np.save(os.path.join(tmp_path, 'label_counts.npy'), label_counts)
+    meta = {'points_dtype': np.dtype(points_dtype).str, 'source': _source_stat(data_filename)}
+    with open(os.path.join(tmp_path, 'meta.json'), 'w') as f:
+        json.dump(meta, f)
+
+    # only a completely written archive gets the final name
+    if os.path.exists(path):
+        shutil.rmtree(path)
+    os.rename(tmp_path, path)
+
+
+def open_archive(root, split):
+    ''' Archive of scannet_<split>.pickle in root, it is (re)built if it is missing or the pickle changed. '''
+    data_filename = os.path.join(root, 'scannet_%s.pickle' % (split))
+    path = os.path.abspath(os.path.join(root, 'scannet_%s_archive' % (split)))
+    if path in _archives:
+        return _archives[path]
+    meta_file = os.path.join(path, 'meta.json')
+    up_to_date = False
+    if os.path.exists(meta_file):
+        with open(meta_file, 'r') as f:
+            up_to_date = not os.path.exists(data_filename) or json.load(f)['source'] == _source_stat(data_filename)
+    if not up_to_date:
+        print('packing %s to %s' % (data_filename, path))
+        pack_pickle(path, data_filename)
+    _archives[path] = SceneArchive(path)
+    return _archives[path]
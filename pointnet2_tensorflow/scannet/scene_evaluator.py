@@ -0,0 +1,165 @@
+""" Streaming evaluation of semantic segmentation on ScanNet.
+
+Point and voxel level confusion matrices are accumulated with np.bincount, so all metrics
+(accuracy, per class accuracy, IoU, calibrated accuracy) can be computed at any time.
+Only numpy is used, so the evaluator works with scannet/train.py and attention_points/train.py.
+"""
+
+import numpy as np
+
+# class frequencies of the ScanNet benchmark used for the calibrated accuracy (classes 1-20)
+CALIBRATION_WEIGHTS = np.array([0.388, 0.357, 0.038, 0.033, 0.017, 0.02, 0.016, 0.025, 0.002, 0.002, 0.002, 0.007,
+                                0.006, 0.022, 0.004, 0.0004, 0.003, 0.002, 0.024, 0.029])
+
+
+def voxel_majority_label(inverse, label):
+    """ Most frequent label of each voxel (ties go to the smallest label, as np.argmax(np.bincount(...))).
+        Uses a lexsort over (voxel, label) pairs and counts the runs of equal pairs, O(N log N).
+        Input:
+            inverse: N array, voxel of each point (0..V-1, every voxel has at least one point)
+            label: N array, label of each point
+        Return:
+            V array, majority label of each voxel
+    """
+    order = np.lexsort((label, inverse))
+    inverse = inverse[order]
+    label = label[order]
+    run_start = np.flatnonzero(np.concatenate(([True], (inverse[1:] != inverse[:-1]) | (label[1:] != label[:-1]))))
+    run_count = np.diff(np.append(run_start, len(label)))
+    run_voxel = inverse[run_start]
+    run_label = label[run_start]
+    # per voxel the run with the highest count, the runs of a voxel are already sorted by label
+    order = np.lexsort((-run_count, run_voxel))
+    first = np.concatenate(([True], run_voxel[order][1:] != run_voxel[order][:-1]))
+    return run_label[order][first]
+
+
+def batch_voxel_ids(points, valid, res=0.02):
+    """ Voxel of each valid point, the voxel grid of each point cloud starts at its own minimum.
+        Input:
+            points: BxNx3 array
+            valid: BxN bool array, points to voxelize
+            res: edge length of a voxel
+        Return:
+            M array (M = number of valid points), voxel of each valid point (0..V-1)
+    """
+    batch_idx = np.nonzero(valid)[0]
+    coordmin = np.min(np.where(valid[:, :, None], points[:, :, 0:3], np.inf), axis=1)
+    vidx = np.ceil((points[valid, 0:3] - coordmin[batch_idx]) / res).astype(np.int64)
+    nvox = np.max(vidx, axis=0) + 1
+    key = ((batch_idx * nvox[0] + vidx[:, 0]) * nvox[1] + vidx[:, 1]) * nvox[2] + vidx[:, 2]
+    _, inverse = np.unique(key, return_inverse=True)
+    return inverse.reshape(-1)
+
+
+class SceneEvaluator(object):
+    def __init__(self, num_classes=21, voxel_res=0.02):
+        self.num_classes = num_classes
+        self.voxel_res = voxel_res
+        self.reset()
+
+    def reset(self):
+        # rows: ground truth, columns: prediction, only points with a sample weight > 0
+        self.confusion = np.zeros((self.num_classes, self.num_classes), dtype=np.int64)
+        self.confusion_vox = np.zeros((self.num_classes, self.num_classes), dtype=np.int64)
+        self.loss_sum = 0.0
+        self.num_batches = 0
+
+    def _confusion(self, label, pred):
+        return np.bincount(label.astype(np.int64) * self.num_classes + pred.astype(np.int64),
+                           minlength=self.num_classes ** 2).reshape(self.num_classes, self.num_classes)
+
+    def update(self, points, label, pred, smpw, loss=None, vox=True):
+        """ Input:
+                points: BxNx3 array (or BxNxC with xyz first), not needed without vox
+                label: BxN array, ground truth
+                pred: BxN array, predicted labels
+                smpw: BxN array, only points with a weight > 0 are evaluated
+                loss: loss of the batch
+                vox: whether the voxel confusion matrix is updated (the expensive part)
+        """
+        valid = smpw > 0
+        self.confusion += self._confusion(label[valid], pred[valid])
+        if vox and np.any(valid):
+            inverse = batch_voxel_ids(points, valid, self.voxel_res)
+            self.confusion_vox += self._confusion(voxel_majority_label(inverse, label[valid]),
+                                                  voxel_majority_label(inverse, pred[valid]))
+        if loss is not None:
+            self.loss_sum += loss
+            self.num_batches += 1
+
+    def batches(self, chunk_sets, batch_size):
+        """ Fills preallocated batches with the chunks of all scenes, the last batch is padded with zero weights.
+            The same buffers are returned for every batch, so a batch must be used before the next one is requested.
+            Input:
+                chunk_sets: iterable of (KxNxC data, KxN label, KxN smpw) e.g. the scenes of ScannetDatasetWholeScene
+            Return:
+                generator of (batch_size x N x C data, batch_size x N label, batch_size x N smpw)
+        """
+        batch_data = batch_label = batch_smpw = None
+        fill = 0
+        for data, label, smpw in chunk_sets:
+            if batch_data is None:
+                batch_data = np.zeros((batch_size,) + data.shape[1:], dtype=data.dtype)
+                batch_label = np.zeros((batch_size,) + label.shape[1:], dtype=label.dtype)
+                batch_smpw = np.zeros((batch_size,) + smpw.shape[1:], dtype=smpw.dtype)
+            start = 0
+            while start < len(data):
+                n = min(batch_size - fill, len(data) - start)
+                batch_data[fill:fill + n] = data[start:start + n]
+                batch_label[fill:fill + n] = label[start:start + n]
+                batch_smpw[fill:fill + n] = smpw[start:start + n]
+                fill += n
+                start += n
+                if fill == batch_size:
+                    yield batch_data, batch_label, batch_smpw
+                    fill = 0
+        if fill > 0:
+            batch_smpw[fill:] = 0
+            yield batch_data, batch_label, batch_smpw
+
+    def _class_accuracy(self, confusion):
+        return np.diag(confusion) / (np.sum(confusion, axis=1) + 1e-6)
+
+    def accuracy(self, vox=False):
+        """ accuracy of the points (voxels) with a known label (> 0) """
+        confusion = self.confusion_vox if vox else self.confusion
+        return np.trace(confusion[1:, 1:]) / float(max(np.sum(confusion[1:, :]), 1))
+
+    def class_accuracy(self, vox=False):
+        """ accuracy of each class 1..num_classes-1 """
+        return self._class_accuracy(self.confusion_vox if vox else self.confusion)[1:]
+
+    def iou(self, vox=False):
+        """ IoU of each class 1..num_classes-1, points with unknown label (0) are ignored """
+        confusion = (self.confusion_vox if vox else self.confusion)[1:, :]
+        intersection = np.diag(confusion[:, 1:])
+        return intersection / (np.sum(confusion[:, 1:], axis=0) + np.sum(confusion, axis=1) - intersection + 1e-6)
+
+    def calibrated_accuracy(self, vox=True):
+        """ class accuracies weighted with the class frequencies of the benchmark """
+        return np.average(self.class_accuracy(vox), weights=CALIBRATION_WEIGHTS)
+
+    def label_weights(self, vox=True):
+        """ frequency of the classes 1..num_classes-1 """
+        counts = np.sum(self.confusion_vox if vox else self.confusion, axis=1)[1:].astype(np.float32)
+        return counts / max(np.sum(counts), 1)
+
+    def mean_loss(self):
+        return self.loss_sum / float(max(self.num_batches, 1))
+
+    def summary(self, prefix='eval'):
+        """ log lines with all metrics """
+        lines = ['%s mean loss: %f' % (prefix, self.mean_loss()),
+                 '%s point accuracy vox: %f' % (prefix, self.accuracy(vox=True)),
+                 '%s point avg class acc vox: %f' % (prefix, np.mean(self.class_accuracy(vox=True))),
+                 '%s point accuracy: %f' % (prefix, self.accuracy()),
+                 '%s point avg class acc: %f' % (prefix, np.mean(self.class_accuracy())),
+                 '%s point mean iou: %f' % (prefix, np.mean(self.iou())),
+                 '%s point calibrated average acc vox: %f' % (prefix, self.calibrated_accuracy())]
+        per_class_str = 'vox based --------'
+        for l, (weight, acc, iou) in enumerate(zip(self.label_weights(), self.class_accuracy(vox=True),
+                                                   self.iou(vox=True))):
+            per_class_str += 'class %d weight: %f, acc: %f, iou: %f; ' % (l + 1, weight, acc, iou)
+        lines.append(per_class_str)
+        return lines
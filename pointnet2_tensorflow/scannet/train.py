@@ -16,7 +16,7 @@ sys.path.append(ROOT_DIR)  # provider
 sys.path.append(os.path.join(ROOT_DIR, 'utils'))
 from utils import provider
 from utils import tf_util
-from scannet import pc_util
+from pointnet2_tensorflow.scannet import scene_evaluator
 
 sys.path.append(os.path.join(ROOT_DIR, 'data_prep'))
 from attention_scannet import scannet_dataset
@@ -277,22 +277,11 @@ def eval_one_epoch(sess, ops, test_writer):
     test_idxs = np.arange(0, len(TEST_DATASET))
     num_batches = len(TEST_DATASET) // BATCH_SIZE
 
-    total_correct = 0
-    total_seen = 0
-    loss_sum = 0
-    total_seen_class = [0 for _ in range(NUM_CLASSES)]
-    total_correct_class = [0 for _ in range(NUM_CLASSES)]
-
-    total_correct_vox = 0
-    total_seen_vox = 0
-    total_seen_class_vox = [0 for _ in range(NUM_CLASSES)]
-    total_correct_class_vox = [0 for _ in range(NUM_CLASSES)]
+    evaluator = scene_evaluator.SceneEvaluator(NUM_CLASSES, voxel_res=0.02)
 
     log_string(str(datetime.now()))
     log_string('---- EPOCH %03d EVALUATION ----' % (EPOCH_CNT))
 
-    labelweights = np.zeros(21)
-    labelweights_vox = np.zeros(21)
     for batch_idx in range(num_batches):
         start_idx = batch_idx * BATCH_SIZE
         end_idx = (batch_idx + 1) * BATCH_SIZE
@@ -308,56 +297,12 @@ def eval_one_epoch(sess, ops, test_writer):
                                                       ops['loss'], ops['pred']], feed_dict=feed_dict)
         test_writer.add_summary(summary, step)
         pred_val = np.argmax(pred_val, 2)  # BxN
-        correct = np.sum((pred_val == batch_label) & (batch_label > 0) & (
-                batch_smpw > 0))  # evaluate only on 20 categories but not unknown
-        total_correct += correct
-        total_seen += np.sum((batch_label > 0) & (batch_smpw > 0))
-        loss_sum += loss_val
-        tmp, _ = np.histogram(batch_label, range(22))
-        labelweights += tmp
-        for l in range(NUM_CLASSES):
-            total_seen_class[l] += np.sum((batch_label == l) & (batch_smpw > 0))
-            total_correct_class[l] += np.sum((pred_val == l) & (batch_label == l) & (batch_smpw > 0))
-
-        for b in range(batch_label.shape[0]):
-            _, uvlabel, _ = \
-                pc_util.point_cloud_label_to_surface_voxel_label_fast(aug_data[b, batch_smpw[b, :] > 0, :],
-                                                                      np.concatenate((np.expand_dims(
-                                                                          batch_label[b, batch_smpw[b, :] > 0], 1),
-                                                                                      np.expand_dims(pred_val[
-                                                                                                         b, batch_smpw[
-                                                                                                            b, :] > 0],
-                                                                                                     1)), axis=1),
-                                                                      res=0.02)
-            total_correct_vox += np.sum((uvlabel[:, 0] == uvlabel[:, 1]) & (uvlabel[:, 0] > 0))
-            total_seen_vox += np.sum(uvlabel[:, 0] > 0)
-            tmp, _ = np.histogram(uvlabel[:, 0], range(22))
-            labelweights_vox += tmp
-            for l in range(NUM_CLASSES):
-                total_seen_class_vox[l] += np.sum(uvlabel[:, 0] == l)
-                total_correct_class_vox[l] += np.sum((uvlabel[:, 0] == l) & (uvlabel[:, 1] == l))
-
-    log_string('eval mean loss: %f' % (loss_sum / float(num_batches)))
-    log_string('eval point accuracy vox: %f' % (total_correct_vox / float(total_seen_vox)))
-    log_string('eval point avg class acc vox: %f' % (
-        np.mean(np.array(total_correct_class_vox[1:]) / (np.array(total_seen_class_vox[1:], dtype=np.float) + 1e-6))))
-    log_string('eval point accuracy: %f' % (total_correct / float(total_seen)))
-    log_string('eval point avg class acc: %f' % (
-        np.mean(np.array(total_correct_class[1:]) / (np.array(total_seen_class[1:], dtype=np.float) + 1e-6))))
-    labelweights_vox = labelweights_vox[1:].astype(np.float32) / np.sum(labelweights_vox[1:].astype(np.float32))
-    caliweights = np.array(
-        [0.388, 0.357, 0.038, 0.033, 0.017, 0.02, 0.016, 0.025, 0.002, 0.002, 0.002, 0.007, 0.006, 0.022, 0.004, 0.0004,
-         0.003, 0.002, 0.024, 0.029])
-    log_string('eval point calibrated average acc: %f' % (
-        np.average(np.array(total_correct_class[1:]) / (np.array(total_seen_class[1:], dtype=np.float) + 1e-6),
-                   weights=caliweights)))
-    per_class_str = 'vox based --------'
-    for l in range(1, NUM_CLASSES):
-        per_class_str += 'class %d weight: %f, acc: %f; ' % (
-            l, labelweights_vox[l - 1], total_correct_class[l] / float(total_seen_class[l]))
-    log_string(per_class_str)
+        evaluator.update(aug_data, batch_label, pred_val, batch_smpw, loss_val)
+
+    for line in evaluator.summary('eval'):
+        log_string(line)
     EPOCH_CNT += 1
-    return total_correct / float(total_seen)
+    return evaluator.accuracy()
 
 
 # evaluate on whole scenes to generate numbers provided in the paper
@@ -365,61 +310,21 @@ def eval_whole_scene_one_epoch(sess, ops, test_writer):
     """ ops: dict mapping from string to tf ops """
     global EPOCH_CNT
     is_training = False
-    test_idxs = np.arange(0, len(TEST_DATASET_WHOLE_SCENE))
-    num_batches = len(TEST_DATASET_WHOLE_SCENE)
-
-    total_correct = 0
-    total_seen = 0
-    loss_sum = 0
-    total_seen_class = [0 for _ in range(NUM_CLASSES)]
-    total_correct_class = [0 for _ in range(NUM_CLASSES)]
+    num_scenes = len(TEST_DATASET_WHOLE_SCENE)
 
-    total_correct_vox = 0
-    total_seen_vox = 0
-    total_seen_class_vox = [0 for _ in range(NUM_CLASSES)]
-    total_correct_class_vox = [0 for _ in range(NUM_CLASSES)]
+    evaluator = scene_evaluator.SceneEvaluator(NUM_CLASSES, voxel_res=0.02)
 
     log_string(str(datetime.now()))
     log_string('---- EPOCH %03d EVALUATION WHOLE SCENE----' % (EPOCH_CNT))
 
-    labelweights = np.zeros(21)
-    labelweights_vox = np.zeros(21)
-    is_continue_batch = False
+    def scenes():
+        for scene_idx in range(num_scenes):
+            log_string('- working on scene %03d of %03d' % (scene_idx, num_scenes))
+            yield TEST_DATASET_WHOLE_SCENE[scene_idx]
 
-    extra_batch_data = np.zeros((0, NUM_POINT, 3))
-    extra_batch_label = np.zeros((0, NUM_POINT))
-    extra_batch_smpw = np.zeros((0, NUM_POINT))
-    for batch_idx in range(num_batches):
-        log_string('- working on batch %03d of %03d' % (batch_idx, num_batches))
-        if not is_continue_batch:
-            batch_data, batch_label, batch_smpw = TEST_DATASET_WHOLE_SCENE[batch_idx]
-            batch_data = np.concatenate((batch_data, extra_batch_data), axis=0)
-            batch_label = np.concatenate((batch_label, extra_batch_label), axis=0)
-            batch_smpw = np.concatenate((batch_smpw, extra_batch_smpw), axis=0)
-        else:
-            batch_data_tmp, batch_label_tmp, batch_smpw_tmp = TEST_DATASET_WHOLE_SCENE[batch_idx]
-            batch_data = np.concatenate((batch_data, batch_data_tmp), axis=0)
-            batch_label = np.concatenate((batch_label, batch_label_tmp), axis=0)
-            batch_smpw = np.concatenate((batch_smpw, batch_smpw_tmp), axis=0)
-        if batch_data.shape[0] < BATCH_SIZE:
-            is_continue_batch = True
-            continue
-        elif batch_data.shape[0] == BATCH_SIZE:
-            is_continue_batch = False
-            extra_batch_data = np.zeros((0, NUM_POINT, 3))
-            extra_batch_label = np.zeros((0, NUM_POINT))
-            extra_batch_smpw = np.zeros((0, NUM_POINT))
-        else:
-            is_continue_batch = False
-            extra_batch_data = batch_data[BATCH_SIZE:, :, :]
-            extra_batch_label = batch_label[BATCH_SIZE:, :]
-            extra_batch_smpw = batch_smpw[BATCH_SIZE:, :]
-            batch_data = batch_data[:BATCH_SIZE, :, :]
-            batch_label = batch_label[:BATCH_SIZE, :]
-            batch_smpw = batch_smpw[:BATCH_SIZE, :]
-
-        aug_data = batch_data
-        feed_dict = {ops['pointclouds_pl']: aug_data,
+    # the chunks of consecutive scenes are packed into full batches, the last batch is padded with zero weights
+    for batch_data, batch_label, batch_smpw in evaluator.batches(scenes(), BATCH_SIZE):
+        feed_dict = {ops['pointclouds_pl']: batch_data,
                      ops['labels_pl']: batch_label,
                      ops['smpws_pl']: batch_smpw,
                      ops['is_training_pl']: is_training}
@@ -427,60 +332,12 @@ def eval_whole_scene_one_epoch(sess, ops, test_writer):
                                                       ops['loss'], ops['pred']], feed_dict=feed_dict)
         test_writer.add_summary(summary, step)
         pred_val = np.argmax(pred_val, 2)  # BxN
-        correct = np.sum((pred_val == batch_label) & (batch_label > 0) & (
-                batch_smpw > 0))  # evaluate only on 20 categories but not unknown
-        total_correct += correct
-        total_seen += np.sum((batch_label > 0) & (batch_smpw > 0))
-        loss_sum += loss_val
-        tmp, _ = np.histogram(batch_label, range(22))
-        labelweights += tmp
-        for l in range(NUM_CLASSES):
-            total_seen_class[l] += np.sum((batch_label == l) & (batch_smpw > 0))
-            total_correct_class[l] += np.sum((pred_val == l) & (batch_label == l) & (batch_smpw > 0))
-
-        for b in range(batch_label.shape[0]):
-            _, uvlabel, _ = pc_util.point_cloud_label_to_surface_voxel_label_fast(aug_data[b, batch_smpw[b, :] > 0, :],
-                                                                                  np.concatenate((np.expand_dims(
-                                                                                      batch_label[
-                                                                                          b, batch_smpw[b, :] > 0], 1),
-                                                                                                  np.expand_dims(
-                                                                                                      pred_val[
-                                                                                                          b, batch_smpw[
-                                                                                                             b, :] > 0],
-                                                                                                      1)), axis=1),
-                                                                                  res=0.02)
-            total_correct_vox += np.sum((uvlabel[:, 0] == uvlabel[:, 1]) & (uvlabel[:, 0] > 0))
-            total_seen_vox += np.sum(uvlabel[:, 0] > 0)
-            tmp, _ = np.histogram(uvlabel[:, 0], range(22))
-            labelweights_vox += tmp
-            for l in range(NUM_CLASSES):
-                total_seen_class_vox[l] += np.sum(uvlabel[:, 0] == l)
-                total_correct_class_vox[l] += np.sum((uvlabel[:, 0] == l) & (uvlabel[:, 1] == l))
-
-    log_string('eval whole scene mean loss: %f' % (loss_sum / float(num_batches)))
-    log_string('eval whole scene point accuracy vox: %f' % (total_correct_vox / float(total_seen_vox)))
-    log_string('eval whole scene point avg class acc vox: %f' % (
-        np.mean(np.array(total_correct_class_vox[1:]) / (np.array(total_seen_class_vox[1:], dtype=np.float) + 1e-6))))
-    log_string('eval whole scene point accuracy: %f' % (total_correct / float(total_seen)))
-    log_string('eval whole scene point avg class acc: %f' % (
-        np.mean(np.array(total_correct_class[1:]) / (np.array(total_seen_class[1:], dtype=np.float) + 1e-6))))
-    labelweights = labelweights[1:].astype(np.float32) / np.sum(labelweights[1:].astype(np.float32))
-    labelweights_vox = labelweights_vox[1:].astype(np.float32) / np.sum(labelweights_vox[1:].astype(np.float32))
-    caliweights = np.array(
-        [0.388, 0.357, 0.038, 0.033, 0.017, 0.02, 0.016, 0.025, 0.002, 0.002, 0.002, 0.007, 0.006, 0.022, 0.004, 0.0004,
-         0.003, 0.002, 0.024, 0.029])
-    caliacc = np.average(
-        np.array(total_correct_class_vox[1:]) / (np.array(total_seen_class_vox[1:], dtype=np.float) + 1e-6),
-        weights=caliweights)
-    log_string('eval whole scene point calibrated average acc vox: %f' % caliacc)
-
-    per_class_str = 'vox based --------'
-    for l in range(1, NUM_CLASSES):
-        per_class_str += 'class %d weight: %f, acc: %f; ' % (
-            l, labelweights_vox[l - 1], total_correct_class_vox[l] / float(total_seen_class_vox[l]))
-    log_string(per_class_str)
+        evaluator.update(batch_data, batch_label, pred_val, batch_smpw, loss_val)
+
+    for line in evaluator.summary('eval whole scene'):
+        log_string(line)
     EPOCH_CNT += 1
-    return caliacc
+    return evaluator.calibrated_accuracy(vox=True)
 
 
 if __name__ == "__main__":
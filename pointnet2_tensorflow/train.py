@@ -22,6 +22,7 @@ import provider
 import tf_util
 import modelnet_dataset
 import modelnet_h5_dataset
+import prefetch_dataset
 
 parser = argparse.ArgumentParser()
 parser.add_argument('--gpu', type=int, default=0, help='GPU to use [default: GPU 0]')
@@ -80,10 +81,14 @@ else:
     assert (NUM_POINT <= 2048)
     TRAIN_DATASET = modelnet_h5_dataset.ModelNetH5Dataset(
         os.path.join(BASE_DIR, 'data/modelnet40_ply_hdf5_2048/train_files.txt'), batch_size=BATCH_SIZE,
-        npoints=NUM_POINT, shuffle=True)
+        npoints=NUM_POINT, shuffle=True, double_buffer=True)
     TEST_DATASET = modelnet_h5_dataset.ModelNetH5Dataset(
         os.path.join(BASE_DIR, 'data/modelnet40_ply_hdf5_2048/test_files.txt'), batch_size=BATCH_SIZE,
-        npoints=NUM_POINT, shuffle=False)
+        npoints=NUM_POINT, shuffle=False, double_buffer=True)
+
+# the next batches are assembled and augmented in the background while the current step runs
+TRAIN_DATASET = prefetch_dataset.PrefetchDataset(TRAIN_DATASET, augment=True)
+TEST_DATASET = prefetch_dataset.PrefetchDataset(TEST_DATASET, augment=False)
 
 
 def log_string(out_str):
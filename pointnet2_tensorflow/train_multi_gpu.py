@@ -23,6 +23,7 @@ import provider
 import tf_util
 import modelnet_dataset
 import modelnet_h5_dataset
+import prefetch_dataset
 
 parser = argparse.ArgumentParser()
 parser.add_argument('--num_gpus', type=int, default=1, help='How many gpus to use [default: 1]')
@@ -80,8 +81,12 @@ if FLAGS.normal:
     TEST_DATASET = modelnet_dataset.ModelNetDataset(root=DATA_PATH, npoints=NUM_POINT, split='test', normal_channel=FLAGS.normal, batch_size=BATCH_SIZE)
 else:
     assert(NUM_POINT<=2048)
-    TRAIN_DATASET = modelnet_h5_dataset.ModelNetH5Dataset(os.path.join(BASE_DIR, 'data/modelnet40_ply_hdf5_2048/train_files.txt'), batch_size=BATCH_SIZE, npoints=NUM_POINT, shuffle=True)
-    TEST_DATASET = modelnet_h5_dataset.ModelNetH5Dataset(os.path.join(BASE_DIR, 'data/modelnet40_ply_hdf5_2048/test_files.txt'), batch_size=BATCH_SIZE, npoints=NUM_POINT, shuffle=False)
+    TRAIN_DATASET = modelnet_h5_dataset.ModelNetH5Dataset(os.path.join(BASE_DIR, 'data/modelnet40_ply_hdf5_2048/train_files.txt'), batch_size=BATCH_SIZE, npoints=NUM_POINT, shuffle=True, double_buffer=True)
+    TEST_DATASET = modelnet_h5_dataset.ModelNetH5Dataset(os.path.join(BASE_DIR, 'data/modelnet40_ply_hdf5_2048/test_files.txt'), batch_size=BATCH_SIZE, npoints=NUM_POINT, shuffle=False, double_buffer=True)
+
+# the next batches are assembled and augmented in the background while the current step runs
+TRAIN_DATASET = prefetch_dataset.PrefetchDataset(TRAIN_DATASET, augment=True)
+TEST_DATASET = prefetch_dataset.PrefetchDataset(TEST_DATASET, augment=False)
 
 def log_string(out_str):
     LOG_FOUT.write(out_str+'\n')
@@ -0,0 +1,58 @@
+'''
+    Compares the fused batch augmentation of provider.augment_batch_data with the per-sample augmentation functions.
+'''
+
+import time
+import numpy as np
+import provider
+
+
+def augment_per_sample(batch_data, normal=False):
+    ''' augmentation chain of the ModelNet datasets with the per-sample functions '''
+    if normal:
+        rotated_data = provider.rotate_point_cloud_with_normal(batch_data)
+        rotated_data = provider.rotate_perturbation_point_cloud_with_normal(rotated_data)
+    else:
+        rotated_data = provider.rotate_point_cloud(batch_data)
+        rotated_data = provider.rotate_perturbation_point_cloud(rotated_data)
+    jittered_data = provider.random_scale_point_cloud(rotated_data[:,:,0:3])
+    jittered_data = provider.shift_point_cloud(jittered_data)
+    jittered_data = provider.jitter_point_cloud(jittered_data)
+    rotated_data[:,:,0:3] = jittered_data
+    return provider.shuffle_points(rotated_data)
+
+
+def check_transform(batch_size=8, num_point=1024):
+    ''' the batched matmul gives the same result as one np.dot per sample '''
+    batch_data = np.random.randn(batch_size, num_point, 6).astype(np.float32)
+    rotations = np.matmul(provider.random_rotation_matrices(batch_size),
+                          provider.random_perturbation_matrices(batch_size))
+    scales = np.random.uniform(0.8, 1.25, batch_size)
+    shifts = np.random.uniform(-0.1, 0.1, (batch_size, 3))
+    fused = provider.transform_point_cloud(batch_data, rotations, scales, shifts, normal=True)
+    for k in range(batch_size):
+        xyz = np.dot(batch_data[k, :, 0:3], rotations[k]) * scales[k] + shifts[k]
+        normals = np.dot(batch_data[k, :, 3:6], rotations[k])
+        assert np.allclose(fused[k, :, 0:3], xyz, atol=1e-5)
+        assert np.allclose(fused[k, :, 3:6], normals, atol=1e-5)
+
+
+def benchmark(batch_size=32, num_point=1024, normal=False, repetitions=20):
+    batch_data = np.random.randn(batch_size, num_point, 6 if normal else 3).astype(np.float32)
+    tic = time.time()
+    for _ in range(repetitions):
+        augment_per_sample(batch_data.copy(), normal)
+    per_sample = (time.time() - tic) / repetitions
+    tic = time.time()
+    for _ in range(repetitions):
+        provider.augment_batch_data(batch_data, normal)
+    fused = (time.time() - tic) / repetitions
+    print('B=%d N=%d normal=%s: per sample %.2fms, fused %.2fms (%.1fx)' %
+          (batch_size, num_point, normal, per_sample * 1000, fused * 1000, per_sample / fused))
+
+
+if __name__ == '__main__':
+    check_transform()
+    for normal in [False, True]:
+        for batch_size, num_point in [(16, 1024), (32, 1024), (32, 4096)]:
+            benchmark(batch_size, num_point, normal)
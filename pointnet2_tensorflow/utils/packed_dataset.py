@@ -0,0 +1,98 @@
+'''
+    Packed binary archive for datasets which are stored as one text file per sample
+    (ModelNet40 normal_resampled, ShapeNetPart normal).
+
+    The text files are parsed once and their rows are appended to a single float32 file,
+    which is memory-mapped afterwards. Sample i are the rows offsets[i]:offsets[i+1],
+    so reading a sample is an O(1) slice of the memory map without any copy.
+
+    Archive layout (directory):
+        data.bin      float32 rows of all samples (all columns of the text files)
+        offsets.npy   int64 (num_samples+1) first row of each sample
+        cls.npy       int32 (num_samples) class of each sample
+        meta.json     number of columns and list of the source files
+'''
+
+import os
+import json
+import shutil
+import time
+import numpy as np
+
+
+class PackedArchive():
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'meta.json'), 'r') as f:
+            self.meta = json.load(f)
+        self.offsets = np.load(os.path.join(path, 'offsets.npy'))
+        self.cls = np.load(os.path.join(path, 'cls.npy'))
+        num_rows = int(self.offsets[-1])
+        if num_rows > 0:
+            self.data = np.memmap(os.path.join(path, 'data.bin'), dtype=np.float32, mode='r',
+                                  shape=(num_rows, self.meta['num_columns']))
+        else:
+            self.data = np.zeros((0, self.meta['num_columns']), dtype=np.float32)
+
+    def __getitem__(self, index):
+        ''' returns the rows of the sample (view of the memory map) and its class with shape (1,) '''
+        return self.data[self.offsets[index]:self.offsets[index+1]], self.cls[index:index+1]
+
+    def __len__(self):
+        return len(self.cls)
+
+
+def pack_txt_files(path, datapath, classes, delimiter=None):
+    ''' Parse the text files of all samples once and write them to an archive at path.
+        Input:
+            datapath: list of (category, txt filename) tuples
+            classes: dict from category to class id
+            delimiter: delimiter of the text files, None for whitespace
+    '''
+    tmp_path = path + '.tmp'
+    if os.path.exists(tmp_path):
+        shutil.rmtree(tmp_path)
+    os.makedirs(tmp_path)
+
+    offsets = np.zeros(len(datapath)+1, dtype=np.int64)
+    num_columns = None
+    with open(os.path.join(tmp_path, 'data.bin'), 'wb') as f:
+        for i, (cat, fn) in enumerate(datapath):
+            data = np.loadtxt(fn, delimiter=delimiter, ndmin=2).astype(np.float32)
+            if num_columns is None:
+                num_columns = data.shape[1]
+            assert data.shape[1] == num_columns, '%s has %d columns instead of %d' % (fn, data.shape[1], num_columns)
+            data.tofile(f)
+            offsets[i+1] = offsets[i] + len(data)
+            if i % 1000 == 0:
+                print('packed %d/%d samples' % (i, len(datapath)))
+
+    np.save(os.path.join(tmp_path, 'offsets.npy'), offsets)
+    np.save(os.path.join(tmp_path, 'cls.npy'), np.array([classes[cat] for cat, _ in datapath], dtype=np.int32))
+    with open(os.path.join(tmp_path, 'meta.json'), 'w') as f:
+        json.dump({'num_columns': num_columns or 0, 'files': [fn for _, fn in datapath]}, f)
+
+    # only a completely written archive gets the final name
+    if os.path.exists(path):
+        shutil.rmtree(path)
+    os.rename(tmp_path, path)
+
+
+def load_or_pack(path, datapath, classes, delimiter=None):
+    ''' Open the archive at path, (re)build it first if it is missing or was built from other files. '''
+    meta_file = os.path.join(path, 'meta.json')
+    if os.path.exists(meta_file):
+        with open(meta_file, 'r') as f:
+            if json.load(f)['files'] == [fn for _, fn in datapath]:
+                return PackedArchive(path)
+    print('packing %d samples to %s' % (len(datapath), path))
+    pack_txt_files(path, datapath, classes, delimiter)
+    return PackedArchive(path)
+
+
+def time_epoch(dataset):
+    ''' Time to read every sample of the dataset once '''
+    tic = time.time()
+    for i in range(len(dataset)):
+        dataset[i]
+    return time.time() - tic
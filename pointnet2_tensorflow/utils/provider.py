@@ -214,8 +214,7 @@ def shift_point_cloud(batch_data, shift_range=0.1):
     """
     B, N, C = batch_data.shape
     shifts = np.random.uniform(-shift_range, shift_range, (B, 3))
-    for batch_index in range(B):
-        batch_data[batch_index, :, :] += shifts[batch_index, :]
+    batch_data += shifts[:, None, :]
     return batch_data
 
 
@@ -228,29 +227,134 @@ def random_scale_point_cloud(batch_data, scale_low=0.8, scale_high=1.25):
     """
     B, N, C = batch_data.shape
     scales = np.random.uniform(scale_low, scale_high, B)
-    for batch_index in range(B):
-        batch_data[batch_index, :, :] *= scales[batch_index]
+    batch_data *= scales[:, None, None]
     return batch_data
 
 
 def random_point_dropout(batch_pc, max_dropout_ratio=0.875):
     ''' batch_pc: BxNx3 '''
-    for b in range(batch_pc.shape[0]):
-        dropout_ratio = np.random.random() * max_dropout_ratio  # 0~0.875
-        drop_idx = np.where(np.random.random((batch_pc.shape[1])) <= dropout_ratio)[0]
-        if len(drop_idx) > 0:
-            batch_pc[b, drop_idx, :] = batch_pc[b, 0, :]  # set to the first point
+    dropout_ratio = np.random.random((batch_pc.shape[0], 1)) * max_dropout_ratio  # 0~0.875
+    drop = np.random.random(batch_pc.shape[:2]) <= dropout_ratio
+    batch_pc[drop] = np.broadcast_to(batch_pc[:, 0:1, :], batch_pc.shape)[drop]  # set to the first point
     return batch_pc
 
 
+# ----------------------------------------------------------------
+# Fused augmentation: the matrices of all B point clouds are built
+# at once and applied with one batched matmul to XYZ and normals
+# ----------------------------------------------------------------
+
+def axis_rotation_matrices(angles, axis):
+    """ Rotation matrices around the x (0), y (1) or z (2) axis.
+        Input:
+          B array, rotation angles
+        Return:
+          Bx3x3 array, rotation matrices
+    """
+    cosval = np.cos(angles)
+    sinval = np.sin(angles)
+    i, j = [(1, 2), (2, 0), (0, 1)][axis]
+    matrices = np.zeros((len(angles), 3, 3))
+    matrices[:, axis, axis] = 1
+    matrices[:, i, i] = cosval
+    matrices[:, j, j] = cosval
+    matrices[:, i, j] = -sinval
+    matrices[:, j, i] = sinval
+    return matrices
+
+
+def random_rotation_matrices(B, axis=1):
+    """ Random rotations along the up direction as in rotate_point_cloud (axis=1)
+        or rotate_point_cloud_z (axis=2).
+        Return:
+          Bx3x3 array, rotation matrices
+    """
+    assert (axis in (1, 2))
+    angles = np.random.uniform(size=B) * 2 * np.pi
+    return axis_rotation_matrices(angles if axis == 1 else -angles, axis)
+
+
+def random_perturbation_matrices(B, angle_sigma=0.06, angle_clip=0.18):
+    """ Small random rotations (Rz * Ry * Rx) as in rotate_perturbation_point_cloud.
+        Return:
+          Bx3x3 array, rotation matrices
+    """
+    angles = np.clip(angle_sigma * np.random.randn(B, 3), -angle_clip, angle_clip)
+    return np.matmul(axis_rotation_matrices(angles[:, 2], 2),
+                     np.matmul(axis_rotation_matrices(angles[:, 1], 1), axis_rotation_matrices(angles[:, 0], 0)))
+
+
+def transform_point_cloud(batch_data, rotations, scales=None, shifts=None, normal=False):
+    """ Rotate, scale and shift all point clouds with one batched matmul.
+        Input:
+          BxNxC array, XYZ in channels 0:3, normals in channels 3:6 if normal
+          Bx3x3 array, rotation matrices (points are row vectors)
+          B array, scales of XYZ
+          Bx3 array, shifts of XYZ
+        Return:
+          BxNxC array, transformed batch of point clouds
+    """
+    transformed = np.empty(batch_data.shape, dtype=np.float32)
+    xyz_matrices = rotations if scales is None else rotations * scales[:, None, None]
+    np.matmul(batch_data[:, :, 0:3].astype(np.float32, copy=False), xyz_matrices.astype(np.float32),
+              out=transformed[:, :, 0:3])
+    if shifts is not None:
+        transformed[:, :, 0:3] += shifts[:, None, :]
+    if normal:
+        np.matmul(batch_data[:, :, 3:6].astype(np.float32, copy=False), rotations.astype(np.float32),
+                  out=transformed[:, :, 3:6])
+        transformed[:, :, 6:] = batch_data[:, :, 6:]
+    else:
+        transformed[:, :, 3:] = batch_data[:, :, 3:]
+    return transformed
+
+
+def augment_batch_data(batch_data, normal=False, rotation_axis=1, angle_sigma=0.06, angle_clip=0.18,
+                       scale_low=0.8, scale_high=1.25, shift_range=0.1, jitter_sigma=0.01, jitter_clip=0.05,
+                       max_dropout_ratio=None, shuffle=True):
+    """ Fused rotation, perturbation, scaling, shift, jitter, dropout and point shuffling.
+        Equivalent to rotate_point_cloud(_z/_with_normal), rotate_perturbation_point_cloud(_with_normal),
+        random_scale_point_cloud, shift_point_cloud, jitter_point_cloud, random_point_dropout and
+        shuffle_points applied one after the other.
+        Input:
+          BxNxC array, XYZ in channels 0:3, normals in channels 3:6 if normal
+          rotation_axis: 1 (up direction), 2 (z) or None for no rotation
+          angle_sigma: 0 for no perturbation
+          max_dropout_ratio: None for no dropout
+        Return:
+          BxNxC array, augmented batch of point clouds
+    """
+    B, N, C = batch_data.shape
+    if rotation_axis is None:
+        rotations = np.tile(np.eye(3), (B, 1, 1))
+    else:
+        rotations = random_rotation_matrices(B, rotation_axis)
+    if angle_sigma > 0:
+        rotations = np.matmul(rotations, random_perturbation_matrices(B, angle_sigma, angle_clip))
+    scales = np.random.uniform(scale_low, scale_high, B)
+    shifts = np.random.uniform(-shift_range, shift_range, (B, 3))
+    augmented = transform_point_cloud(batch_data, rotations, scales, shifts, normal)
+
+    if jitter_sigma > 0:
+        jitter = jitter_sigma * np.random.randn(B, N, 3)
+        np.clip(jitter, -jitter_clip, jitter_clip, out=jitter)
+        augmented[:, :, 0:3] += jitter
+    if max_dropout_ratio is not None:
+        augmented = random_point_dropout(augmented, max_dropout_ratio)
+    if shuffle:
+        augmented = shuffle_points(augmented)
+    return augmented
+
+
 def getDataFiles(list_filename):
     return [line.rstrip() for line in open(list_filename)]
 
 
-def load_h5(h5_filename):
-    f = h5py.File(h5_filename)
-    data = f['data'][:]
-    label = f['label'][:]
+def load_h5(h5_filename, start=0, end=None):
+    ''' Read the samples start:end, of a chunked file only the chunks containing them are decompressed '''
+    with h5py.File(h5_filename, 'r') as f:
+        data = f['data'][start:end]
+        label = f['label'][start:end]
     return (data, label)
 
 